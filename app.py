@@ -3,9 +3,9 @@
 Servidor Flask com API REST e interface web SPA.
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from functools import wraps
-from database import init_db, get_connection
+from database import init_db, get_connection, executar_escrita, BancoIndisponivel, disjuntor, USE_POSTGRES
 from services.estoque_service import EstoqueService
 from services.entrada_service import EntradaService
 from services.saida_service import SaidaService
@@ -18,8 +18,22 @@ from services.auth_service import AuthService
 from services.export_service import ExportService
 from services.version_service import VersionService
 from services.cliente_service import ClienteService
+from services.dashboard_service import DashboardService
+from services.sync_service import SyncService
+from services.alteracao_service import AlteracaoService
 from datetime import datetime
+import metrics
+import db_instrumentation
+import profiler
+import memory_diagnostics
+import manutencao
+import replicas
+import resiliencia
+import eventos
+from idempotencia import idempotente, executar as executar_idempotente
 import os
+import json
+import time
 import re
 import secrets
 
@@ -34,6 +48,14 @@ app.secret_key = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(32))
 if os.environ.get('VERCEL'):
     app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
+metrics.instalar(app)
+db_instrumentation.instalar(app)
+profiler.instalar(app)
+manutencao.instalar(app)
+replicas.instalar(app)
+resiliencia.instalar(app)
+eventos.instalar(app)
+
 init_db()
 def _validate_mes(mes):
     """Valida formato de mês (YYYY-MM). Retorna o valor ou levanta ValueError."""
@@ -51,6 +73,9 @@ def _validate_ano(ano):
 
 def _safe_error_message(e):
     """Retorna mensagem de erro segura para o cliente (oculta detalhes internos em produção)."""
+    if isinstance(e, BancoIndisponivel):
+        resiliencia.registrar_indisponibilidade(e)   # a resposta vira 503
+        return str(e)
     if app.debug or app.config.get('TESTING'):
         return str(e)
     return 'Erro interno do servidor'
@@ -63,7 +88,8 @@ def login_required(f):
         if not token:
             token = request.cookies.get('auth_token', '')
 
-        usuario = AuthService.validar_token(token)
+        with metrics.medir('auth'):
+            usuario = AuthService.validar_token(token)
         if not usuario:
             return jsonify({'success': False, 'error': 'Não autenticado', 'auth_required': True}), 401
 
@@ -88,6 +114,15 @@ def index():
     """Serve a página principal (SPA)."""
     return render_template('index.html')
 
+
+@app.route('/sw.js')
+def service_worker():
+    """Serve o service worker na raiz para que ele controle toda a SPA."""
+    response = app.send_static_file('sw.js')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
 @app.route('/api/auth/login', methods=['POST'])
 def auth_login():
     """Autentica usuário e retorna token."""
@@ -121,7 +156,8 @@ def auth_me():
     if not token:
         token = request.cookies.get('auth_token', '')
 
-    usuario = AuthService.validar_token(token)
+    with metrics.medir('auth'):
+        usuario = AuthService.validar_token(token)
     if not usuario:
         return jsonify({'success': False, 'error': 'Não autenticado', 'auth_required': True}), 401
 
@@ -167,16 +203,43 @@ def auth_alterar_senha():
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
 
 
+@app.route('/api/bootstrap', methods=['GET'])
+@login_required
+def get_bootstrap():
+    """Carga inicial da SPA: usuário, estoque, preço, resumo do mês e configurações."""
+    try:
+        dados = DashboardService.get_bootstrap(request.usuario)
+        return jsonify({'success': True, 'data': dados})
+    except Exception as e:
+        return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
+
+
 @app.route('/api/estoque', methods=['GET'])
 @login_required
 def get_estoque():
-    """Retorna o estoque atual com indicador de status."""
+    """Retorna o estoque atual (ou em ?em=<data ISO>) com indicador de status."""
     try:
-        estoque = EstoqueService.get_estoque()
+        estoque = EstoqueService.get_estoque(request.args.get('em'))
         return jsonify({'success': True, 'data': estoque})
     except Exception as e:
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
 
+@app.route('/api/estoque/historico', methods=['GET'])
+@login_required
+def get_estoque_historico():
+    """Série do nível de estoque (?granularidade=dia|semana|mes&inicio=&fim=)."""
+    try:
+        serie = EstoqueService.get_historico(
+            request.args.get('granularidade', 'dia'),
+            request.args.get('inicio'),
+            request.args.get('fim')
+        )
+        return jsonify({'success': True, 'data': serie})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
+
 @app.route('/api/entradas', methods=['GET'])
 @login_required
 def get_entradas():
@@ -194,6 +257,7 @@ def get_entradas():
 
 @app.route('/api/entradas', methods=['POST'])
 @login_required
+@idempotente
 def add_entrada():
     """Registra uma nova entrada de ovos."""
     try:
@@ -251,6 +315,7 @@ def get_saidas():
 
 @app.route('/api/saidas', methods=['POST'])
 @login_required
+@idempotente
 def add_saida():
     """Registra uma nova venda de ovos."""
     try:
@@ -366,6 +431,7 @@ def get_quebrados():
 
 @app.route('/api/quebrados', methods=['POST'])
 @login_required
+@idempotente
 def add_quebrado():
     """Registra ovos quebrados (perda)."""
     try:
@@ -428,6 +494,7 @@ def get_consumo():
 
 @app.route('/api/consumo', methods=['POST'])
 @login_required
+@idempotente
 def add_consumo():
     """Registra consumo pessoal de ovos."""
     try:
@@ -469,6 +536,131 @@ def delete_consumo(entry_id):
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
 
 
+# ═══════════════════════════════════════════
+# API — SINCRONIZAÇÃO OFFLINE
+# ═══════════════════════════════════════════
+
+def _json(corpo):
+    return json.dumps(corpo, ensure_ascii=False)
+
+
+def _sincronizar_operacao(operacao):
+    """Aplica uma operação do lote com a chave dela e devolve o resultado."""
+    chave = operacao.get('chave') if isinstance(operacao, dict) else None
+    if not isinstance(chave, str) or not chave.strip():
+        return {'chave': chave, 'status': 400, 'success': False, 'error': 'Operação sem chave'}
+    try:
+        rota = SyncService.rota(operacao.get('tipo'))
+    except ValueError as e:
+        return {'chave': chave, 'status': 400, 'success': False, 'error': str(e)}
+
+    def _aplicar():
+        try:
+            entry_id, mensagem = SyncService.aplicar(
+                operacao['tipo'], operacao.get('dados'), operacao.get('registrado_em'), request.usuario)
+            return 200, _json({'success': True, 'id': entry_id, 'message': mensagem})
+        except ValueError as e:
+            return 400, _json({'success': False, 'error': str(e)})
+        except Exception as e:
+            status = 503 if isinstance(e, BancoIndisponivel) else 500
+            return status, _json({'success': False, 'error': _safe_error_message(e)})
+
+    status, texto, repetida = executar_idempotente(
+        request.usuario['id'], rota, chave.strip(), operacao.get('dados'), _aplicar)
+    resultado = json.loads(texto)
+    resultado.update({'chave': chave, 'status': status, 'repetida': repetida})
+    return resultado
+
+
+@app.route('/api/sync', methods=['POST'])
+@login_required
+def sync_operacoes():
+    """
+    Aplica em lote as operações anotadas offline pela SPA.
+
+    Corpo: {"operacoes": [{"chave", "tipo", "dados", "registrado_em"}]}.
+    Cada operação roda na sua própria transação, com o Idempotency-Key da
+    rota de origem; os resultados vêm por operação, na ordem recebida. A
+    SPA tira da fila as que tiveram resposta definitiva (status < 500,
+    exceto 409 = a mesma chave ainda em processamento).
+    """
+    try:
+        data = request.get_json(silent=True)
+        operacoes = data.get('operacoes') if isinstance(data, dict) else None
+        if not isinstance(operacoes, list) or not operacoes:
+            return jsonify({'success': False, 'error': 'Nenhuma operação fornecida'}), 400
+        if len(operacoes) > SyncService.LOTE_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo de {SyncService.LOTE_MAXIMO} operações por lote'
+            }), 400
+
+        resultados = [_sincronizar_operacao(op) for op in operacoes]
+        return jsonify({
+            'success': True,
+            'data': resultados,
+            'aplicadas': sum(1 for r in resultados if r['success'])
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
+
+
+# ═══════════════════════════════════════════
+# API — ALTERAÇÕES (delta-sync)
+# ═══════════════════════════════════════════
+
+@app.route('/api/alteracoes', methods=['GET'])
+@login_required
+def get_alteracoes():
+    """
+    Registros alterados desde uma versão (?desde=N).
+
+    Sem `desde` devolve só a versão atual, a ser lida antes de carregar as
+    listagens. Parâmetros opcionais: tabelas (separadas por vírgula) e
+    limite. Com reset=true a versão não serve mais e as listagens devem
+    ser recarregadas.
+    """
+    try:
+        desde = request.args.get('desde')
+        tabelas = request.args.get('tabelas')
+        limite = request.args.get('limite')
+        try:
+            desde = int(desde) if desde not in (None, '') else None
+            limite = int(limite) if limite else None
+        except ValueError:
+            raise ValueError('desde e limite devem ser números inteiros')
+        tabelas = [t.strip() for t in tabelas.split(',') if t.strip()] if tabelas else None
+
+        resultado = AlteracaoService.desde(desde, tabelas, limite)
+        return jsonify({'success': True, 'data': resultado})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
+
+
+# ═══════════════════════════════════════════
+# API — EVENTOS AO VIVO (SSE)
+# ═══════════════════════════════════════════
+
+@app.route('/api/eventos', methods=['GET'])
+@login_required
+def get_eventos():
+    """
+    Stream Server-Sent Events com estoque, resumo, preço e configurações.
+
+    A conexão fecha depois de EVENTOS_SSE_MAX_S e o navegador reconecta.
+    Com o barramento desligado responde 204 (o EventSource não reconecta).
+    """
+    if eventos.BACKEND == 'desligado':
+        return '', 204
+    return Response(
+        eventos.transmitir(eventos.assinar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # ═══════════════════════════════════════════
 # API — DESPESAS
 # ═══════════════════════════════════════════
@@ -490,6 +682,7 @@ def get_despesas():
 
 @app.route('/api/despesas', methods=['POST'])
 @login_required
+@idempotente
 def add_despesa():
     """Registra uma nova despesa."""
     try:
@@ -559,6 +752,7 @@ def get_clientes_simples():
 
 @app.route('/api/clientes', methods=['POST'])
 @login_required
+@idempotente
 def add_cliente():
     """Cadastra um novo cliente."""
     try:
@@ -633,6 +827,20 @@ def get_relatorio():
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
 
 
+@app.route('/api/relatorio/reprecificado', methods=['GET'])
+@login_required
+def get_relatorio_reprecificado():
+    """Faturamento do mês pelo preço de tabela vigente em cada venda."""
+    try:
+        mes = request.args.get('mes', datetime.now().strftime('%Y-%m'))
+        _validate_mes(mes)
+        return jsonify({'success': True, 'data': RelatorioService.reprecificar(mes)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
+
+
 @app.route('/api/relatorio/anual', methods=['GET'])
 @login_required
 def get_relatorio_anual():
@@ -653,29 +861,7 @@ def get_relatorio_anual():
 def get_meses():
     """Retorna a lista de meses com dados registrados."""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT mes_referencia FROM (
-                SELECT mes_referencia FROM entradas
-                UNION
-                SELECT mes_referencia FROM saidas
-                UNION
-                SELECT mes_referencia FROM quebrados
-                UNION
-                SELECT mes_referencia FROM consumo
-                UNION
-                SELECT mes_referencia FROM despesas
-            ) AS t ORDER BY mes_referencia DESC
-        """)
-        meses = [row['mes_referencia'] for row in cursor.fetchall()]
-        conn.close()
-
-        # Sempre incluir mês atual
-        current = datetime.now().strftime('%Y-%m')
-        if current not in meses:
-            meses.insert(0, current)
-
+        meses = RelatorioService.get_meses()
         return jsonify({'success': True, 'data': meses})
     except Exception as e:
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
@@ -787,9 +973,6 @@ def admin_update_configuracoes():
         if not data:
             return jsonify({'success': False, 'error': 'Dados não fornecidos'}), 400
 
-        conn = get_connection()
-        cursor = conn.cursor()
-
         _bool_keys = ('consumo_habilitado',)
         _text_keys = ('timezone', 'nome_fazenda', 'moeda', 'formato_data')
         _valid_timezones = (
@@ -804,42 +987,38 @@ def admin_update_configuracoes():
         _valid_currencies = ('BRL', 'USD', 'EUR', 'GBP', 'JPY', 'ARS', 'CLP', 'COP', 'MXN', 'PEN', 'UYU')
         _valid_date_formats = ('DD/MM/AAAA', 'MM/DD/AAAA', 'AAAA-MM-DD')
 
+        # Valida tudo antes de gravar: ou todas as chaves mudam, ou nenhuma
+        valores = []
         for key in _bool_keys:
             if key in data:
-                valor = '1' if data[key] else '0'
-                cursor.execute(
-                    """INSERT INTO configuracoes (chave, valor, atualizado_em)
-                       VALUES (?, ?, CURRENT_TIMESTAMP)
-                       ON CONFLICT(chave) DO UPDATE SET valor = ?, atualizado_em = CURRENT_TIMESTAMP""",
-                    (key, valor, valor)
-                )
+                valores.append((key, '1' if data[key] else '0'))
 
         for key in _text_keys:
             if key in data:
                 valor = str(data[key]).strip()
                 # Validações específicas
                 if key == 'timezone' and valor not in _valid_timezones:
-                    conn.close()
                     return jsonify({'success': False, 'error': f'Timezone inválido: {valor}'}), 400
                 if key == 'moeda' and valor not in _valid_currencies:
-                    conn.close()
                     return jsonify({'success': False, 'error': f'Moeda inválida: {valor}'}), 400
                 if key == 'formato_data' and valor not in _valid_date_formats:
-                    conn.close()
                     return jsonify({'success': False, 'error': f'Formato de data inválido: {valor}'}), 400
                 if key == 'nome_fazenda' and (len(valor) < 1 or len(valor) > 50):
-                    conn.close()
                     return jsonify({'success': False, 'error': 'Nome da fazenda deve ter entre 1 e 50 caracteres'}), 400
+                valores.append((key, valor))
 
-                cursor.execute(
+        def _gravar(conn):
+            for key, valor in valores:
+                conn.execute(
                     """INSERT INTO configuracoes (chave, valor, atualizado_em)
                        VALUES (?, ?, CURRENT_TIMESTAMP)
                        ON CONFLICT(chave) DO UPDATE SET valor = ?, atualizado_em = CURRENT_TIMESTAMP""",
                     (key, valor, valor)
                 )
 
-        conn.commit()
-        conn.close()
+        executar_escrita(_gravar)
+        if valores:
+            eventos.publicar('config', **dict(valores))
         return jsonify({'success': True, 'message': 'Configurações atualizadas'})
     except Exception as e:
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
@@ -882,12 +1061,180 @@ def get_configuracoes_gerais():
         return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
 
 
+# ═══════════════════════════════════════════
+# API — SAÚDE
+# ═══════════════════════════════════════════
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness: 200 se o banco responde; 503 com o disjuntor aberto ou o banco fora."""
+    dados = {'banco': 'postgres' if USE_POSTGRES else 'sqlite'}
+    if USE_POSTGRES:
+        dados['disjuntor'] = disjuntor.estado()
+    inicio = time.perf_counter()
+    try:
+        conn = get_connection()
+        try:
+            conn.execute("SELECT 1").fetchone()
+        finally:
+            conn.close()
+    except Exception as e:
+        resposta = jsonify({'success': False, 'error': _safe_error_message(e), 'data': dados})
+        if isinstance(e, BancoIndisponivel) and e.retry_after:
+            resposta.headers['Retry-After'] = str(e.retry_after)
+        return resposta, 503
+    dados['latencia_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    return jsonify({'success': True, 'data': dados})
+
+
+# ═══════════════════════════════════════════
+# API — MÉTRICAS
+# ═══════════════════════════════════════════
+
+@app.route('/api/admin/metrics', methods=['GET'])
+@admin_required
+def admin_metrics():
+    """Histogramas de latência por rota no formato Prometheus (apenas admin)."""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/admin/queries', methods=['GET'])
+@admin_required
+def admin_queries():
+    """Fingerprints de SQL mais custosos (requer DB_INSTRUMENTATION=1)."""
+    try:
+        limite = min(int(request.args.get('limite', 50)), 500)
+        return jsonify({'success': True, 'data': {
+            'habilitado': db_instrumentation.DB_INSTRUMENTATION,
+            'slow_query_ms': db_instrumentation.SLOW_QUERY_MS,
+            'query_budget': db_instrumentation.QUERY_BUDGET,
+            'fingerprints': db_instrumentation.top_fingerprints(limite),
+        }})
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Limite inválido'}), 400
+
+
+@app.route('/api/admin/profiler', methods=['GET'])
+@admin_required
+def admin_profiler():
+    """Configuração do profiler e perfis gravados (apenas admin)."""
+    return jsonify({'success': True, 'data': {
+        'config': profiler.configuracao(),
+        'perfis': profiler.listar(),
+    }})
+
+
+@app.route('/api/admin/profiler', methods=['PUT'])
+@admin_required
+def admin_profiler_configurar():
+    """Liga/desliga o profiler e define amostragem, rota e cabeçalho."""
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'success': False, 'error': 'Dados não fornecidos'}), 400
+        config = profiler.configurar(
+            app,
+            ativo=data.get('ativo'),
+            amostragem=data.get('amostragem'),
+            rota=data.get('rota'),
+            cabecalho=data.get('cabecalho'),
+            propagar=True,
+        )
+        return jsonify({'success': True, 'data': config})
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/api/admin/profiler/<nome>', methods=['GET'])
+@admin_required
+def admin_profiler_download(nome):
+    """Baixa um arquivo de perfil (.prof, .txt, .collapsed)."""
+    caminho = profiler.caminho_arquivo(nome)
+    if caminho is None:
+        return jsonify({'success': False, 'error': 'Perfil não encontrado'}), 404
+    return send_file(caminho, as_attachment=True, download_name=nome)
+
+
+@app.route('/api/admin/memoria', methods=['GET'])
+@admin_required
+def admin_memoria():
+    """RSS, estado do tracemalloc, snapshots e picos das exportações deste worker."""
+    return jsonify({'success': True, 'data': memory_diagnostics.status()})
+
+
+@app.route('/api/admin/memoria/<acao>', methods=['POST'])
+@admin_required
+def admin_memoria_acao(acao):
+    """Controla o tracemalloc: iniciar, parar, snapshot."""
+    try:
+        data = request.get_json(silent=True) or {}
+        if acao == 'iniciar':
+            memory_diagnostics.iniciar(data.get('frames', 1))
+            resultado = memory_diagnostics.status()
+        elif acao == 'parar':
+            memory_diagnostics.parar()
+            resultado = memory_diagnostics.status()
+        elif acao == 'snapshot':
+            snapshot_id = memory_diagnostics.tirar_snapshot()
+            resultado = {'id': snapshot_id, 'top': memory_diagnostics.top(int(data.get('limite', 20)))}
+        else:
+            return jsonify({'success': False, 'error': 'Ação inválida'}), 404
+        return jsonify({'success': True, 'data': resultado})
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/api/admin/memoria/top', methods=['GET'])
+@admin_required
+def admin_memoria_top():
+    """Linhas que mais alocam memória agora."""
+    try:
+        limite = min(int(request.args.get('limite', 20)), 200)
+        return jsonify({'success': True, 'data': memory_diagnostics.top(limite)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/api/admin/memoria/diff', methods=['GET'])
+@admin_required
+def admin_memoria_diff():
+    """Diferença por linha entre dois snapshots (?de=1&para=2; sem `para`, compara com agora)."""
+    try:
+        de = int(request.args.get('de', ''))
+        para = request.args.get('para')
+        limite = min(int(request.args.get('limite', 20)), 200)
+        dados = memory_diagnostics.diff(de, int(para) if para else None, limite)
+        return jsonify({'success': True, 'data': dados})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/api/admin/manutencao', methods=['GET'])
+@admin_required
+def admin_manutencao():
+    """Perfil do SQLite, PRAGMAs em uso e última manutenção deste worker."""
+    return jsonify({'success': True, 'data': manutencao.status()})
+
+
+@app.route('/api/admin/manutencao', methods=['POST'])
+@admin_required
+def admin_manutencao_executar():
+    """Roda a manutenção do SQLite agora (optimize, incremental_vacuum, checkpoint)."""
+    try:
+        return jsonify({'success': True, 'data': manutencao.executar()})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': _safe_error_message(e)}), 500
+
+
 # ═══════════════════════════════════════════
 # API — EXPORTAÇÃO (PDF / Excel)
 # ═══════════════════════════════════════════
 
 @app.route('/api/export/excel', methods=['GET'])
 @login_required
+@memory_diagnostics.medir_pico
 def export_excel():
     """Exporta relatório mensal em Excel."""
     try:
@@ -909,6 +1256,7 @@ def export_excel():
 
 @app.route('/api/export/pdf', methods=['GET'])
 @login_required
+@memory_diagnostics.medir_pico
 def export_pdf():
     """Exporta relatório mensal em PDF."""
     try:
@@ -930,6 +1278,7 @@ def export_pdf():
 
 @app.route('/api/export/excel-anual', methods=['GET'])
 @login_required
+@memory_diagnostics.medir_pico
 def export_excel_anual():
     """Exporta resumo anual em Excel."""
     try:
@@ -0,0 +1,239 @@
+"""
+⏱️ Benchmark da API (sem navegador)
+
+Gera bancos SQLite sintéticos de tamanhos configuráveis e mede, pelo test
+client do Flask, throughput e latência (p50/p95/p99) das rotas principais:
+login, estoque, listagens, relatório, meses, bootstrap e exportações.
+
+Os resultados são gravados em JSON e comparados com o baseline
+(benchmarks/baseline_api.json, se existir, ou --baseline): o script termina
+com código 1 se alguma rota piorar além da tolerância.
+
+Uso:
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py --eventos 1000,100000,1000000 --anos 5
+    python benchmarks/bench_api.py --salvar-baseline benchmarks/baseline_api.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+BASELINE_PADRAO = Path(__file__).parent / 'baseline_api.json'
+
+# (nome, método, url, fração das repetições) — {mes} e {ano} são o período mais recente
+ROTAS = (
+    ('login', 'POST', '/api/auth/login', 0.02),
+    ('estoque', 'GET', '/api/estoque', 1.0),
+    ('bootstrap', 'GET', '/api/bootstrap', 1.0),
+    ('entradas', 'GET', '/api/entradas?mes={mes}', 1.0),
+    ('saidas', 'GET', '/api/saidas?mes={mes}', 1.0),
+    ('relatorio', 'GET', '/api/relatorio?mes={mes}', 1.0),
+    ('relatorio_anual', 'GET', '/api/relatorio/anual?ano={ano}', 1.0),
+    ('meses', 'GET', '/api/meses', 1.0),
+    ('estoque_historico', 'GET', '/api/estoque/historico?granularidade=semana', 1.0),
+    ('export_excel', 'GET', '/api/export/excel?mes={mes}', 0.1),
+    ('export_pdf', 'GET', '/api/export/pdf?mes={mes}', 0.1),
+)
+
+
+def _percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * q))]
+
+
+def _medir_rota(client, metodo, url, repeticoes, headers, aquecimento=3):
+    corpo = json.dumps({'username': 'admin', 'password': 'admin'}) if metodo == 'POST' else None
+    kwargs = {'headers': headers, 'data': corpo, 'content_type': 'application/json'}
+    for _ in range(aquecimento):
+        client.open(url, method=metodo, **kwargs)
+
+    tempos, erros = [], 0
+    inicio_total = time.perf_counter()
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        res = client.open(url, method=metodo, **kwargs)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if res.status_code != 200:
+            erros += 1
+    total = time.perf_counter() - inicio_total
+
+    tempos.sort()
+    return {
+        'requisicoes': repeticoes,
+        'erros': erros,
+        'throughput_rps': round(repeticoes / total, 2),
+        'media_ms': round(sum(tempos) / len(tempos), 3),
+        'p50_ms': round(_percentil(tempos, 0.50), 3),
+        'p95_ms': round(_percentil(tempos, 0.95), 3),
+        'p99_ms': round(_percentil(tempos, 0.99), 3),
+        'max_ms': round(tempos[-1], 3),
+    }
+
+
+def _preparar_banco(dados_dir, eventos, anos, seed):
+    """Gera (ou reaproveita) o banco sintético e aponta o app para ele."""
+    import database
+    from dados_sinteticos import gerar_sqlite
+
+    caminho = Path(dados_dir) / f'bench_{eventos}_{anos}a_s{seed}.db'
+    database.DB_PATH = str(caminho)
+    if not caminho.exists():
+        parcial = caminho.with_suffix('.parcial.db')
+        parcial.unlink(missing_ok=True)
+        database.DB_PATH = str(parcial)
+        inicio = time.perf_counter()
+        database.init_db()
+        info = gerar_sqlite(str(parcial), eventos, anos, seed)
+        os.replace(parcial, caminho)
+        database.DB_PATH = str(caminho)
+        print(f"   Banco gerado em {time.perf_counter() - inicio:.1f}s: {info['tabelas']}")
+    return caminho
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(resultado, baseline, tolerancia, minimo_ms):
+    """
+    Compara p50/p95 com o baseline.
+
+    Uma rota regride quando fica mais de `tolerancia` (fração) mais lenta e
+    a diferença absoluta passa de `minimo_ms` (ruído em rotas muito rápidas).
+
+    Returns:
+        Lista de mensagens de regressão.
+    """
+    regressoes = []
+    for tamanho, rotas in baseline.get('resultados', {}).items():
+        atuais = resultado['resultados'].get(tamanho, {})
+        for rota, base in rotas.items():
+            atual = atuais.get(rota)
+            if atual is None:
+                continue
+            for metrica in ('p50_ms', 'p95_ms'):
+                limite = base[metrica] * (1 + tolerancia)
+                if atual[metrica] > limite and atual[metrica] - base[metrica] > minimo_ms:
+                    regressoes.append(
+                        f"{tamanho} eventos · {rota} · {metrica}: {atual[metrica]:.2f} ms "
+                        f"(baseline {base[metrica]:.2f} ms, limite {limite:.2f} ms)"
+                    )
+            if atual['erros'] > base.get('erros', 0):
+                regressoes.append(f"{tamanho} eventos · {rota}: {atual['erros']} erro(s)")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da API com bancos sintéticos')
+    parser.add_argument('--eventos', default='1000,100000',
+                        help='Tamanhos dos bancos, separados por vírgula (padrão: 1000,100000)')
+    parser.add_argument('--anos', type=int, default=5, help='Anos de histórico gerados')
+    parser.add_argument('--seed', type=int, default=42, help='Seed do gerador')
+    parser.add_argument('--requisicoes', type=int, default=200, help='Repetições por rota')
+    parser.add_argument('--rotas', help='Rotas a medir (nomes separados por vírgula)')
+    parser.add_argument('--dados-dir', help='Onde guardar/reaproveitar os bancos (padrão: temporário)')
+    parser.add_argument('--saida', help='Arquivo JSON de resultado (padrão: benchmarks/resultados/)')
+    parser.add_argument('--baseline', help='Resultado anterior para detectar regressões '
+                                           '(padrão: benchmarks/baseline_api.json, se existir)')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='Piora aceita sobre o baseline (padrão: 0.25 = 25%%)')
+    parser.add_argument('--minimo-ms', type=float, default=1.0,
+                        help='Diferença mínima em ms para contar como regressão (padrão: 1.0)')
+    parser.add_argument('--salvar-baseline', help='Grava também o resultado como novo baseline')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = ''
+    dados_dir = args.dados_dir or tempfile.mkdtemp(prefix='eggvault_bench_')
+    Path(dados_dir).mkdir(parents=True, exist_ok=True)
+    os.environ['OVOS_DB_PATH'] = os.path.join(dados_dir, 'inicial.db')
+
+    from app import app
+    from services.auth_service import AuthService
+    from services.estoque_service import EstoqueService
+
+    tamanhos = [int(t) for t in args.eventos.split(',') if t.strip()]
+    rotas = [r for r in ROTAS if not args.rotas or r[0] in args.rotas.split(',')]
+    agora = datetime.now()
+    periodo = {'mes': agora.strftime('%Y-%m'), 'ano': agora.strftime('%Y')}
+
+    print("⏱️  EggVault - Benchmark da API")
+    print(f"   Bancos: {', '.join(f'{t:,}' for t in tamanhos)} eventos em {args.anos} anos (seed {args.seed})")
+    print(f"   {args.requisicoes} requisições por rota\n")
+
+    resultado = {
+        'meta': {
+            'data': agora.isoformat(timespec='seconds'),
+            'commit': _commit_atual(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'anos': args.anos,
+            'seed': args.seed,
+            'requisicoes': args.requisicoes,
+        },
+        'resultados': {},
+    }
+
+    for eventos in tamanhos:
+        print(f"📦 {eventos:,} eventos")
+        _preparar_banco(dados_dir, eventos, args.anos, args.seed)
+        EstoqueService.invalidar_historico()
+        AuthService.limpar_cache_geracao()
+
+        client = app.test_client()
+        token = AuthService.login('admin', 'admin')['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        print(f"   {'rota':<20} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6}")
+        medidas = {}
+        for nome, metodo, url, fracao in rotas:
+            repeticoes = max(5, int(args.requisicoes * fracao))
+            r = _medir_rota(client, metodo, url.format(**periodo), repeticoes, headers)
+            medidas[nome] = r
+            print(f"   {nome:<20} {r['throughput_rps']:>9.1f} {r['p50_ms']:>9.2f} "
+                  f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['erros']:>6}")
+        resultado['resultados'][str(eventos)] = medidas
+        print()
+
+    saida = Path(args.saida) if args.saida else (
+        Path(__file__).parent / 'resultados' / f"api_{agora.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"💾 Resultado: {saida}")
+
+    if args.salvar_baseline:
+        Path(args.salvar_baseline).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"📌 Baseline atualizado: {args.salvar_baseline}")
+
+    if args.baseline is None and BASELINE_PADRAO.exists() and not args.salvar_baseline:
+        args.baseline = str(BASELINE_PADRAO)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressoes = comparar(resultado, baseline, args.tolerancia, args.minimo_ms)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for msg in regressoes:
+                print(f"   • {msg}")
+            sys.exit(1)
+        print(f"\n✅ Sem regressões em relação a {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
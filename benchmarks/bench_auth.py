@@ -0,0 +1,92 @@
+"""
+⏱️ Benchmark de autenticação: token opaco x token assinado
+
+Mede o custo de AuthService.validar_token e de uma requisição autenticada
+completa (GET /api/auth/me pelo test client do Flask) em cada modo.
+
+Uso:
+    python benchmarks/bench_auth.py
+    python benchmarks/bench_auth.py --requisicoes 5000
+    DATABASE_URL=postgresql://... python benchmarks/bench_auth.py --banco-atual
+"""
+
+import os
+import sys
+import time
+import argparse
+import secrets
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _medir(funcao, repeticoes):
+    """Executa `funcao` N vezes e retorna as durações em microssegundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1e6)
+    return tempos
+
+
+def _resumo(tempos):
+    tempos = sorted(tempos)
+    return {
+        'media': statistics.fmean(tempos),
+        'p50': tempos[len(tempos) // 2],
+        'p99': tempos[min(len(tempos) - 1, int(len(tempos) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o custo de autenticação por modo de token')
+    parser.add_argument('--requisicoes', type=int, default=2000, help='Repetições por medição')
+    parser.add_argument(
+        '--banco-atual', action='store_true',
+        help='Usa o banco configurado (DATABASE_URL/OVOS_DB_PATH) em vez de um SQLite temporário'
+    )
+    args = parser.parse_args()
+
+    if not args.banco_atual:
+        os.environ['DATABASE_URL'] = ''
+        os.environ['OVOS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_auth.db')
+
+    from app import app
+    from services.auth_service import AuthService
+
+    client = app.test_client()
+    print("⏱️  EggVault - Benchmark de Autenticação")
+    print(f"   {args.requisicoes} repetições por medição\n")
+    print(f"   {'modo':<10} {'medição':<22} {'média µs':>10} {'p50 µs':>10} {'p99 µs':>10}")
+
+    # O modo assinado exige um segredo configurado
+    AuthService.TOKEN_SECRET = AuthService.TOKEN_SECRET or secrets.token_hex(32).encode()
+
+    resultados = {}
+    for modo in ('opaco', 'assinado'):
+        AuthService.TOKEN_MODE = modo
+        AuthService.limpar_cache_geracao()
+        token = AuthService.login('admin', 'admin')['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        medicoes = {
+            'validar_token': _medir(lambda: AuthService.validar_token(token), args.requisicoes),
+            'GET /api/auth/me': _medir(lambda: client.get('/api/auth/me', headers=headers), args.requisicoes),
+        }
+        for nome, tempos in medicoes.items():
+            r = _resumo(tempos)
+            resultados[(modo, nome)] = r
+            print(f"   {modo:<10} {nome:<22} {r['media']:>10.1f} {r['p50']:>10.1f} {r['p99']:>10.1f}")
+
+    print()
+    for nome in ('validar_token', 'GET /api/auth/me'):
+        opaco = resultados[('opaco', nome)]['media']
+        assinado = resultados[('assinado', nome)]['media']
+        print(f"   {nome}: assinado é {opaco / assinado:.1f}x mais rápido ({opaco - assinado:.1f} µs/req)")
+
+
+if __name__ == '__main__':
+    main()
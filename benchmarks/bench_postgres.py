@@ -0,0 +1,103 @@
+"""
+⏱️ Benchmark dos prepared statements no PostgreSQL
+
+Executa as queries mais frequentes da API (validação de token opaco, saldo
+do estoque, preço ativo, totais do mês e upsert do resumo) pelos próprios
+repositórios, com os prepared statements desligados e ligados, sempre com
+o pool de conexões. Mostra p50/p95 de cada uma e o ganho.
+
+Usa o banco de DATABASE_URL (as tabelas são criadas pelo init_db e o
+benchmark grava movimentos e sessões de teste).
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/bench_postgres.py
+    DATABASE_URL=postgresql://... python benchmarks/bench_postgres.py --repeticoes 5000 --saida pg.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * q))]
+
+
+def _medir(funcao, repeticoes, aquecimento=20):
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {'p50_ms': round(_percentil(tempos, 0.5), 4), 'p95_ms': round(_percentil(tempos, 0.95), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prepared statements ligados x desligados no PostgreSQL')
+    parser.add_argument('--repeticoes', type=int, default=2000, help='Execuções por query e modo')
+    parser.add_argument('--saida', help='Grava o resultado em JSON')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+        print("❌ Defina DATABASE_URL=postgresql://... para rodar este benchmark.")
+        sys.exit(1)
+
+    import database
+    from services.auth_service import AuthService
+    from repositories.estoque_repo import EstoqueRepository
+    from repositories.preco_repo import PrecoRepository
+    from repositories.entrada_repo import EntradaRepository
+    from repositories.saida_repo import SaidaRepository
+    from repositories.resumo_repo import ResumoRepository
+
+    database.init_db()
+    AuthService.TOKEN_MODE = 'opaco'
+    token = AuthService.login('admin', 'admin')['token']
+    mes = datetime.now().strftime('%Y-%m')
+
+    consultas = (
+        ('validar_token', lambda: AuthService.validar_token(token)),
+        ('estoque_atual', EstoqueRepository.get_current),
+        ('preco_ativo', PrecoRepository.get_active),
+        ('total_entradas_mes', lambda: EntradaRepository.get_total_by_month(mes)),
+        ('totais_saidas_mes', lambda: SaidaRepository.get_totals_by_month(mes)),
+        ('resumo_upsert', lambda: ResumoRepository.upsert(mes, 1, 1, 0, 0, 1.0, 0.0, 1.0)),
+    )
+
+    print("⏱️  EggVault - Prepared statements no PostgreSQL")
+    print(f"   {args.repeticoes:,} execuções por query · pool de {database.PG_POOL_MAX} conexões")
+    if database._atras_de_pooler_transacional(database.DATABASE_URL):
+        print("   ⚠️ Porta 6543 (pooler em modo transação): no modo auto o app não prepara statements.")
+    print()
+
+    resultado = {}
+    for modo, ativo in (('sem_prepared', False), ('com_prepared', True)):
+        database._prepared_ativo = ativo
+        database._esvaziar_pool()
+        resultado[modo] = {nome: _medir(funcao, args.repeticoes) for nome, funcao in consultas}
+
+    print(f"   {'query':<20} {'p50 sem':>9} {'p50 com':>9} {'ganho':>7}   {'p95 sem':>9} {'p95 com':>9}")
+    for nome, _ in consultas:
+        sem, com = resultado['sem_prepared'][nome], resultado['com_prepared'][nome]
+        ganho = (1 - com['p50_ms'] / sem['p50_ms']) * 100 if sem['p50_ms'] else 0.0
+        resultado.setdefault('ganho_p50_pct', {})[nome] = round(ganho, 1)
+        print(f"   {nome:<20} {sem['p50_ms']:>9.3f} {com['p50_ms']:>9.3f} {ganho:>6.1f}%   "
+              f"{sem['p95_ms']:>9.3f} {com['p95_ms']:>9.3f}")
+    print(f"\n   {database.estatisticas_postgres()}")
+
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"💾 Resultado: {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+⏱️ Benchmark dos perfis de desempenho do SQLite (durable, balanced, fast)
+
+Gera um banco sintético, copia-o para cada perfil e mede pelos próprios
+repositórios do app:
+
+- escrita serial: movimentos de estoque, um commit por operação;
+- escrita concorrente: os mesmos movimentos em várias threads (com as
+  novas tentativas por banco ocupado, ou pelo escritor com --escritor);
+- leitura: saldo do estoque, entradas do mês e relatório mensal.
+
+Uso:
+    python benchmarks/bench_sqlite.py
+    python benchmarks/bench_sqlite.py --eventos 200000 --operacoes 5000 --threads 8
+    python benchmarks/bench_sqlite.py --perfis balanced,fast --escritor --saida resultado.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * q))]
+
+
+def _resumo(tempos, total_s):
+    tempos = sorted(tempos)
+    return {
+        'ops_s': round(len(tempos) / total_s, 1),
+        'p50_ms': round(_percentil(tempos, 0.50) * 1000, 3),
+        'p95_ms': round(_percentil(tempos, 0.95) * 1000, 3),
+    }
+
+
+def _medir(funcao, operacoes, threads=1):
+    """Executa `funcao` `operacoes` vezes repartidas entre `threads` threads."""
+    tempos, erros = [], []
+
+    def trabalhar(n):
+        locais = []
+        for _ in range(n):
+            inicio = time.perf_counter()
+            try:
+                funcao()
+            except Exception as e:
+                erros.append(e)
+            locais.append(time.perf_counter() - inicio)
+        tempos.extend(locais)
+
+    partes = [operacoes // threads + (1 if i < operacoes % threads else 0) for i in range(threads)]
+    inicio = time.perf_counter()
+    grupo = [threading.Thread(target=trabalhar, args=(n,)) for n in partes]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    resultado = _resumo(tempos, time.perf_counter() - inicio)
+    resultado['erros'] = len(erros)
+    return resultado
+
+
+def _base(dados_dir, eventos, seed):
+    """Gera o banco de referência uma vez, com o WAL já incorporado."""
+    import database
+    from dados_sinteticos import gerar_sqlite
+
+    caminho = Path(dados_dir) / f'perfis_{eventos}_s{seed}.db'
+    if not caminho.exists():
+        database.DB_PATH = str(caminho)
+        database.init_db()
+        gerar_sqlite(str(caminho), eventos, anos=2, seed=seed)
+        conn = sqlite3.connect(caminho)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+    return caminho
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput de escrita/leitura por perfil do SQLite')
+    parser.add_argument('--perfis', default='durable,balanced,fast', help='Perfis a comparar')
+    parser.add_argument('--eventos', type=int, default=20_000, help='Tamanho do banco sintético')
+    parser.add_argument('--seed', type=int, default=42, help='Seed do gerador')
+    parser.add_argument('--operacoes', type=int, default=2000, help='Operações por medida')
+    parser.add_argument('--threads', type=int, default=4, help='Threads na escrita concorrente')
+    parser.add_argument('--escritor', action='store_true', help='Liga SQLITE_WRITER na escrita concorrente')
+    parser.add_argument('--dados-dir', help='Onde guardar/reaproveitar o banco (padrão: temporário)')
+    parser.add_argument('--saida', help='Grava o resultado em JSON')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = ''
+    dados_dir = args.dados_dir or tempfile.mkdtemp(prefix='eggvault_perfis_')
+    Path(dados_dir).mkdir(parents=True, exist_ok=True)
+    os.environ['OVOS_DB_PATH'] = os.path.join(dados_dir, 'inicial.db')
+
+    import database
+    import sqlite_writer
+    from repositories.estoque_repo import EstoqueRepository
+    from repositories.entrada_repo import EntradaRepository
+    from repositories.resumo_repo import ResumoRepository
+
+    print("⏱️  EggVault - Perfis de desempenho do SQLite")
+    print(f"   Banco de {args.eventos:,} eventos · {args.operacoes:,} operações por medida · "
+          f"{args.threads} threads{' com escritor' if args.escritor else ''}\n")
+    base = _base(dados_dir, args.eventos, args.seed)
+    mes = sqlite3.connect(base).execute("SELECT MAX(mes_referencia) FROM entradas").fetchone()[0]
+
+    def ler():
+        EstoqueRepository.get_current()
+        EntradaRepository.get_by_month(mes)
+        ResumoRepository.get_by_month(mes)
+
+    medidas = (
+        ('escrita_serial', lambda: EstoqueRepository.registrar_movimento(1, 'entrada'), 1, False),
+        ('escrita_concorrente', lambda: EstoqueRepository.registrar_movimento(1, 'entrada'),
+         args.threads, args.escritor),
+        ('leitura', ler, 1, False),
+        ('leitura_concorrente', ler, args.threads, False),
+    )
+
+    resultado = {}
+    print(f"   {'perfil':<10} {'medida':<20} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'erros':>6}")
+    for perfil in [p.strip() for p in args.perfis.split(',') if p.strip()]:
+        caminho = Path(dados_dir) / f'perfil_{perfil}.db'
+        for sufixo in ('', '-wal', '-shm'):
+            Path(str(caminho) + sufixo).unlink(missing_ok=True)
+        shutil.copy(base, caminho)
+        database.DB_PATH = str(caminho)
+        database.definir_perfil_sqlite(perfil)
+
+        resultado[perfil] = {'pragmas': database.pragmas_sqlite(perfil)}
+        for nome, funcao, threads, escritor in medidas:
+            database.SQLITE_WRITER = escritor
+            r = _medir(funcao, args.operacoes, threads)
+            sqlite_writer.parar()
+            resultado[perfil][nome] = r
+            print(f"   {perfil:<10} {nome:<20} {r['ops_s']:>10,.1f} {r['p50_ms']:>9.3f} "
+                  f"{r['p95_ms']:>9.3f} {r['erros']:>6}")
+        database.SQLITE_WRITER = False
+        print()
+
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"💾 Resultado: {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""
+🔥 Gerador de carga concorrente (soak / stress)
+
+Simula N operadores usando o sistema ao mesmo tempo com uma mistura de
+operações (logins, vendas, entradas, leituras do painel, relatórios e
+exportações), contra um servidor rodando (--url) ou o app WSGI no
+próprio processo (padrão, com um banco sintético).
+
+A cada intervalo mostra throughput, taxa de erros, erros de lock do
+SQLite ("database is locked") e latências p50/p95/p99; ao final grava
+um JSON com a linha do tempo e o resumo por operação. Os locks vêm do
+cabeçalho X-DB-Busy que o servidor põe nas respostas (ver resiliencia.py),
+não do texto do erro, que o servidor em produção oculta.
+
+Com --taxa a carga é em malha aberta: cada operador tem horários
+programados e a latência é medida a partir do horário programado, de
+modo que um servidor lento não reduz a carga aplicada.
+
+Uso:
+    # 20 operadores por 60s no app em processo (banco de 100 mil eventos)
+    python benchmarks/carga.py --operadores 20 --duracao 60
+
+    # Servidor rodando, 50 req/s no total
+    python benchmarks/carga.py --url http://localhost:5000 --operadores 20 --taxa 50
+
+    # Só escrita, para achar o ponto em que o SQLite começa a travar
+    python benchmarks/carga.py --mix venda=1,entrada=1 --operadores 40
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+MIX_PADRAO = 'leitura=45,relatorio=12,venda=20,entrada=15,exportacao=3,login=5'
+
+
+# ═══════════════════════════════════════════
+# CLIENTES
+# ═══════════════════════════════════════════
+
+class ClienteHTTP:
+    """Cliente para um servidor rodando (urllib, sem dependências)."""
+
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self.headers = {'Content-Type': 'application/json'}
+
+    def requisitar(self, metodo, caminho, corpo=None):
+        dados = json.dumps(corpo).encode() if corpo is not None else None
+        req = urllib.request.Request(self.base + caminho, data=dados, method=metodo, headers=self.headers)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as res:
+                return res.status, res.read(), res.headers
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers
+
+    def autenticar(self, token):
+        self.headers['Authorization'] = f'Bearer {token}'
+
+
+class ClienteWSGI:
+    """Cliente para o app no próprio processo (test client do Flask)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.headers = {}
+
+    def requisitar(self, metodo, caminho, corpo=None):
+        res = self.client.open(
+            caminho, method=metodo, headers=self.headers,
+            data=json.dumps(corpo) if corpo is not None else None, content_type='application/json'
+        )
+        return res.status_code, res.data, res.headers
+
+    def autenticar(self, token):
+        self.headers['Authorization'] = f'Bearer {token}'
+
+
+# ═══════════════════════════════════════════
+# OPERAÇÕES
+# ═══════════════════════════════════════════
+
+def _operacoes(usuario, senha):
+    mes = datetime.now().strftime('%Y-%m')
+    return {
+        'leitura': lambda rng: rng.choice((('GET', '/api/bootstrap', None), ('GET', '/api/estoque', None))),
+        'relatorio': lambda rng: rng.choice((
+            ('GET', f'/api/relatorio?mes={mes}', None),
+            ('GET', f'/api/saidas?mes={mes}', None),
+            ('GET', f'/api/entradas?mes={mes}', None),
+            ('GET', '/api/estoque/historico?granularidade=semana', None),
+        )),
+        'venda': lambda rng: ('POST', '/api/saidas', {'quantidade': rng.choice((6, 12, 12, 30, 60))}),
+        'entrada': lambda rng: ('POST', '/api/entradas', {'quantidade': rng.randint(20, 200)}),
+        'exportacao': lambda rng: ('GET', f'/api/export/excel?mes={mes}', None),
+        'login': lambda rng: ('POST', '/api/auth/login', {'username': usuario, 'password': senha}),
+    }
+
+
+def _busy(headers):
+    """(novas tentativas, falhas) por banco ocupado do cabeçalho X-DB-Busy."""
+    contagem = dict.fromkeys(('tentativas', 'falhas'), 0)
+    for parte in (headers.get('X-DB-Busy') or '').split(','):
+        nome, _, valor = parte.strip().partition('=')
+        if nome in contagem and valor.isdigit():
+            contagem[nome] = int(valor)
+    return contagem['tentativas'], contagem['falhas']
+
+
+def _parse_mix(texto):
+    mix = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        mix[nome.strip()] = float(peso or 1)
+    return mix
+
+
+# ═══════════════════════════════════════════
+# EXECUÇÃO
+# ═══════════════════════════════════════════
+
+def _percentil(ordenados, q):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * q))]
+
+
+def _resumir(amostras, duracao):
+    """amostras: lista de (fim_s, operacao, latencia_ms, status, lock, falha_rede, tentativas_busy)."""
+    latencias = sorted(a[2] for a in amostras)
+    erros = sum(1 for a in amostras if a[3] >= 500 or a[5])
+    return {
+        'requisicoes': len(amostras),
+        'throughput_rps': round(len(amostras) / duracao, 2) if duracao else 0.0,
+        'erros': erros,
+        'taxa_erros': round(erros / len(amostras), 4) if amostras else 0.0,
+        'rejeitadas_4xx': sum(1 for a in amostras if 400 <= a[3] < 500),
+        'locks': sum(1 for a in amostras if a[4]),
+        'tentativas_busy': sum(a[6] for a in amostras),
+        'p50_ms': round(_percentil(latencias, 0.50), 2),
+        'p95_ms': round(_percentil(latencias, 0.95), 2),
+        'p99_ms': round(_percentil(latencias, 0.99), 2),
+        'max_ms': round(latencias[-1], 2) if latencias else 0.0,
+    }
+
+
+def _operador(indice, criar_cliente, operacoes, mix, args, largada, relogio, amostras):
+    rng = random.Random(args.seed * 1000 + indice)
+    cliente = criar_cliente()
+    status, corpo, _ = cliente.requisitar('POST', '/api/auth/login', {'username': args.usuario, 'password': args.senha})
+    # Todos os operadores autenticam antes de a medição começar
+    largada.wait()
+    if status != 200:
+        print(f"❌ Operador {indice}: login falhou ({status})")
+        return
+    cliente.autenticar(json.loads(corpo)['data']['token'])
+    inicio, fim = relogio['inicio'], relogio['fim']
+
+    nomes, pesos = list(mix), list(mix.values())
+    intervalo = args.operadores / args.taxa if args.taxa else 0.0
+    # Espalha os operadores dentro do primeiro intervalo
+    programado = inicio + rng.random() * intervalo
+
+    while True:
+        if intervalo:
+            espera = programado - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            partida = programado
+            programado += intervalo
+        else:
+            partida = time.perf_counter()
+        if partida >= fim:
+            return
+
+        operacao = rng.choices(nomes, pesos)[0]
+        metodo, caminho, payload = operacoes[operacao](rng)
+        falha_rede = False
+        try:
+            status, _, headers = cliente.requisitar(metodo, caminho, payload)
+        except Exception:
+            status, headers, falha_rede = 0, {}, True
+        termino = time.perf_counter()
+        tentativas, falhas = _busy(headers)
+        amostras.append((
+            termino - inicio, operacao, (termino - partida) * 1000, status, falhas > 0, falha_rede, tentativas
+        ))
+
+
+def _relatar(amostras, inicio, fim, intervalo, linha_do_tempo, parar):
+    """Imprime as métricas de cada janela de `intervalo` segundos."""
+    print(f"   {'t (s)':>6} {'req/s':>8} {'erros':>7} {'locks':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    visto = 0
+    janela_inicio = 0.0
+    while not parar.wait(intervalo):
+        agora = time.perf_counter() - inicio
+        novas = amostras[visto:]
+        visto += len(novas)
+        r = _resumir(novas, agora - janela_inicio)
+        linha_do_tempo.append({'t': round(agora, 1), **r})
+        print(f"   {agora:>6.0f} {r['throughput_rps']:>8.1f} {r['taxa_erros']:>6.1%} {r['locks']:>6} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}", flush=True)
+        janela_inicio = agora
+        if time.perf_counter() >= fim:
+            break
+
+
+def executar(criar_cliente, operacoes, mix, args):
+    """
+    Roda a carga: autentica os operadores, mede por `args.duracao` segundos
+    e resume as amostras.
+
+    Returns:
+        Dict com geral, por_operacao e linha_do_tempo.
+    """
+    amostras, linha_do_tempo = [], []
+    relogio = {}
+
+    def iniciar_relogio():
+        relogio['inicio'] = time.perf_counter()
+        relogio['fim'] = relogio['inicio'] + args.duracao
+
+    largada = threading.Barrier(args.operadores + 1, action=iniciar_relogio)
+    operadores = [
+        threading.Thread(
+            target=_operador, name=f'operador-{i}', daemon=True,
+            args=(i, criar_cliente, operacoes, mix, args, largada, relogio, amostras)
+        )
+        for i in range(args.operadores)
+    ]
+    for t in operadores:
+        t.start()
+    print(f"   Autenticando {args.operadores} operadores...")
+    largada.wait()
+    inicio, fim = relogio['inicio'], relogio['fim']
+    parar = threading.Event()
+    relator = threading.Thread(
+        target=_relatar, args=(amostras, inicio, fim, args.intervalo, linha_do_tempo, parar), daemon=True
+    )
+    relator.start()
+    for t in operadores:
+        t.join()
+    parar.set()
+    relator.join()
+
+    duracao = time.perf_counter() - inicio
+    geral = _resumir(amostras, duracao)
+    por_operacao = {
+        nome: _resumir([a for a in amostras if a[1] == nome], duracao)
+        for nome in mix if any(a[1] == nome for a in amostras)
+    }
+    return {'geral': geral, 'por_operacao': por_operacao, 'linha_do_tempo': linha_do_tempo}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga concorrente do EggVault')
+    parser.add_argument('--url', help='Servidor alvo (padrão: app WSGI no próprio processo)')
+    parser.add_argument('--operadores', type=int, default=20, help='Usuários simultâneos (threads)')
+    parser.add_argument('--duracao', type=float, default=60, help='Duração em segundos')
+    parser.add_argument('--taxa', type=float, default=0,
+                        help='Requisições/s no total (0 = o mais rápido possível, malha fechada)')
+    parser.add_argument('--mix', default=MIX_PADRAO, help=f'Pesos das operações (padrão: {MIX_PADRAO})')
+    parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre relatórios parciais')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--senha', default='admin')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--banco', help='SQLite do modo em processo (padrão: gera um sintético temporário)')
+    parser.add_argument('--eventos', type=int, default=100_000, help='Tamanho do banco sintético gerado')
+    parser.add_argument('--saida', help='Arquivo JSON de resultado (padrão: benchmarks/resultados/)')
+    args = parser.parse_args()
+
+    mix = _parse_mix(args.mix)
+    operacoes = _operacoes(args.usuario, args.senha)
+    desconhecidas = set(mix) - set(operacoes)
+    if desconhecidas:
+        parser.error(f"operações desconhecidas no mix: {', '.join(sorted(desconhecidas))}")
+
+    print("🔥 EggVault - Teste de Carga")
+    if args.url:
+        alvo = args.url
+        criar_cliente = lambda: ClienteHTTP(args.url)  # noqa: E731
+    else:
+        os.environ['DATABASE_URL'] = ''
+        banco = args.banco
+        if banco is None:
+            banco = os.path.join(tempfile.mkdtemp(prefix='eggvault_carga_'), 'carga.db')
+        os.environ['OVOS_DB_PATH'] = banco
+        import database
+        from app import app
+        database.init_db()
+        if not args.banco:
+            from dados_sinteticos import gerar_sqlite
+            print(f"   Gerando banco com {args.eventos:,} eventos...")
+            gerar_sqlite(banco, args.eventos, seed=args.seed)
+        alvo = f'app em processo ({banco})'
+        criar_cliente = lambda: ClienteWSGI(app)  # noqa: E731
+
+    taxa = f'{args.taxa:g} req/s' if args.taxa else 'máxima'
+    print(f"   Alvo: {alvo}")
+    print(f"   {args.operadores} operadores · {args.duracao:g}s · taxa {taxa}")
+    print(f"   Mix: {', '.join(f'{k}={v:g}' for k, v in mix.items())}\n")
+
+    r = executar(criar_cliente, operacoes, mix, args)
+    geral, por_operacao, linha_do_tempo = r['geral'], r['por_operacao'], r['linha_do_tempo']
+
+    print(f"\n   {'operação':<12} {'req':>7} {'req/s':>8} {'erros':>7} {'4xx':>5} {'locks':>6} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for nome, r in list(por_operacao.items()) + [('TOTAL', geral)]:
+        print(f"   {nome:<12} {r['requisicoes']:>7} {r['throughput_rps']:>8.1f} {r['taxa_erros']:>6.1%} "
+              f"{r['rejeitadas_4xx']:>5} {r['locks']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+    resultado = {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'alvo': alvo,
+            'operadores': args.operadores,
+            'duracao': args.duracao,
+            'taxa': args.taxa,
+            'mix': mix,
+        },
+        'geral': geral,
+        'por_operacao': por_operacao,
+        'linha_do_tempo': linha_do_tempo,
+    }
+    saida = Path(args.saida) if args.saida else (
+        Path(__file__).parent / 'resultados' / f"carga_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\n💾 Resultado: {saida}")
+    if geral['locks'] or geral['tentativas_busy']:
+        print(f"⚠️  {geral['locks']} erro(s) de lock do banco, "
+              f"{geral['tentativas_busy']} nova(s) tentativa(s) por banco ocupado")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+"""
+🐔 Dados sintéticos para benchmarks e testes de carga
+
+Gera anos de operação de uma granja de forma determinística pela seed:
+coletas (entradas), vendas a clientes com o preço vigente (o preço muda
+a cada trimestre), quebras, consumo próprio e despesas, na proporção de
+PESOS em qualquer tamanho. O estoque nunca fica negativo.
+
+O destino precisa estar sem dados nas tabelas geradas (os ids são
+explícitos); `limpar` apaga os de uma geração anterior.
+
+A escrita é em lotes: executemany em uma única transação no SQLite e
+COPY no PostgreSQL. Ao final, `reconstruir` monta os snapshots do
+livro-razão, o resumo_mensal e a última compra dos clientes a partir
+dos próprios dados, então o banco fica consistente com a API.
+"""
+
+import io
+import csv
+import math
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+
+# Peso de cada tipo entre todos os eventos, em qualquer tamanho de banco
+PESOS = (('saida', 60), ('entrada', 10), ('quebrado', 10), ('consumo', 8), ('despesa', 12))
+
+DESCRICOES_DESPESA = ('Ração', 'Vacinas', 'Energia', 'Embalagens', 'Manutenção', 'Transporte')
+MOTIVOS_QUEBRA = ('Quebra na coleta', 'Quebra no transporte', 'Casca fina', 'Manuseio')
+
+COLUNAS = {
+    'entradas': ('id', 'quantidade', 'data', 'observacao', 'mes_referencia', 'usuario_id', 'usuario_nome'),
+    'saidas': ('id', 'quantidade', 'preco_unitario', 'valor_total', 'data', 'mes_referencia',
+               'usuario_id', 'usuario_nome', 'cliente_id', 'cliente_nome'),
+    'quebrados': ('id', 'quantidade', 'data', 'motivo', 'mes_referencia', 'usuario_id', 'usuario_nome'),
+    'consumo': ('id', 'quantidade', 'data', 'observacao', 'mes_referencia', 'usuario_id', 'usuario_nome'),
+    'despesas': ('id', 'valor', 'descricao', 'data', 'mes_referencia', 'usuario_id', 'usuario_nome'),
+    'estoque_movimentos': ('id', 'delta', 'origem', 'referencia_id', 'data'),
+    'precos': ('id', 'preco_unitario', 'data_inicio', 'ativo'),
+    'clientes': ('id', 'nome', 'numero', 'data_criacao'),
+}
+
+# Tabelas preenchidas pelo gerador (apagadas por `limpar`)
+TABELAS_DADOS = ('estoque_snapshots', 'estoque_movimentos', 'entradas', 'saidas', 'quebrados',
+                 'consumo', 'despesas', 'resumo_mensal', 'precos', 'clientes')
+
+_ORIGEM = {'entradas': 'entrada', 'saidas': 'saida', 'quebrados': 'quebrado', 'consumo': 'consumo'}
+_TABELA = {origem: tabela for tabela, origem in _ORIGEM.items()}
+
+
+# ═══════════════════════════════════════════
+# DESTINOS
+# ═══════════════════════════════════════════
+
+class _DestinoSQLite:
+    postgres = False
+
+    def __init__(self, caminho):
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA cache_size = -200000")
+        self.cursor = self.conn.cursor()
+
+    def executar(self, sql, params=()):
+        self.cursor.execute(sql, params)
+        return self.cursor
+
+    def inserir(self, tabela, linhas):
+        colunas = COLUNAS[tabela]
+        self.cursor.executemany(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            linhas
+        )
+
+    def ajustar_sequencias(self):
+        pass
+
+    def commit(self):
+        self.conn.commit()
+
+    def fechar(self):
+        self.conn.execute("ANALYZE")
+        self.conn.close()
+
+
+class _DestinoPostgres:
+    postgres = True
+
+    def __init__(self, url):
+        import psycopg2
+        self.conn = psycopg2.connect(url)
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("SET synchronous_commit = off")
+
+    def executar(self, sql, params=()):
+        self.cursor.execute(sql.replace('?', '%s'), params)
+        return self.cursor
+
+    def inserir(self, tabela, linhas):
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        for linha in linhas:
+            escritor.writerow(['\\N' if valor is None else valor for valor in linha])
+        buffer.seek(0)
+        self.cursor.copy_expert(
+            f"COPY {tabela} ({', '.join(COLUNAS[tabela])}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+
+    def ajustar_sequencias(self):
+        for tabela in COLUNAS:
+            self.cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {tabela}), 0) + 1, false)"
+            )
+
+    def commit(self):
+        self.conn.commit()
+
+    def fechar(self):
+        self.conn.commit()
+        self.conn.autocommit = True
+        self.conn.cursor().execute("ANALYZE")
+        self.conn.close()
+
+
+def _abrir(destino):
+    if destino.startswith('postgresql'):
+        return _DestinoPostgres(destino)
+    return _DestinoSQLite(destino)
+
+
+# ═══════════════════════════════════════════
+# GERAÇÃO
+# ═══════════════════════════════════════════
+
+def _precos(inicio, fim, rng):
+    """Um preço por trimestre, com reajustes entre 0% e 6%."""
+    precos, data, valor = [], inicio, 0.80
+    while data <= fim:
+        precos.append([len(precos) + 1, round(valor, 2), data.isoformat(), 0])
+        data += timedelta(days=91)
+        valor *= 1 + rng.uniform(0, 0.06)
+    precos[-1][3] = 1
+    return [tuple(p) for p in precos]
+
+
+def _eventos_do_dia(dia, por_dia, rng, tipos, pesos):
+    """
+    Tipos e horários dos eventos de um dia (a coleta, se houver, primeiro).
+
+    Os tipos seguem PESOS em qualquer tamanho: uma coleta fixa por dia
+    faria de um banco pequeno (menos de um evento por dia) só entradas.
+    """
+    total = int(por_dia) + (1 if rng.random() < por_dia - int(por_dia) else 0)
+    if total == 0:
+        return []
+    horarios = sorted(rng.randrange(6 * 3600, 19 * 3600) for _ in range(total))
+    escolhidos = rng.choices(tipos, pesos, k=total)
+    if 'entrada' in escolhidos:
+        escolhidos.remove('entrada')
+        escolhidos.insert(0, 'entrada')
+    return [(tipo, dia + timedelta(seconds=segundos)) for tipo, segundos in zip(escolhidos, horarios)]
+
+
+def gerar(destino, eventos, anos=5, seed=42, clientes=50, lote=50_000, snapshot_intervalo=100,
+          progresso=None):
+    """
+    Popula um banco já inicializado (init_db) com eventos sintéticos.
+
+    Args:
+        destino: Caminho do SQLite ou URL postgresql://.
+        eventos: Número aproximado de eventos (cada um gera uma linha na sua
+                 tabela e, se mexer no estoque, um movimento).
+        anos: Anos de histórico, terminando hoje.
+        seed: Seed do gerador; a mesma seed produz os mesmos dados.
+        clientes: Número de clientes cadastrados.
+        lote: Linhas acumuladas antes de cada escrita.
+        snapshot_intervalo: Movimentos entre snapshots do estoque.
+        progresso: Callback opcional progresso(eventos_gerados).
+
+    Returns:
+        Dict com a contagem por tabela e o saldo final do estoque.
+
+    Raises:
+        ValueError: Se o destino já tiver linhas nas tabelas geradas (os
+                    ids são explícitos e colidiriam; ver `limpar`).
+    """
+    existentes = contar_eventos(destino)
+    if existentes:
+        raise ValueError(f"O destino já tem {existentes} registros nas tabelas geradas; use limpar() antes")
+
+    rng = random.Random(seed)
+    db = _abrir(destino)
+
+    fim = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    dias = 365 * anos
+    inicio = fim - timedelta(days=dias - 1)
+    por_dia = eventos / dias
+    # Coleta média que cobre as vendas, quebras e consumo esperados entre
+    # duas coletas; o estoque tende a ~3 dias de saídas (ou 3 coletas)
+    peso = dict(PESOS)
+    saida_por_evento = (peso['saida'] * 45 + (peso['quebrado'] + peso['consumo']) * 6.5) / sum(peso.values())
+    coleta_media = max(30, int(saida_por_evento * sum(peso.values()) / peso['entrada']))
+    estoque_alvo = max(300, 3 * coleta_media, int(saida_por_evento * por_dia * 3))
+
+    precos = _precos(inicio, fim, rng)
+    cadastro = [
+        (i, f'Cliente {i:04d}', f'(11) 9{rng.randrange(10000, 99999)}-{rng.randrange(1000, 9999)}',
+         (inicio + timedelta(days=rng.randrange(dias))).isoformat())
+        for i in range(1, clientes + 1)
+    ]
+    db.inserir('precos', precos)
+    db.inserir('clientes', cadastro)
+
+    tipos = [t for t, _ in PESOS]
+    pesos = [p for _, p in PESOS]
+    ids = dict.fromkeys(list(COLUNAS), 0)
+    linhas = {tabela: [] for tabela in COLUNAS}
+    contagem = dict.fromkeys(list(_ORIGEM) + ['despesas', 'estoque_movimentos'], 0)
+
+    def descarregar():
+        for tabela in ('entradas', 'saidas', 'quebrados', 'consumo', 'despesas', 'estoque_movimentos'):
+            if linhas[tabela]:
+                db.inserir(tabela, linhas[tabela])
+                linhas[tabela].clear()
+
+    saldo = 0
+    indice_preco = 0
+    gerados = pendentes = 0
+    usuario = (1, 'Administrador')
+    for d in range(dias):
+        dia = inicio + timedelta(days=d)
+        # Postura varia ao longo do ano (menor no inverno)
+        sazonal = 1 + 0.15 * math.sin(2 * math.pi * (dia.timetuple().tm_yday - 80) / 365)
+
+        for tipo, data in _eventos_do_dia(dia, por_dia, rng, tipos, pesos):
+            iso, iso_mes = data.isoformat(), data.strftime('%Y-%m')
+            if tipo == 'saida':
+                quantidade = rng.choice((6, 12, 12, 30, 30, 60, 90, 120))
+            elif tipo in ('quebrado', 'consumo'):
+                quantidade = rng.randint(1, 12)
+            else:
+                quantidade = 0
+            if tipo in ('saida', 'quebrado', 'consumo') and quantidade > saldo:
+                tipo = 'entrada'
+            if tipo == 'entrada':
+                ajuste = (estoque_alvo - saldo) * 0.1
+                quantidade = max(1, int(rng.gauss(coleta_media, coleta_media * 0.15) * sazonal + ajuste))
+
+            if tipo == 'despesa':
+                ids['despesas'] += 1
+                linhas['despesas'].append((
+                    ids['despesas'], round(rng.uniform(10, 500), 2), rng.choice(DESCRICOES_DESPESA),
+                    iso, iso_mes, *usuario
+                ))
+                contagem['despesas'] += 1
+            else:
+                tabela = _TABELA[tipo]
+                ids[tabela] += 1
+                if tipo == 'saida':
+                    while indice_preco + 1 < len(precos) and precos[indice_preco + 1][2] <= iso:
+                        indice_preco += 1
+                    unitario = precos[indice_preco][1]
+                    cliente = rng.randrange(clientes + 1) if clientes else 0
+                    linhas['saidas'].append((
+                        ids[tabela], quantidade, unitario, round(quantidade * unitario, 2), iso, iso_mes,
+                        *usuario, cliente or None, cadastro[cliente - 1][1] if cliente else ''
+                    ))
+                elif tipo == 'quebrado':
+                    linhas['quebrados'].append((
+                        ids[tabela], quantidade, iso, rng.choice(MOTIVOS_QUEBRA), iso_mes, *usuario
+                    ))
+                else:
+                    linhas[tabela].append((ids[tabela], quantidade, iso, '', iso_mes, *usuario))
+
+                delta = quantidade if tipo == 'entrada' else -quantidade
+                saldo += delta
+                ids['estoque_movimentos'] += 1
+                linhas['estoque_movimentos'].append((ids['estoque_movimentos'], delta, tipo, ids[tabela], iso))
+                contagem[tabela] += 1
+                contagem['estoque_movimentos'] += 1
+
+            gerados += 1
+            pendentes += 1
+            if pendentes >= lote:
+                descarregar()
+                pendentes = 0
+                if progresso:
+                    progresso(gerados)
+    descarregar()
+    if progresso:
+        progresso(gerados)
+
+    db.ajustar_sequencias()
+    _reconstruir(db, snapshot_intervalo)
+    db.commit()
+    db.fechar()
+    return {'tabelas': contagem, 'saldo': saldo, 'eventos': gerados}
+
+
+def gerar_sqlite(caminho, eventos, anos=5, seed=42, **kwargs):
+    """Atalho de `gerar` para um arquivo SQLite."""
+    return gerar(str(caminho), eventos, anos, seed, **kwargs)
+
+
+# ═══════════════════════════════════════════
+# RECONSTRUÇÃO
+# ═══════════════════════════════════════════
+
+def reconstruir(destino, snapshot_intervalo=100):
+    """
+    Refaz os dados derivados a partir das tabelas de eventos:
+    snapshots do livro-razão, resumo_mensal e última compra dos clientes.
+    """
+    db = _abrir(destino)
+    _reconstruir(db, snapshot_intervalo)
+    db.commit()
+    db.fechar()
+
+
+def _reconstruir(db, snapshot_intervalo):
+    modulo = '%%' if db.postgres else '%'
+    db.executar("DELETE FROM estoque_snapshots")
+    db.executar(
+        f"""INSERT INTO estoque_snapshots (movimento_id, quantidade_total, data)
+            SELECT id, saldo, data FROM (
+                SELECT id, MAX(data) OVER (ORDER BY id) AS data, SUM(delta) OVER (ORDER BY id) AS saldo
+                FROM estoque_movimentos
+            ) AS acumulado WHERE id {modulo} ? = 0""",
+        (snapshot_intervalo,)
+    )
+
+    db.executar("DELETE FROM resumo_mensal")
+    db.executar(
+        """INSERT INTO resumo_mensal (mes_referencia, total_entradas, total_saidas, total_quebrados,
+                                      total_consumo, faturamento_total, total_despesas, lucro_estimado)
+           SELECT mes, SUM(e), SUM(s), SUM(q), SUM(c),
+                  ROUND(CAST(SUM(f) AS NUMERIC), 2), ROUND(CAST(SUM(d) AS NUMERIC), 2),
+                  ROUND(CAST(SUM(f) - SUM(d) AS NUMERIC), 2) FROM (
+               SELECT mes_referencia AS mes, quantidade AS e, 0 AS s, 0 AS q, 0 AS c,
+                      0.0 AS f, 0.0 AS d FROM entradas
+               UNION ALL SELECT mes_referencia, 0, quantidade, 0, 0, valor_total, 0.0 FROM saidas
+               UNION ALL SELECT mes_referencia, 0, 0, quantidade, 0, 0.0, 0.0 FROM quebrados
+               UNION ALL SELECT mes_referencia, 0, 0, 0, quantidade, 0.0, 0.0 FROM consumo
+               UNION ALL SELECT mes_referencia, 0, 0, 0, 0, 0.0, valor FROM despesas
+           ) AS eventos GROUP BY mes"""
+    )
+
+    db.executar(
+        "UPDATE clientes SET data_ultima_compra = "
+        "(SELECT MAX(data) FROM saidas WHERE saidas.cliente_id = clientes.id)"
+    )
+
+
+def limpar(destino):
+    """Apaga os dados gerados (mantém usuários, sessões e configurações)."""
+    db = _abrir(destino)
+    for tabela in TABELAS_DADOS:
+        db.executar(f"DELETE FROM {tabela}")
+    db.commit()
+    db.conn.close()
+
+
+def contar_eventos(destino):
+    """Número de linhas nas tabelas que o gerador preenche (com ids explícitos)."""
+    db = _abrir(destino)
+    total = sum(db.executar(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0] for tabela in COLUNAS)
+    db.conn.close()
+    return total
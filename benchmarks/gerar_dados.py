@@ -0,0 +1,103 @@
+"""
+🐔 Gerador de dados sintéticos da granja
+
+Escreve anos de entradas diárias, vendas a clientes com mudanças de preço,
+quebras, consumo e despesas direto no SQLite ou PostgreSQL (inserções em
+lote / COPY) e reconstrói o livro-razão do estoque e o resumo_mensal.
+Determinístico pela seed.
+
+Uso:
+    # 1 milhão de eventos em 5 anos num SQLite novo
+    python benchmarks/gerar_dados.py --destino /tmp/granja.db --eventos 1000000
+
+    # PostgreSQL, apagando os dados existentes antes
+    python benchmarks/gerar_dados.py --destino-url "$DATABASE_URL" --eventos 5000000 --limpar
+
+    # Só recalcula snapshots, resumo_mensal e última compra dos clientes
+    python benchmarks/gerar_dados.py --destino /tmp/granja.db --apenas-reconstruir
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def main():
+    """Gera dados sintéticos em SQLite ou PostgreSQL."""
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos realistas da granja')
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--destino', help='Arquivo SQLite (criado se não existir)')
+    destino.add_argument('--destino-url', help='PostgreSQL de destino')
+    parser.add_argument('--eventos', type=int, default=100_000, help='Número aproximado de eventos')
+    parser.add_argument('--anos', type=int, default=5, help='Anos de histórico, terminando hoje')
+    parser.add_argument('--seed', type=int, default=42, help='Seed (mesma seed = mesmos dados)')
+    parser.add_argument('--clientes', type=int, default=50, help='Clientes cadastrados')
+    parser.add_argument('--lote', type=int, default=50_000, help='Eventos por lote de escrita')
+    parser.add_argument(
+        '--snapshot-intervalo', type=int,
+        default=int(os.environ.get('ESTOQUE_SNAPSHOT_INTERVALO', '100')),
+        help='Movimentos entre snapshots do estoque (padrão: ESTOQUE_SNAPSHOT_INTERVALO)'
+    )
+    parser.add_argument('--limpar', action='store_true',
+                        help='Apaga os dados existentes (usuários e configurações são mantidos)')
+    parser.add_argument('--apenas-reconstruir', action='store_true',
+                        help='Não gera eventos; só refaz snapshots, resumo e clientes')
+    args = parser.parse_args()
+
+    # O schema é criado pelo init_db do próprio app, apontado para o destino
+    if args.destino_url:
+        os.environ['DATABASE_URL'] = args.destino_url
+        alvo = args.destino_url
+    else:
+        os.environ['DATABASE_URL'] = ''
+        os.environ['OVOS_DB_PATH'] = str(Path(args.destino).resolve())
+        alvo = str(Path(args.destino).resolve())
+
+    import database
+    import dados_sinteticos
+
+    print("🐔 EggVault - Gerador de Dados Sintéticos\n")
+    database.init_db()
+
+    if args.apenas_reconstruir:
+        inicio = time.perf_counter()
+        dados_sinteticos.reconstruir(alvo, args.snapshot_intervalo)
+        print(f"✅ Dados derivados reconstruídos em {time.perf_counter() - inicio:.1f}s")
+        return
+
+    existentes = dados_sinteticos.contar_eventos(alvo)
+    if existentes:
+        if not args.limpar:
+            print(f"❌ O destino já tem {existentes:,} registros. Use --limpar para apagá-los.")
+            sys.exit(1)
+        print(f"🧹 Apagando {existentes:,} registros existentes...")
+        dados_sinteticos.limpar(alvo)
+
+    print(f"   {args.eventos:,} eventos em {args.anos} anos (seed {args.seed}, {args.clientes} clientes)")
+    inicio = time.perf_counter()
+
+    def progresso(gerados):
+        decorrido = time.perf_counter() - inicio
+        print(f"   {gerados:>12,} eventos · {decorrido:6.1f}s · {gerados / max(decorrido, 1e-9):,.0f}/s",
+              flush=True)
+
+    info = dados_sinteticos.gerar(
+        alvo, args.eventos, args.anos, args.seed, clientes=args.clientes, lote=args.lote,
+        snapshot_intervalo=args.snapshot_intervalo, progresso=progresso
+    )
+    decorrido = time.perf_counter() - inicio
+    linhas = sum(info['tabelas'].values())
+
+    print(f"\n✅ {linhas:,} linhas em {decorrido:.1f}s ({linhas / max(decorrido, 1e-9):,.0f} linhas/s)")
+    for tabela, total in info['tabelas'].items():
+        print(f"   {tabela:<20} {total:>12,}")
+    print(f"   {'saldo do estoque':<20} {info['saldo']:>12,}")
+
+
+if __name__ == '__main__':
+    main()
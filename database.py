@@ -1,6 +1,17 @@
 import os
+import re
+import sys
+import math
+import time
+import random
+import select
+import sqlite3
 import hashlib
 import secrets
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, date
 
 try:
@@ -21,10 +32,557 @@ DB_PATH = os.environ.get(
     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ovos.db')
 )
 
+# Espera por lock (busy_timeout) e novas tentativas de escrita no SQLite
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_RETRY_TENTATIVAS = int(os.environ.get('SQLITE_RETRY_TENTATIVAS', '5'))
+
+# Thread única de escrita com group commit (ver sqlite_writer.py)
+SQLITE_WRITER = os.environ.get('SQLITE_WRITER', '0').strip() in ('1', 'true', 'yes')
+
+# Perfis de desempenho do SQLite (PRAGMAs por conexão). O padrão 'durable'
+# (synchronous FULL) não perde transação confirmada. Com WAL, 'balanced'
+# (synchronous NORMAL) não corrompe o banco, mas numa queda de energia pode
+# perder as últimas transações: é opt-in. 'fast' (synchronous OFF) pode
+# corromper numa queda do sistema operacional e serve para bancos
+# descartáveis (testes, benchmarks).
+PERFIS_SQLITE = {
+    'durable': {'synchronous': 'FULL', 'cache_size': -2000, 'mmap_size': 0, 'temp_store': 'DEFAULT'},
+    'balanced': {'synchronous': 'NORMAL', 'cache_size': -16000, 'mmap_size': 64 * 1024 * 1024,
+                 'temp_store': 'MEMORY'},
+    'fast': {'synchronous': 'OFF', 'cache_size': -64000, 'mmap_size': 256 * 1024 * 1024,
+             'temp_store': 'MEMORY'},
+}
+SQLITE_PERFIL = os.environ.get('SQLITE_PERFIL', 'durable').strip().lower()
+
+# PostgreSQL: conexões ociosas guardadas para reuso (0 = abre uma por uso)
+PG_POOL_MAX = int(os.environ.get('PG_POOL_MAX', '5'))
+
+# Prepared statements automáticos: auto (desliga no pooler em modo transação,
+# porta 6543 do Supabase), on ou off. Uma query passa a ser preparada depois
+# de PG_PREPARE_LIMIAR execuções; cada conexão guarda até PG_PREPARED_MAX.
+PG_PREPARED = os.environ.get('PG_PREPARED', 'auto').strip().lower()
+PG_PREPARE_LIMIAR = int(os.environ.get('PG_PREPARE_LIMIAR', '5'))
+PG_PREPARED_MAX = int(os.environ.get('PG_PREPARED_MAX', '32'))
+
+# Réplicas de leitura do PostgreSQL (URLs separadas por vírgula). Só as
+# leituras marcadas (get_connection(leitura=True)) vão para elas, e só
+# enquanto o atraso de replicação medido for de até REPLICA_LAG_MAX_S
+# segundos; o atraso é medido a cada REPLICA_VERIFICACAO_S segundos.
+REPLICA_URLS = [
+    url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+    if url.strip().startswith('postgresql')
+] if USE_POSTGRES else []
+REPLICA_LAG_MAX_S = float(os.environ.get('REPLICA_LAG_MAX_S', '5'))
+REPLICA_VERIFICACAO_S = float(os.environ.get('REPLICA_VERIFICACAO_S', '5'))
+
+# Resiliência do PostgreSQL: timeout para abrir conexão (s) e por query (ms,
+# 0 = sem limite), tentativas ao abrir conexão e em leituras que falham por
+# erro transitório, e disjuntor (falhas seguidas para abrir, espera aberto)
+PG_CONNECT_TIMEOUT_S = int(os.environ.get('PG_CONNECT_TIMEOUT_S', '5'))
+PG_STATEMENT_TIMEOUT_MS = int(os.environ.get('PG_STATEMENT_TIMEOUT_MS', '30000'))
+PG_RETRY_TENTATIVAS = max(1, int(os.environ.get('PG_RETRY_TENTATIVAS', '3')))
+DB_DISJUNTOR_FALHAS = int(os.environ.get('DB_DISJUNTOR_FALHAS', '5'))
+DB_DISJUNTOR_ESPERA_S = float(os.environ.get('DB_DISJUNTOR_ESPERA_S', '15'))
+
 if USE_POSTGRES:
     import psycopg2
+    import psycopg2.errors
+    import psycopg2.extensions
     from psycopg2.extras import RealDictCursor
 
+    class _PgConexao(psycopg2.extensions.connection):
+        """Conexão física com o cache LRU de prepared statements da sessão."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.preparadas = OrderedDict()   # sql → nome do statement
+
+
+# ═══════════════════════════════════════════
+# PREPARED STATEMENTS (PostgreSQL)
+# ═══════════════════════════════════════════
+
+def _atras_de_pooler_transacional(url):
+    """Porta 6543 = pooler do Supabase (PgBouncer/Supavisor) em modo transação."""
+    return bool(re.search(r'@[^/]*:6543(/|$|\?)', url))
+
+
+_prepared_ativo = USE_POSTGRES and (
+    PG_PREPARED in ('1', 'on', 'true', 'yes')
+    or (PG_PREPARED == 'auto' and not _atras_de_pooler_transacional(DATABASE_URL))
+)
+
+_frequencia_sql = {}          # sql → execuções no processo
+_sql_nao_preparavel = set()   # PREPARE falhou (ex.: tipos não inferíveis)
+estatisticas_prepared = {'preparados': 0, 'execucoes': 0, 'desalocados': 0, 'recusados': 0}
+
+_PREPARAVEL = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+_ERROS_POOLER = ('26000', '42P05')   # statement inexistente / já existente na sessão
+
+
+def _texto_prepare(sql):
+    """Troca os %s do psycopg2 por $1..$n (e %% por %)."""
+    contador = iter(range(1, 10_000))
+    return re.sub(r'%%|%s', lambda m: '%' if m.group() == '%%' else f'${next(contador)}', sql)
+
+
+def _statement_preparado(conn, cursor, sql, params):
+    """
+    Nome do prepared statement para `sql` nesta conexão, preparando-o se a
+    query já for frequente. None = executar normalmente.
+    """
+    if not _prepared_ativo or not hasattr(conn, 'preparadas') or ';' in sql or not _PREPARAVEL.match(sql):
+        return None
+    nome = conn.preparadas.get(sql)
+    if nome is not None:
+        conn.preparadas.move_to_end(sql)
+        return nome
+
+    vezes = _frequencia_sql.get(sql, 0) + 1
+    if len(_frequencia_sql) > 2000:
+        _frequencia_sql.clear()   # SQL dinâmico (listas IN variáveis) não cresce sem limite
+    _frequencia_sql[sql] = vezes
+    if vezes < PG_PREPARE_LIMIAR or sql in _sql_nao_preparavel:
+        return None
+
+    while len(conn.preparadas) >= PG_PREPARED_MAX:
+        _, antigo = conn.preparadas.popitem(last=False)
+        cursor.execute(f'DEALLOCATE {antigo}')
+        estatisticas_prepared['desalocados'] += 1
+
+    nome = 'ev_' + hashlib.md5(sql.encode()).hexdigest()[:16]
+    # Em savepoint: se o PREPARE falhar, a transação do chamador continua válida
+    cursor.execute('SAVEPOINT ev_prepare')
+    try:
+        # Sem parâmetros o psycopg2 não interpola: o SQL vai como está
+        cursor.execute(f'PREPARE {nome} AS {_texto_prepare(sql) if params else sql}')
+    except psycopg2.Error as e:
+        cursor.execute('ROLLBACK TO SAVEPOINT ev_prepare')
+        if e.pgcode in _ERROS_POOLER:
+            raise
+        _sql_nao_preparavel.add(sql)
+        estatisticas_prepared['recusados'] += 1
+        return None
+    cursor.execute('RELEASE SAVEPOINT ev_prepare')
+    conn.preparadas[sql] = nome
+    estatisticas_prepared['preparados'] += 1
+    return nome
+
+
+def _desligar_prepared():
+    """Desliga os prepared statements no processo (sessão trocada pelo pooler)."""
+    global _prepared_ativo
+    _prepared_ativo = False
+    with _pool_lock:
+        for ociosas in _pool_pg.values():
+            for conn in ociosas:
+                conn.preparadas.clear()
+
+
+# ═══════════════════════════════════════════
+# RESILIÊNCIA (PostgreSQL)
+# ═══════════════════════════════════════════
+
+class BancoIndisponivel(Exception):
+    """Banco fora do ar ou disjuntor aberto; a request pode ser repetida depois."""
+
+    def __init__(self, mensagem='Banco de dados indisponível, tente novamente em instantes', retry_after=None):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+class Disjuntor:
+    """
+    Circuit breaker de três estados para as conexões com o banco.
+
+    fechado → (falhas_limite falhas seguidas) → aberto → (espera_s) →
+    meio_aberto → uma chamada de teste → fechado (sucesso) ou aberto (falha).
+    Aberto, recusa na hora com BancoIndisponivel em vez de esperar timeouts.
+    """
+
+    FECHADO, ABERTO, MEIO_ABERTO = 'fechado', 'aberto', 'meio_aberto'
+
+    def __init__(self, falhas_limite, espera_s, ao_abrir=None, relogio=time.monotonic):
+        self.falhas_limite = falhas_limite
+        self.espera_s = espera_s
+        self._ao_abrir = ao_abrir
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._testando = False
+        self.aberturas = 0
+        self.rejeitadas = 0
+
+    def _restante(self):
+        return max(0.0, self._aberto_em + self.espera_s - self._relogio())
+
+    def rejeitando(self):
+        """True se uma chamada agora seria recusada (não consome o teste do meio-aberto)."""
+        with self._lock:
+            if self._estado == self.ABERTO:
+                return self._restante() > 0
+            return self._estado == self.MEIO_ABERTO and self._testando
+
+    def permitir(self):
+        """
+        Autoriza uma chamada ao banco.
+
+        Raises:
+            BancoIndisponivel: Se estiver aberto (ou meio-aberto já testando).
+        """
+        with self._lock:
+            if self._estado == self.FECHADO:
+                return
+            restante = self._restante()
+            if self._estado == self.ABERTO and restante == 0:
+                self._estado = self.MEIO_ABERTO
+            if self._estado == self.MEIO_ABERTO and not self._testando:
+                self._testando = True
+                return
+            self.rejeitadas += 1
+        raise BancoIndisponivel(retry_after=max(1, math.ceil(restante)))
+
+    def sucesso(self):
+        with self._lock:
+            self._estado = self.FECHADO
+            self._falhas = 0
+            self._testando = False
+
+    def falha(self):
+        """Conta uma falha; abre ao atingir o limite ou se o teste do meio-aberto falhar."""
+        with self._lock:
+            self._falhas += 1
+            abrir = self._estado == self.MEIO_ABERTO or (
+                self._estado == self.FECHADO and self._falhas >= self.falhas_limite)
+            if abrir:
+                self._estado = self.ABERTO
+                self._aberto_em = self._relogio()
+                self._testando = False
+                self.aberturas += 1
+        if abrir and self._ao_abrir is not None:
+            self._ao_abrir()
+
+    def chamar(self, funcao, eh_falha):
+        """
+        Executa `funcao()` protegida pelo disjuntor.
+
+        Só exceções com `eh_falha(e)` True contam como falha; as demais
+        mostram que o banco respondeu e contam como sucesso.
+        """
+        self.permitir()
+        try:
+            resultado = funcao()
+        except Exception as e:
+            if eh_falha(e):
+                self.falha()
+            else:
+                self.sucesso()
+            raise
+        self.sucesso()
+        return resultado
+
+    def estado(self):
+        with self._lock:
+            return {
+                'estado': self._estado,
+                'falhas_seguidas': self._falhas,
+                'retry_after_s': math.ceil(self._restante()) if self._estado == self.ABERTO else 0,
+                'aberturas': self.aberturas,
+                'rejeitadas': self.rejeitadas,
+            }
+
+
+# Conexões com o primário; ao abrir, as ociosas do pool (provavelmente mortas) são descartadas
+disjuntor = Disjuntor(DB_DISJUNTOR_FALHAS, DB_DISJUNTOR_ESPERA_S,
+                      ao_abrir=lambda: _esvaziar_pool(DATABASE_URL))
+
+estatisticas_resiliencia = {'tentativas_conexao': 0, 'tentativas_leitura': 0, 'tentativas_escrita': 0}
+
+# Servidor encerrando/reiniciando ou sem vagas: vale tentar de novo
+_PGCODES_CONEXAO = ('57P01', '57P02', '57P03', '53300')
+_PGCODES_TRANSITORIOS = _PGCODES_CONEXAO + ('40001', '40P01')   # + serialização e deadlock
+
+_SOMENTE_LEITURA = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+_ESCREVE = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE)\b|\bFOR\s+UPDATE\b', re.IGNORECASE)
+
+
+def _dormir_backoff(tentativa, base=0.05, maximo=1.0):
+    """Backoff exponencial com jitter completo: espera em [0, min(maximo, base * 2^tentativa)]."""
+    time.sleep(random.uniform(0, min(maximo, base * (2 ** tentativa))))
+
+
+def _eh_falha_de_conexao(erro):
+    """Conexão recusada, caída ou servidor reiniciando (não inclui statement_timeout, 57014)."""
+    if not isinstance(erro, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return False
+    return erro.pgcode is None or erro.pgcode.startswith('08') or erro.pgcode in _PGCODES_CONEXAO
+
+
+def _eh_erro_transitorio(erro):
+    return _eh_falha_de_conexao(erro) or getattr(erro, 'pgcode', None) in _PGCODES_TRANSITORIOS
+
+
+def _leitura_repetivel(sql):
+    return bool(_SOMENTE_LEITURA.match(sql)) and not _ESCREVE.search(sql)
+
+
+def _abrir_postgres(url, connect_timeout):
+    """Abre uma conexão física com timeout de conexão e statement_timeout."""
+    extra = {'connect_timeout': connect_timeout} if connect_timeout else {}
+    # O pooler em modo transação (porta 6543) não aceita parâmetros de sessão na conexão
+    if PG_STATEMENT_TIMEOUT_MS and not _atras_de_pooler_transacional(url):
+        extra['options'] = f'-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}'
+    conn = psycopg2.connect(url, connection_factory=_PgConexao, **extra)
+    conn.url = url
+    return conn
+
+
+def _abrir_primario():
+    """
+    Nova conexão com o primário, protegida pelo disjuntor e com novas
+    tentativas (backoff com jitter) em falhas de conexão.
+
+    Raises:
+        BancoIndisponivel: Disjuntor aberto ou tentativas esgotadas.
+    """
+    for tentativa in range(PG_RETRY_TENTATIVAS):
+        try:
+            return disjuntor.chamar(lambda: _abrir_postgres(DATABASE_URL, PG_CONNECT_TIMEOUT_S),
+                                    _eh_falha_de_conexao)
+        except psycopg2.Error as e:
+            if not _eh_falha_de_conexao(e):
+                raise
+            if tentativa == PG_RETRY_TENTATIVAS - 1:
+                raise BancoIndisponivel(retry_after=disjuntor.estado()['retry_after_s'] or 1) from e
+        estatisticas_resiliencia['tentativas_conexao'] += 1
+        _dormir_backoff(tentativa)
+
+
+def escutar(canais, ao_notificar, ao_conectar=None):
+    """
+    LISTEN em uma conexão dedicada ao primário; nunca retorna.
+
+    `ao_notificar(canal, payload)` é chamado a cada NOTIFY e `ao_conectar()`
+    a cada (re)conexão: o que foi notificado com a conexão caída se perdeu.
+    Se a conexão cair, reconecta com backoff. Rodar numa thread daemon.
+    """
+    tentativa = 0
+    while True:
+        conn = None
+        try:
+            conn = _abrir_postgres(DATABASE_URL, PG_CONNECT_TIMEOUT_S)
+            conn.autocommit = True
+            cursor = conn.cursor()
+            for canal in canais:
+                cursor.execute(f'LISTEN {canal}')
+            tentativa = 0
+            if ao_conectar:
+                ao_conectar()
+            while True:
+                if select.select([conn], [], [], 15) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = conn.notifies.pop(0)
+                    ao_notificar(aviso.channel, aviso.payload)
+        except Exception as e:
+            print(f"⚠️ LISTEN {', '.join(canais)} caiu: {e}", file=sys.stderr)
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            _dormir_backoff(tentativa, base=0.5, maximo=30.0)
+            tentativa += 1
+
+
+# ═══════════════════════════════════════════
+# POOL (PostgreSQL)
+# ═══════════════════════════════════════════
+
+_pool_pg = {}          # url → conexões ociosas (LIFO); primário e réplicas
+_pool_lock = threading.Lock()
+_pool_pid = os.getpid()
+
+# Réplica fora do ar não pode segurar a request esperando o TCP
+_REPLICA_CONNECT_TIMEOUT_S = 2
+
+
+def _conectar_postgres(url=None):
+    """Conexão ociosa do pool de `url` (padrão: primário) ou uma nova; nunca bloqueia esperando vaga."""
+    global _pool_pid
+    url = url or DATABASE_URL
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pool_pg.clear()   # herdadas do processo pai
+            _pool_pid = os.getpid()
+        ociosas = _pool_pg.get(url, [])
+        while ociosas:
+            conn = ociosas.pop()
+            if not conn.closed:
+                return conn
+    if url == DATABASE_URL:
+        return _abrir_primario()
+    return _abrir_postgres(url, _REPLICA_CONNECT_TIMEOUT_S)
+
+
+def _devolver_postgres(conn):
+    """Desfaz a transação pendente e guarda a conexão, se couber no pool."""
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        conn.close()
+        return
+    with _pool_lock:
+        ociosas = _pool_pg.setdefault(getattr(conn, 'url', DATABASE_URL), [])
+        if _pool_pid == os.getpid() and len(ociosas) < PG_POOL_MAX:
+            ociosas.append(conn)
+            return
+    conn.close()
+
+
+def _esvaziar_pool(url=None):
+    """Fecha as conexões ociosas do pool de `url` (None = todos)."""
+    with _pool_lock:
+        if url is None:
+            ociosas = [conn for lista in _pool_pg.values() for conn in lista]
+            _pool_pg.clear()
+        else:
+            ociosas = _pool_pg.pop(url, [])
+    for conn in ociosas:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def estatisticas_postgres():
+    """Pool, prepared statements, réplicas e disjuntor do processo atual."""
+    with _pool_lock:
+        ociosas = len(_pool_pg.get(DATABASE_URL, []))
+        ociosas_replicas = sum(len(lista) for url, lista in _pool_pg.items() if url != DATABASE_URL)
+    return {
+        'pool_ociosas': ociosas,
+        'pool_ociosas_replicas': ociosas_replicas,
+        'pool_max': PG_POOL_MAX,
+        'prepared_ativo': _prepared_ativo,
+        **estatisticas_prepared,
+        **estatisticas_replicas,
+        'replicas': estado_replicas(),
+        **estatisticas_resiliencia,
+        'disjuntor': disjuntor.estado(),
+    }
+
+
+# ═══════════════════════════════════════════
+# RÉPLICAS DE LEITURA (PostgreSQL)
+# ═══════════════════════════════════════════
+
+# True = toda leitura desta request/bloco vai para o primário
+_forcar_primario = contextvars.ContextVar('forcar_primario', default=False)
+
+_replicas = {}            # url → {'atraso_s', 'verificado', 'erro', 'medindo'}
+_replicas_lock = threading.Lock()
+_proxima_replica = 0      # round-robin entre as réplicas
+estatisticas_replicas = {'leituras_replica': 0, 'leituras_primario': 0, 'falhas_replica': 0}
+
+# Sem WAL pendente de replay a réplica está em dia, mesmo com o primário
+# parado há tempo; senão, idade da última transação aplicada. NULL (nada
+# aplicado ainda) = atraso desconhecido.
+_SQL_ATRASO = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@contextmanager
+def primario():
+    """Dentro do bloco, as leituras vão para o primário (read-your-writes)."""
+    token = _forcar_primario.set(True)
+    try:
+        yield
+    finally:
+        _forcar_primario.reset(token)
+
+
+def _medir_atraso(url):
+    """Atraso de replicação da réplica em segundos (None = desconhecido)."""
+    conn = _conectar_postgres(url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_ATRASO)
+            atraso = cursor.fetchone()[0]
+    except psycopg2.Error:
+        conn.close()
+        raise
+    _devolver_postgres(conn)
+    return None if atraso is None else float(atraso)
+
+
+def _registrar_estado(url, atraso, erro=None):
+    with _replicas_lock:
+        _replicas[url] = {'atraso_s': atraso, 'verificado': time.monotonic(), 'erro': erro, 'medindo': False}
+
+
+def _replica_disponivel(url):
+    """
+    True se o último atraso medido da réplica estiver dentro do limite.
+    Remede quando a medida vence; só uma thread mede, as outras usam a anterior.
+    """
+    with _replicas_lock:
+        estado = _replicas.setdefault(
+            url, {'atraso_s': None, 'verificado': None, 'erro': None, 'medindo': False})
+        medir = not estado['medindo'] and (
+            estado['verificado'] is None or time.monotonic() - estado['verificado'] >= REPLICA_VERIFICACAO_S)
+        if medir:
+            estado['medindo'] = True
+    if medir:
+        try:
+            _registrar_estado(url, _medir_atraso(url))
+        except Exception as e:
+            _registrar_estado(url, None, str(e))
+    with _replicas_lock:
+        atraso = _replicas[url]['atraso_s']
+    return atraso is not None and atraso <= REPLICA_LAG_MAX_S
+
+
+def _url_leitura():
+    """Réplica disponível para uma leitura (round-robin) ou o primário."""
+    global _proxima_replica
+    if REPLICA_URLS and not _forcar_primario.get():
+        for _ in range(len(REPLICA_URLS)):
+            with _replicas_lock:
+                url = REPLICA_URLS[_proxima_replica % len(REPLICA_URLS)]
+                _proxima_replica += 1
+            if _replica_disponivel(url):
+                estatisticas_replicas['leituras_replica'] += 1
+                return url
+    estatisticas_replicas['leituras_primario'] += 1
+    return DATABASE_URL
+
+
+def estado_replicas():
+    """Atraso e disponibilidade de cada réplica (sem expor as URLs)."""
+    with _replicas_lock:
+        estados = [_replicas.get(url, {}) for url in REPLICA_URLS]
+    return [
+        {
+            'replica': indice,
+            'atraso_s': estado.get('atraso_s'),
+            'disponivel': estado.get('atraso_s') is not None and estado['atraso_s'] <= REPLICA_LAG_MAX_S,
+            'erro': estado.get('erro'),
+        }
+        for indice, estado in enumerate(estados)
+    ]
+
 
 # ═══════════════════════════════════════════
 # WRAPPER  PostgreSQL → interface sqlite3
@@ -33,8 +591,9 @@ if USE_POSTGRES:
 class PgCursorWrapper:
     """Adapta cursor psycopg2 para comportar-se como sqlite3.Cursor."""
 
-    def __init__(self, cursor):
+    def __init__(self, cursor, dono=None):
         self._cursor = cursor
+        self._dono = dono   # PgConnectionWrapper, para reconectar
         self._lastrowid = None
 
     # ── propriedades ──
@@ -60,10 +619,24 @@ class PgCursorWrapper:
         if is_insert and 'RETURNING' not in sql.upper():
             sql = sql.rstrip().rstrip(';') + ' RETURNING id'
 
-        if params:
-            self._cursor.execute(sql, params)
-        else:
-            self._cursor.execute(sql)
+        conn = self._cursor.connection
+        ocioso = conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        try:
+            self._executar(conn, sql, params)
+        except psycopg2.Error as e:
+            if e.pgcode in _ERROS_POOLER and _prepared_ativo:
+                # PgBouncer/Supavisor em modo transação trocou a sessão: desliga os
+                # prepared statements e repete a query se ela abria a transação.
+                _desligar_prepared()
+                conn.preparadas.clear()
+                if not ocioso:
+                    raise
+                conn.rollback()
+                self._executar(conn, sql, params)
+            elif ocioso and self._dono is not None and _leitura_repetivel(sql) and _eh_erro_transitorio(e):
+                self._repetir_leitura(e, sql, params)
+            else:
+                raise
 
         if is_insert:
             try:
@@ -75,6 +648,39 @@ class PgCursorWrapper:
 
         return self
 
+    def _executar(self, conn, sql, params):
+        nome = _statement_preparado(conn, self._cursor, sql, params)
+        if nome is not None:
+            marcadores = ', '.join(['%s'] * len(params)) if params else ''
+            self._cursor.execute(f'EXECUTE {nome} ({marcadores})' if marcadores else f'EXECUTE {nome}', params)
+            estatisticas_prepared['execucoes'] += 1
+        elif params:
+            self._cursor.execute(sql, params)
+        else:
+            self._cursor.execute(sql)
+
+    def _repetir_leitura(self, erro, sql, params):
+        """
+        Repete uma leitura que abria a transação: nada foi feito nela, então
+        repetir é seguro. Conexão perdida → nova conexão; deadlock ou
+        serialização → rollback e de novo na mesma.
+        """
+        for tentativa in range(PG_RETRY_TENTATIVAS - 1):
+            _dormir_backoff(tentativa)
+            estatisticas_resiliencia['tentativas_leitura'] += 1
+            try:
+                if _eh_falha_de_conexao(erro):
+                    self._cursor = self._dono._reconectar()
+                else:
+                    self._cursor.connection.rollback()
+                self._executar(self._cursor.connection, sql, params)
+                return
+            except psycopg2.Error as e:
+                if not _eh_erro_transitorio(e):
+                    raise
+                erro = e
+        raise erro
+
     def executescript(self, sql):
         """Executa múltiplos statements (compatibilidade com sqlite3)."""
         self._cursor.execute(sql)
@@ -123,7 +729,7 @@ class PgConnectionWrapper:
         self._conn = conn
 
     def cursor(self):
-        return PgCursorWrapper(self._conn.cursor(cursor_factory=RealDictCursor))
+        return PgCursorWrapper(self._conn.cursor(cursor_factory=RealDictCursor), self)
 
     def execute(self, sql, params=None):
         cursor = self.cursor()
@@ -133,26 +739,360 @@ class PgConnectionWrapper:
     def commit(self):
         self._conn.commit()
 
+    def rollback(self):
+        self._conn.rollback()
+
     def close(self):
-        self._conn.close()
+        if self._conn is not None:
+            _devolver_postgres(self._conn)
+            self._conn = None
+
+    def _reconectar(self):
+        """Troca a conexão perdida por uma nova do mesmo servidor; devolve um cursor dela."""
+        url = getattr(self._conn, 'url', DATABASE_URL)
+        try:
+            self._conn.close()
+        except psycopg2.Error:
+            pass
+        # As ociosas do mesmo servidor provavelmente caíram junto
+        _esvaziar_pool(url)
+        self._conn = _conectar_postgres(url)
+        return self._conn.cursor(cursor_factory=RealDictCursor)
+
+
+# ═══════════════════════════════════════════
+# INSTRUMENTAÇÃO (opcional)
+# ═══════════════════════════════════════════
+
+# Observadores de queries. Cada um implementa:
+#   query(sql, params, duracao, conn)  — após cada execute
+#   fetch(duracao)                     — após cada fetchone/fetchall
+# Sem observadores, get_connection devolve a conexão sem nenhum wrapper.
+_observadores = []
+
+
+def registrar_observador(observador):
+    """Passa a envolver as conexões e notificar `observador` a cada query."""
+    if observador not in _observadores:
+        _observadores.append(observador)
+
+
+def remover_observador(observador):
+    """Remove um observador registrado."""
+    if observador in _observadores:
+        _observadores.remove(observador)
+
+
+class InstrumentedCursorWrapper:
+    """Cursor que mede o tempo de cada execute/fetch e avisa os observadores."""
+
+    def __init__(self, cursor, conn):
+        self._wrapped = cursor
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._wrapped, nome)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _executar(self, metodo, sql, *args):
+        inicio = time.perf_counter()
+        getattr(self._wrapped, metodo)(sql, *args)
+        duracao = time.perf_counter() - inicio
+        params = args[0] if args else None
+        for observador in _observadores:
+            observador.query(sql, params, duracao, self._conn)
+        return self
+
+    def execute(self, sql, params=None):
+        if params is None:
+            return self._executar('execute', sql)
+        return self._executar('execute', sql, params)
+
+    def executemany(self, sql, seq_params):
+        return self._executar('executemany', sql, seq_params)
+
+    def executescript(self, sql):
+        return self._executar('executescript', sql)
+
+    def _buscar(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = getattr(self._wrapped, metodo)(*args)
+        duracao = time.perf_counter() - inicio
+        for observador in _observadores:
+            observador.fetch(duracao)
+        return resultado
+
+    def fetchone(self):
+        return self._buscar('fetchone')
+
+    def fetchall(self):
+        return self._buscar('fetchall')
+
+    def fetchmany(self, *args):
+        return self._buscar('fetchmany', *args)
+
+
+class InstrumentedConnectionWrapper:
+    """Conexão cujos cursores são instrumentados (SQLite ou PostgreSQL)."""
+
+    def __init__(self, conn):
+        self._wrapped = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._wrapped, nome)
+
+    def cursor(self):
+        return InstrumentedCursorWrapper(self._wrapped.cursor(), self._wrapped)
+
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
 
 
 # ═══════════════════════════════════════════
 # CONEXÃO
 # ═══════════════════════════════════════════
 
-def get_connection():
-    """Cria e retorna uma conexão com o banco de dados."""
+def pragmas_sqlite(perfil=None):
+    """
+    PRAGMAs do perfil (SQLITE_PERFIL), com ajustes individuais por variável
+    de ambiente (SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE,
+    SQLITE_TEMP_STORE).
+
+    Raises:
+        ValueError: Se o perfil não existir.
+    """
+    perfil = perfil or SQLITE_PERFIL
+    if perfil not in PERFIS_SQLITE:
+        raise ValueError(f"Perfil SQLite inválido: {perfil} (use {', '.join(PERFIS_SQLITE)})")
+    pragmas = dict(PERFIS_SQLITE[perfil])
+    for nome in pragmas:
+        valor = os.environ.get(f'SQLITE_{nome.upper()}', '').strip()
+        if valor:
+            pragmas[nome] = valor.upper() if not valor.lstrip('-').isdigit() else int(valor)
+    return pragmas
+
+
+def _script_pragmas(perfil=None):
+    return ''.join(f"PRAGMA {nome} = {valor};" for nome, valor in pragmas_sqlite(perfil).items())
+
+
+# Montado uma vez por processo; aplicado ao abrir cada conexão
+_PRAGMAS_SQLITE = _script_pragmas() if not USE_POSTGRES else ''
+
+
+def definir_perfil_sqlite(perfil):
+    """Troca o perfil das próximas conexões (benchmarks/testes)."""
+    global SQLITE_PERFIL, _PRAGMAS_SQLITE
+    _PRAGMAS_SQLITE = _script_pragmas(perfil)
+    SQLITE_PERFIL = perfil
+
+
+def _conectar_sqlite():
+    """Abre uma conexão SQLite configurada (sem wrapper)."""
+    novo = not os.path.exists(DB_PATH) or os.path.getsize(DB_PATH) == 0
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    if novo:
+        # auto_vacuum só vale antes da primeira página; permite que a
+        # manutenção devolva páginas livres com incremental_vacuum.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_PRAGMAS_SQLITE)
+    return conn
+
+
+def _envolver(conn):
+    """Envolve a conexão para os observadores, se houver algum."""
+    if _observadores:
+        return InstrumentedConnectionWrapper(conn)
+    return conn
+
+
+def get_connection(leitura=False):
+    """
+    Cria e retorna uma conexão com o banco de dados.
+
+    Args:
+        leitura: True para consultas que aceitam dados de uma réplica
+            (DATABASE_REPLICA_URLS); escritas e leituras que precisam ver a
+            última escrita usam o padrão (primário).
+    """
     if USE_POSTGRES:
-        conn = psycopg2.connect(DATABASE_URL)
-        return PgConnectionWrapper(conn)
+        url = _url_leitura() if leitura else DATABASE_URL
+        try:
+            conn = PgConnectionWrapper(_conectar_postgres(url))
+        except psycopg2.OperationalError as e:
+            if url == DATABASE_URL:
+                raise
+            # Réplica caiu entre duas medidas: fica fora até a próxima
+            _registrar_estado(url, None, str(e))
+            estatisticas_replicas['falhas_replica'] += 1
+            conn = PgConnectionWrapper(_conectar_postgres())
     else:
-        import sqlite3
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.execute("PRAGMA journal_mode = WAL")
-        return conn
+        conn = _conectar_sqlite()
+    return _envolver(conn)
+
+
+# ═══════════════════════════════════════════
+# ESCRITA
+# ═══════════════════════════════════════════
+
+# Contadores das novas tentativas por SQLITE_BUSY (lidos pelas métricas)
+estatisticas_escrita = {'tentativas_busy': 0, 'falhas_busy': 0}
+# Os mesmos contadores, só da request atual (cabeçalho X-DB-Busy, ver resiliencia.py)
+_busy_request = contextvars.ContextVar('busy_request', default=None)
+
+
+def iniciar_contagem_busy():
+    """Zera os contadores de banco ocupado da request atual."""
+    _busy_request.set({'tentativas_busy': 0, 'falhas_busy': 0})
+
+
+def contagem_busy():
+    """Novas tentativas e falhas por banco ocupado na request atual (None fora de uma)."""
+    return _busy_request.get()
+
+
+def registrar_busy(chave):
+    """Conta uma nova tentativa ('tentativas_busy') ou falha ('falhas_busy')."""
+    estatisticas_escrita[chave] += 1
+    repassar_busy({chave: 1})
+
+
+def repassar_busy(contagem):
+    """Soma à request atual o que outra thread contou por ela (ex.: o escritor)."""
+    atual = _busy_request.get()
+    if atual is not None and contagem:
+        for chave, valor in contagem.items():
+            atual[chave] += valor
+
+
+def eh_erro_de_lock(erro):
+    """True se o erro for SQLITE_BUSY / 'database is locked'."""
+    if not isinstance(erro, sqlite3.OperationalError):
+        return False
+    mensagem = str(erro).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+
+def esperar_nova_tentativa(tentativa, base=0.01, maximo=0.5):
+    """Backoff exponencial com jitter completo entre tentativas de escrita no SQLite."""
+    registrar_busy('tentativas_busy')
+    _dormir_backoff(tentativa, base, maximo)
+
+
+# Função gravada junto com a primeira escrita do bloco (ver vincular_primeira_escrita)
+_vinculo = contextvars.ContextVar('vinculo_escrita', default=None)
+
+
+@contextmanager
+def vincular_primeira_escrita(funcao):
+    """
+    Roda `funcao(conn)` na transação da primeira executar_escrita do bloco,
+    antes da unidade: as duas são gravadas juntas ou nenhuma é.
+
+    Usado pelo Idempotency-Key: a chave só existe no banco se a escrita da
+    request também existir.
+
+    Yields:
+        Dict com 'gravada' (True depois do commit dessa primeira escrita).
+    """
+    estado = {'funcao': funcao, 'gravada': False}
+    token = _vinculo.set(estado)
+    try:
+        yield estado
+    finally:
+        _vinculo.reset(token)
+
+
+def executar_escrita(unidade):
+    """
+    Executa uma unidade de escrita em uma transação e retorna seu resultado.
+
+    `unidade(conn)` recebe a conexão, executa os comandos e não faz commit
+    nem close. Se levantar exceção, nada do que ela escreveu é gravado.
+    Dentro de vincular_primeira_escrita, a primeira unidade leva junto a
+    função vinculada.
+
+    - PostgreSQL: conexão própria, commit/rollback; a unidade é repetida
+      (PG_RETRY_TENTATIVAS) se falhar por conexão perdida, deadlock ou
+      serialização antes do COMMIT.
+    - SQLite com SQLITE_WRITER=1: enfileira na thread de escrita, que
+      agrupa várias unidades no mesmo commit (sqlite_writer.py).
+    - SQLite: BEGIN IMMEDIATE (o lock de escrita é pego no início, sem
+      upgrade de leitura para escrita) e novas tentativas com backoff se o
+      banco estiver ocupado além do busy_timeout. Só o BEGIN é repetido:
+      no SQLite a unidade roda no máximo uma vez.
+    """
+    vinculo = _vinculo.get()
+    if vinculo is None or vinculo['gravada']:
+        return _executar_escrita(unidade)
+
+    def _com_vinculo(conn):
+        vinculo['funcao'](conn)
+        return unidade(conn)
+
+    resultado = _executar_escrita(_com_vinculo)
+    vinculo['gravada'] = True
+    return resultado
+
+
+def _executar_escrita(unidade):
+    if USE_POSTGRES:
+        for tentativa in range(PG_RETRY_TENTATIVAS):
+            conn = get_connection()
+            commitando = False
+            try:
+                resultado = unidade(conn)
+                commitando = True
+                conn.commit()
+                return resultado
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass   # conexão perdida: o servidor já desfez a transação
+                if _eh_falha_de_conexao(e):
+                    _esvaziar_pool(DATABASE_URL)
+                # Erro no COMMIT é ambíguo (pode ter gravado): só a unidade é repetida
+                if commitando or not _eh_erro_transitorio(e) or tentativa == PG_RETRY_TENTATIVAS - 1:
+                    raise
+            finally:
+                conn.close()
+            estatisticas_resiliencia['tentativas_escrita'] += 1
+            _dormir_backoff(tentativa)
+
+    if SQLITE_WRITER:
+        import sqlite_writer
+        return sqlite_writer.submeter(unidade)
+
+    for tentativa in range(SQLITE_RETRY_TENTATIVAS):
+        conn = get_connection()
+        iniciada = False
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            iniciada = True
+            resultado = unidade(conn)
+            conn.commit()
+            return resultado
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if not eh_erro_de_lock(e):
+                raise
+            # Depois que a unidade começou não há nova tentativa (ela já
+            # pode ter feito algo fora da conexão)
+            if iniciada or tentativa == SQLITE_RETRY_TENTATIVAS - 1:
+                registrar_busy('falhas_busy')
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        esperar_nova_tentativa(tentativa)
 
 
 # ═══════════════════════════════════════════
@@ -243,6 +1183,7 @@ _SQLITE_SCHEMA = '''
         salt TEXT NOT NULL,
         nome TEXT NOT NULL DEFAULT '',
         is_admin INTEGER NOT NULL DEFAULT 0,
+        token_geracao INTEGER NOT NULL DEFAULT 0,
         criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
         ultimo_login DATETIME
     );
@@ -270,6 +1211,69 @@ _SQLITE_SCHEMA = '''
         data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
         data_ultima_compra DATETIME
     );
+    CREATE TABLE IF NOT EXISTS estoque_movimentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        delta INTEGER NOT NULL,
+        origem TEXT NOT NULL,
+        referencia_id INTEGER,
+        data DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_estoque_movimentos_data ON estoque_movimentos (data);
+
+    CREATE INDEX IF NOT EXISTS idx_precos_ativo ON precos (data_inicio) WHERE ativo = 1;
+
+    CREATE TABLE IF NOT EXISTS estoque_snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        movimento_id INTEGER NOT NULL UNIQUE,
+        quantidade_total INTEGER NOT NULL,
+        data DATETIME NOT NULL
+    );
+
+    -- Idempotency-Key → resposta original (status NULL = em andamento)
+    CREATE TABLE IF NOT EXISTS idempotencia (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chave TEXT NOT NULL UNIQUE,
+        hash_corpo TEXT NOT NULL,
+        status INTEGER,
+        resposta TEXT,
+        criado_em REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_idempotencia_criado_em ON idempotencia (criado_em);
+
+    -- Log de alterações (delta-sync): id é a sequência; 'delete' = tombstone
+    CREATE TABLE IF NOT EXISTS alteracoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabela TEXT NOT NULL,
+        registro_id INTEGER NOT NULL,
+        operacao TEXT NOT NULL,
+        criado_em REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_alteracoes_registro ON alteracoes (tabela, registro_id, id);
+    CREATE INDEX IF NOT EXISTS idx_alteracoes_criado_em ON alteracoes (criado_em);
+
+    -- Barramento de eventos ao vivo entre processos (ver eventos.py)
+    CREATE TABLE IF NOT EXISTS eventos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        criado_em REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_eventos_criado_em ON eventos (criado_em);
+
+    -- Invalidações de cache entre processos (ver invalidacao.py)
+    CREATE TABLE IF NOT EXISTS invalidacoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chave TEXT NOT NULL,
+        argumento TEXT,
+        origem TEXT NOT NULL,
+        criado_em REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_invalidacoes_criado_em ON invalidacoes (criado_em);
 '''
 
 _POSTGRES_SCHEMA = '''
@@ -355,6 +1359,7 @@ _POSTGRES_SCHEMA = '''
         salt TEXT NOT NULL,
         nome TEXT NOT NULL DEFAULT '',
         is_admin INTEGER NOT NULL DEFAULT 0,
+        token_geracao INTEGER NOT NULL DEFAULT 0,
         criado_em TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
         ultimo_login TIMESTAMPTZ
     );
@@ -382,8 +1387,122 @@ _POSTGRES_SCHEMA = '''
         data_criacao TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
         data_ultima_compra TIMESTAMPTZ
     );
+    CREATE TABLE IF NOT EXISTS estoque_movimentos (
+        id SERIAL PRIMARY KEY,
+        delta INTEGER NOT NULL,
+        origem TEXT NOT NULL,
+        referencia_id INTEGER,
+        data TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_estoque_movimentos_data ON estoque_movimentos (data);
+
+    CREATE TABLE IF NOT EXISTS estoque_snapshots (
+        id SERIAL PRIMARY KEY,
+        movimento_id INTEGER NOT NULL UNIQUE,
+        quantidade_total INTEGER NOT NULL,
+        data TIMESTAMPTZ NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS idempotencia (
+        id SERIAL PRIMARY KEY,
+        chave TEXT NOT NULL UNIQUE,
+        hash_corpo TEXT NOT NULL,
+        status INTEGER,
+        resposta TEXT,
+        criado_em DOUBLE PRECISION NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_idempotencia_criado_em ON idempotencia (criado_em);
+
+    CREATE TABLE IF NOT EXISTS alteracoes (
+        id BIGSERIAL PRIMARY KEY,
+        tabela TEXT NOT NULL,
+        registro_id INTEGER NOT NULL,
+        operacao TEXT NOT NULL,
+        criado_em DOUBLE PRECISION NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_alteracoes_registro ON alteracoes (tabela, registro_id, id);
+    CREATE INDEX IF NOT EXISTS idx_alteracoes_criado_em ON alteracoes (criado_em);
+
+    CREATE TABLE IF NOT EXISTS eventos (
+        id BIGSERIAL PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        criado_em DOUBLE PRECISION NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_eventos_criado_em ON eventos (criado_em);
+
+    CREATE TABLE IF NOT EXISTS invalidacoes (
+        id BIGSERIAL PRIMARY KEY,
+        chave TEXT NOT NULL,
+        argumento TEXT,
+        origem TEXT NOT NULL,
+        criado_em DOUBLE PRECISION NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_invalidacoes_criado_em ON invalidacoes (criado_em);
+
+    CREATE OR REPLACE FUNCTION registrar_alteracao() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('eggvault.alteracoes_lock', true) IS DISTINCT FROM '1' THEN
+            PERFORM pg_advisory_xact_lock(hashtext('eggvault_alteracoes'));
+            PERFORM set_config('eggvault.alteracoes_lock', '1', true);
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO alteracoes (tabela, registro_id, operacao, criado_em)
+            VALUES (TG_TABLE_NAME, OLD.id, 'delete', extract(epoch FROM clock_timestamp()));
+            RETURN OLD;
+        END IF;
+        INSERT INTO alteracoes (tabela, registro_id, operacao, criado_em)
+        VALUES (TG_TABLE_NAME, NEW.id, 'upsert', extract(epoch FROM clock_timestamp()));
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
 '''
 
+# Tabelas com log de alterações (GET /api/alteracoes). Triggers no banco:
+# toda escrita entra no log, inclusive scripts e restaurações de backup.
+# No PostgreSQL o advisory lock em registrar_alteracao() serializa quem
+# grava no log até o COMMIT: as sequências ficam visíveis em ordem e um
+# cliente que leu até N nunca perde uma alteração N-1 confirmada depois.
+# Custo: transações que escrevem nessas tabelas não rodam em paralelo (da
+# primeira linha registrada até o COMMIT), por isso o lock é pego uma vez
+# por transação (marca eggvault.alteracoes_lock, que some no COMMIT) e as
+# unidades de escrita devem ser curtas.
+TABELAS_ALTERACOES = ('entradas', 'saidas', 'quebrados', 'consumo', 'despesas', 'clientes', 'precos')
+
+
+def _sql_triggers_alteracoes():
+    """Triggers que alimentam a tabela alteracoes."""
+    if USE_POSTGRES:
+        return ''.join(
+            f"""
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger
+                       WHERE tgname = 'trg_alteracoes' AND tgrelid = '{tabela}'::regclass) THEN
+            CREATE TRIGGER trg_alteracoes AFTER INSERT OR UPDATE OR DELETE ON {tabela}
+                FOR EACH ROW EXECUTE FUNCTION registrar_alteracao();
+        END IF;
+    END $$;"""
+            for tabela in TABELAS_ALTERACOES
+        )
+    agora = "(julianday('now') - 2440587.5) * 86400.0"
+    return ''.join(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_alteracoes_{tabela}_{evento.lower()} AFTER {evento} ON {tabela}
+    BEGIN
+        INSERT INTO alteracoes (tabela, registro_id, operacao, criado_em)
+        VALUES ('{tabela}', {linha}.id, '{operacao}', {agora});
+    END;"""
+        for tabela in TABELAS_ALTERACOES
+        for evento, linha, operacao in (('INSERT', 'NEW', 'upsert'), ('UPDATE', 'NEW', 'upsert'),
+                                        ('DELETE', 'OLD', 'delete'))
+    )
+
+
 def init_db():
     """Inicializa as tabelas do banco e insere dados padrão."""
     conn = get_connection()
@@ -393,6 +1512,7 @@ def init_db():
         cursor.executescript(_POSTGRES_SCHEMA)
     else:
         cursor.executescript(_SQLITE_SCHEMA)
+    cursor.executescript(_sql_triggers_alteracoes())
 
     conn.commit()
 
@@ -410,6 +1530,7 @@ def init_db():
         ('resumo_mensal', 'total_consumo', 'INTEGER NOT NULL DEFAULT 0'),
         ('saidas', 'cliente_id', 'INTEGER'),
         ('saidas', 'cliente_nome', "TEXT DEFAULT ''"),
+        ('usuarios', 'token_geracao', 'INTEGER NOT NULL DEFAULT 0'),
     ]
 
     for table, col, col_type in _migrate_columns:
@@ -445,13 +1566,21 @@ def init_db():
                 conn._conn.rollback()
             except Exception:
                 pass
+        # Só depois da conversão acima: o índice parcial compara ativo com inteiro
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_precos_ativo ON precos (data_inicio) WHERE ativo = 1")
+        conn.commit()
 
-    cursor.execute("SELECT COUNT(*) as count FROM estoque")
+    # Bancos anteriores ao livro-razão: o saldo da tabela estoque vira o
+    # movimento inicial.
+    cursor.execute("SELECT COUNT(*) as count FROM estoque_movimentos")
     if cursor.fetchone()['count'] == 0:
-        cursor.execute(
-            "INSERT INTO estoque (quantidade_total, ultima_atualizacao) VALUES (?, ?)",
-            (0, datetime.now().isoformat())
-        )
+        cursor.execute("SELECT quantidade_total FROM estoque ORDER BY id DESC LIMIT 1")
+        legado = cursor.fetchone()
+        if legado and legado['quantidade_total'] > 0:
+            cursor.execute(
+                "INSERT INTO estoque_movimentos (delta, origem, data) VALUES (?, ?, ?)",
+                (legado['quantidade_total'], 'saldo_inicial', datetime.now().isoformat())
+            )
 
     cursor.execute("SELECT COUNT(*) as count FROM usuarios")
     if cursor.fetchone()['count'] == 0:
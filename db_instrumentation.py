@@ -0,0 +1,198 @@
+"""
+Instrumentação de queries: fingerprints, slow-query log e detector de N+1.
+
+Desligada por padrão. Com DB_INSTRUMENTATION=1 as conexões de
+database.get_connection passam a ser instrumentadas e:
+
+  - cada query é agrupada pelo fingerprint (SQL normalizado, sem literais)
+    com contagem, tempo total e máximo;
+  - queries acima de SLOW_QUERY_MS vão para o slow-query log
+    (SLOW_QUERY_LOG, padrão stderr) junto com o plano de execução;
+  - requisições com mais de QUERY_BUDGET queries geram um aviso de N+1
+    com os fingerprints mais repetidos.
+
+Desligada, nenhum observador é registrado e get_connection devolve a
+conexão sem wrapper.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import Counter
+
+from flask import g, request, has_request_context
+
+import database
+
+
+DB_INSTRUMENTATION = os.environ.get('DB_INSTRUMENTATION', '0').strip() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', '').strip()
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '30'))
+
+logger = logging.getLogger('eggvault.queries')
+
+
+# ═══════════════════════════════════════════
+# FINGERPRINT
+# ═══════════════════════════════════════════
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_PLACEHOLDER = re.compile(r'%s|\?')
+_RE_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_ESPACOS = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normaliza o SQL: literais e placeholders viram '?', listas IN viram
+    '(?+)' e espaços são colapsados.
+
+    Ex.: "SELECT * FROM x WHERE id IN (1, 2, 3) AND nome = 'a'"
+      →  "SELECT * FROM x WHERE id IN (?+) AND nome = ?"
+    """
+    sql = _RE_STRING.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_PLACEHOLDER.sub('?', sql)
+    sql = _RE_LISTA.sub('(?+)', sql)
+    return _RE_ESPACOS.sub(' ', sql).strip()
+
+
+# ═══════════════════════════════════════════
+# AGREGADOS
+# ═══════════════════════════════════════════
+
+_lock = threading.Lock()
+_fingerprints = {}   # fingerprint → {'total': n, 'tempo': s, 'max': s}
+
+
+def top_fingerprints(limite=50):
+    """Fingerprints ordenados pelo tempo total acumulado."""
+    with _lock:
+        itens = [
+            {'sql': sql, 'execucoes': d['total'], 'tempo_total_ms': round(d['tempo'] * 1000, 3),
+             'tempo_medio_ms': round(d['tempo'] * 1000 / d['total'], 3),
+             'tempo_max_ms': round(d['max'] * 1000, 3)}
+            for sql, d in _fingerprints.items()
+        ]
+    itens.sort(key=lambda i: i['tempo_total_ms'], reverse=True)
+    return itens[:limite]
+
+
+def limpar():
+    """Zera os agregados de fingerprints."""
+    with _lock:
+        _fingerprints.clear()
+
+
+# ═══════════════════════════════════════════
+# SLOW-QUERY LOG
+# ═══════════════════════════════════════════
+
+def _plano(sql, params, conn):
+    """Retorna o plano de execução da query (sem executá-la)."""
+    comando = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if comando not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+        return ''
+    prefixo = 'EXPLAIN ' if database.USE_POSTGRES else 'EXPLAIN QUERY PLAN '
+    # No PostgreSQL um EXPLAIN com erro abortaria a transação de quem chamou:
+    # roda num savepoint (fora de transação, em autocommit, não precisa)
+    savepoint = database.USE_POSTGRES and not getattr(getattr(conn, '_conn', conn), 'autocommit', False)
+    cursor = conn.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT eggvault_explain")
+        cursor.execute(prefixo + sql, params) if params else cursor.execute(prefixo + sql)
+        linhas = cursor.fetchall()
+    except Exception as e:
+        if savepoint:
+            cursor.execute("ROLLBACK TO SAVEPOINT eggvault_explain")
+        return f'(EXPLAIN falhou: {e})'
+    if savepoint:
+        cursor.execute("RELEASE SAVEPOINT eggvault_explain")
+    # SQLite: (id, parent, notused, detail); PostgreSQL: {'QUERY PLAN': ...}
+    return '\n'.join(
+        '    ' + str(linha['QUERY PLAN'] if database.USE_POSTGRES else linha[3]) for linha in linhas
+    )
+
+
+def _registrar_lenta(sql, params, duracao, conn):
+    rota = f'{request.method} {request.path} ' if has_request_context() else ''
+    logger.warning(
+        "Query lenta (%.1f ms) %s\n  %s\n  params=%r\n  plano:\n%s",
+        duracao * 1000, rota, _RE_ESPACOS.sub(' ', sql).strip(), params, _plano(sql, params, conn)
+    )
+
+
+# ═══════════════════════════════════════════
+# OBSERVADOR E HOOKS DE REQUISIÇÃO
+# ═══════════════════════════════════════════
+
+class _ObservadorQueries:
+    """Registra fingerprints, queries lentas e as queries da requisição atual."""
+
+    def query(self, sql, params, duracao, conn):
+        fp = fingerprint(sql)
+        with _lock:
+            item = _fingerprints.get(fp)
+            if item is None:
+                item = _fingerprints[fp] = {'total': 0, 'tempo': 0.0, 'max': 0.0}
+            item['total'] += 1
+            item['tempo'] += duracao
+            item['max'] = max(item['max'], duracao)
+
+        if duracao * 1000 >= SLOW_QUERY_MS:
+            _registrar_lenta(sql, params, duracao, conn)
+
+        if has_request_context():
+            queries = g.get('_queries')
+            if queries is not None:
+                queries.append(fp)
+
+    def fetch(self, duracao):
+        pass
+
+
+def _antes():
+    g._queries = []
+
+
+def _depois(response):
+    queries = g.pop('_queries', None)
+    if queries is None:
+        return response
+    response.headers['X-Query-Count'] = str(len(queries))
+    if len(queries) > QUERY_BUDGET:
+        repetidas = Counter(queries).most_common(3)
+        logger.warning(
+            "Possível N+1: %s %s executou %d queries (orçamento %d). Mais repetidas:\n%s",
+            request.method, request.path, len(queries), QUERY_BUDGET,
+            '\n'.join(f'  {n}x {fp}' for fp, n in repetidas)
+        )
+    return response
+
+
+def _configurar_logger():
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(SLOW_QUERY_LOG, encoding='utf-8') if SLOW_QUERY_LOG else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+
+_observador = _ObservadorQueries()
+
+
+def instalar(app):
+    """Liga a instrumentação no app (no-op com DB_INSTRUMENTATION desligado)."""
+    if not DB_INSTRUMENTATION:
+        return
+    _configurar_logger()
+    app.before_request(_antes)
+    app.after_request(_depois)
+    database.registrar_observador(_observador)
@@ -0,0 +1,265 @@
+"""
+Eventos ao vivo para a SPA (Server-Sent Events em /api/eventos).
+
+Com vários operadores, o estoque e o resumo de cada um ficavam velhos até
+ele navegar. Os services de escrita publicam eventos compactos com
+`publicar` e cada SPA conectada recebe o estado novo e atualiza a tela:
+
+- estoque: quantidade_total, status, cor e ultima_atualizacao;
+- resumo:  totais do mês (mesmos campos de resumo_mensal);
+- preco:   novo preço ativo;
+- config:  configurações alteradas pelo admin.
+
+O evento chega a todos os processos (workers) por um barramento:
+
+- notify:    PostgreSQL LISTEN/NOTIFY (padrão no PostgreSQL);
+- tabela:    tabela `eventos` lida a cada EVENTOS_POLL_MS por uma thread
+             em cada processo com conexões SSE abertas (padrão no SQLite e
+             atrás do pooler em modo transação, que não aceita LISTEN);
+- desligado: padrão na Vercel (sem conexões longas); /api/eventos
+             responde 204 e a SPA não tenta de novo.
+
+Dentro de uma request os eventos são agrupados (vale o último de cada
+tipo e mês) e enviados numa escrita só, no fim da request. Eventos são
+avisos de estado, não um log: um cliente lento pode perder um, e a SPA
+recarrega o painel sempre que (re)conecta.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import contextvars
+
+import database
+
+
+CANAL = 'eggvault_eventos'
+POLL_S = float(os.environ.get('EVENTOS_POLL_MS', '500')) / 1000
+HEARTBEAT_S = 15
+# Cada conexão SSE fecha depois disso e o navegador reconecta sozinho
+# (libera o worker e refaz a autenticação)
+DURACAO_MAX_S = float(os.environ.get('EVENTOS_SSE_MAX_S', '300'))
+RECONEXAO_MS = 3000
+FILA_MAX = 100
+RETENCAO_S = 300
+PURGA_INTERVALO_S = 60
+
+
+def _backend():
+    escolhido = os.environ.get('EVENTOS_BARRAMENTO', 'auto').strip().lower()
+    if escolhido != 'auto':
+        return escolhido
+    if os.environ.get('VERCEL'):
+        return 'desligado'
+    if database.USE_POSTGRES and not database._atras_de_pooler_transacional(database.DATABASE_URL):
+        return 'notify'
+    return 'tabela'
+
+
+BACKEND = _backend()
+
+_pendentes = contextvars.ContextVar('eventos_pendentes', default=None)
+_assinantes = {}                  # fila → id do último evento antes de assinar (tabela)
+_lock = threading.Lock()
+_ouvinte = None
+_escutando = threading.Event()    # LISTEN pronto (notify)
+_ultima_purga = [0.0]
+estatisticas_eventos = {'publicados': 0, 'entregues': 0, 'descartados': 0, 'falhas': 0}
+
+
+# ═══════════════════════════════════════════
+# PUBLICAÇÃO
+# ═══════════════════════════════════════════
+
+def publicar(tipo, **dados):
+    """
+    Publica um evento para as SPAs conectadas em todos os processos.
+
+    Chamado depois da escrita; uma falha no envio só é registrada (a
+    escrita já foi feita e o cliente se corrige ao reconectar).
+    """
+    if BACKEND == 'desligado':
+        return
+    evento = {'tipo': tipo, 'dados': dados}
+    pendentes = _pendentes.get()
+    if pendentes is not None:
+        pendentes[(tipo, dados.get('mes_referencia'))] = evento
+        return
+    _enviar([evento])
+
+
+def _enviar(eventos):
+    agora = time.time()
+    purgar = BACKEND == 'tabela' and agora - _ultima_purga[0] >= PURGA_INTERVALO_S
+    if purgar:
+        _ultima_purga[0] = agora
+
+    def _gravar(conn):
+        if BACKEND == 'tabela' and database.USE_POSTGRES:
+            # Os ids ficam visíveis na ordem: o ouvinte não pula nenhum
+            conn.execute("SELECT pg_advisory_xact_lock(hashtext(?))", (CANAL,))
+        for evento in eventos:
+            dados = json.dumps(evento['dados'], ensure_ascii=False, default=str)
+            if BACKEND == 'notify':
+                conn.execute("SELECT pg_notify(?, ?)", (CANAL, json.dumps({'tipo': evento['tipo'], 'dados': dados})))
+            else:
+                conn.execute(
+                    "INSERT INTO eventos (tipo, dados, criado_em) VALUES (?, ?, ?)",
+                    (evento['tipo'], dados, agora)
+                )
+        if purgar:
+            conn.execute("DELETE FROM eventos WHERE criado_em < ?", (agora - RETENCAO_S,))
+
+    try:
+        database.executar_escrita(_gravar)
+        estatisticas_eventos['publicados'] += len(eventos)
+    except Exception as e:
+        estatisticas_eventos['falhas'] += 1
+        print(f"⚠️ Eventos não publicados: {e}", file=sys.stderr)
+
+
+def _antes():
+    _pendentes.set({})
+
+
+def _depois(_erro=None):
+    pendentes = _pendentes.get()
+    _pendentes.set(None)
+    if pendentes:
+        _enviar(list(pendentes.values()))
+
+
+# ═══════════════════════════════════════════
+# ASSINATURA E ENTREGA
+# ═══════════════════════════════════════════
+
+def _ultimo_id():
+    conn = database.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS id FROM eventos")
+        return cursor.fetchone()['id']
+    finally:
+        conn.close()
+
+
+def assinar():
+    """
+    Nova fila que recebe os eventos deste processo (uma por conexão SSE).
+
+    A fila recebe tudo o que for publicado depois desta chamada: na tabela
+    a posição é lida aqui mesmo; no notify espera o LISTEN do processo.
+    """
+    global _ouvinte
+    inicio = _ultimo_id() if BACKEND == 'tabela' else None
+    fila = queue.Queue(maxsize=FILA_MAX)
+    with _lock:
+        _assinantes[fila] = inicio
+        if _ouvinte is None or not _ouvinte.is_alive():
+            alvo = _ouvir_postgres if BACKEND == 'notify' else _ouvir_tabela
+            _ouvinte = threading.Thread(target=alvo, name='eventos-ouvinte', daemon=True)
+            _ouvinte.start()
+    if BACKEND == 'notify':
+        _escutando.wait(database.PG_CONNECT_TIMEOUT_S)
+    return fila
+
+
+def cancelar(fila):
+    with _lock:
+        _assinantes.pop(fila, None)
+
+
+def _entregar(evento, id_evento=None):
+    with _lock:
+        filas = [fila for fila, inicio in _assinantes.items()
+                 if id_evento is None or inicio is None or inicio < id_evento]
+    for fila in filas:
+        try:
+            fila.put_nowait(evento)
+            estatisticas_eventos['entregues'] += 1
+        except queue.Full:
+            # Cliente que não lê: perde o evento, não trava os outros
+            estatisticas_eventos['descartados'] += 1
+
+
+def _ouvir_tabela():
+    """Lê os eventos novos da tabela enquanto houver assinantes no processo."""
+    ultimo = None
+    while True:
+        time.sleep(POLL_S)
+        with _lock:
+            if not _assinantes:
+                ultimo = None
+                continue
+            if ultimo is None:
+                # Ninguém recebe nada anterior à própria assinatura
+                ultimo = min(_assinantes.values())
+        try:
+            conn = database.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, tipo, dados FROM eventos WHERE id > ? ORDER BY id", (ultimo,))
+                linhas = cursor.fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ Leitura de eventos falhou: {e}", file=sys.stderr)
+            continue
+        for linha in linhas:
+            ultimo = linha['id']
+            _entregar({'tipo': linha['tipo'], 'dados': json.loads(linha['dados'])}, ultimo)
+
+
+def _ouvir_postgres():
+    """LISTEN do canal de eventos (ver database.escutar)."""
+    def _notificado(_canal, payload):
+        mensagem = json.loads(payload)
+        _entregar({'tipo': mensagem['tipo'], 'dados': json.loads(mensagem['dados'])})
+
+    database.escutar([CANAL], _notificado, _escutando.set)
+
+
+# ═══════════════════════════════════════════
+# STREAM SSE
+# ═══════════════════════════════════════════
+
+def _formatar(evento):
+    dados = json.dumps(evento['dados'], ensure_ascii=False, default=str)
+    return f"event: {evento['tipo']}\ndata: {dados}\n\n"
+
+
+def transmitir(fila):
+    """Gera o stream text/event-stream de uma fila (ver assinar)."""
+    try:
+        yield f'retry: {RECONEXAO_MS}\n\n'
+        fim = time.monotonic() + DURACAO_MAX_S
+        while True:
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            try:
+                evento = fila.get(timeout=min(HEARTBEAT_S, restante))
+            except queue.Empty:
+                yield ': ping\n\n'   # mantém proxies e o navegador com a conexão aberta
+                continue
+            yield _formatar(evento)
+    finally:
+        cancelar(fila)
+
+
+def estatisticas():
+    """Barramento, conexões SSE abertas neste processo e contadores."""
+    with _lock:
+        assinantes = len(_assinantes)
+    return {'barramento': BACKEND, 'assinantes': assinantes, **estatisticas_eventos}
+
+
+def instalar(app):
+    """Agrupa os eventos de cada request e os envia no fim dela."""
+    if BACKEND == 'desligado':
+        return
+    app.before_request(_antes)
+    app.teardown_request(_depois)
@@ -0,0 +1,167 @@
+"""
+Idempotency-Key nas rotas POST que gravam movimentos.
+
+Numa conexão instável a SPA pode perder a resposta de uma venda já
+gravada; o operador tenta de novo e a venda (e a baixa no estoque) sai em
+dobro. Com o cabeçalho `Idempotency-Key` a repetição devolve a resposta
+original sem refazer a transação:
+
+- a chave vale por usuário e rota e expira em IDEMPOTENCIA_TTL_H horas
+  (padrão 24); guardamos só o hash da chave e do corpo e a resposta JSON;
+- a reserva da chave é gravada na mesma transação da primeira escrita
+  da request: se a venda foi gravada, a chave também foi. Uma repetição
+  enquanto a original roda recebe 409 (tente de novo em instantes); se a
+  original morreu no meio (worker reiniciado), a repetição recebe 409 até
+  a chave vencer, porque a escrita dela pode já estar no banco;
+- um erro antes de qualquer escrita não fica guardado e a mesma chave
+  pode ser usada de novo; depois de uma escrita ele vira a resposta
+  original (repetir não pode gravar de novo);
+- a mesma chave com outro corpo é recusada com 422.
+
+Sem o cabeçalho a rota funciona como antes. A sincronização da fila
+offline (/api/sync) passa por `executar` com as mesmas chaves.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from functools import wraps
+
+from flask import Response, make_response, request
+
+import database
+from repositories.idempotencia_repo import IdempotenciaRepository
+
+
+CABECALHO = 'Idempotency-Key'
+TTL_S = float(os.environ.get('IDEMPOTENCIA_TTL_H', '24')) * 3600
+PURGA_INTERVALO_S = 3600
+
+_lock = threading.Lock()
+_ultima_purga = 0.0
+
+
+def _hash(*partes):
+    return hashlib.sha256('\x1f'.join(partes).encode()).hexdigest()
+
+
+def _purgar_vencidas(agora):
+    """Remove as chaves vencidas no máximo uma vez por hora por processo."""
+    global _ultima_purga
+    with _lock:
+        if agora - _ultima_purga < PURGA_INTERVALO_S:
+            return
+        _ultima_purga = agora
+    IdempotenciaRepository.purgar(agora - TTL_S)
+
+
+def _json_erro(mensagem):
+    return json.dumps({'success': False, 'error': mensagem}, ensure_ascii=False)
+
+
+def _hash_dados(dados):
+    """Hash do conteúdo em JSON canônico (a ordem das chaves não importa)."""
+    return _hash(json.dumps(dados, sort_keys=True, separators=(',', ':'), ensure_ascii=False))
+
+
+class _ChaveEmUso(Exception):
+    """Outra request reservou a chave antes da primeira escrita desta."""
+
+
+def _responder_original(original, hash_corpo):
+    if original['hash_corpo'] != hash_corpo:
+        return 422, _json_erro(f'{CABECALHO} já usada com outro conteúdo'), False
+    if original['status'] is None:
+        return 409, _json_erro('Requisição anterior com a mesma chave ainda em processamento'), False
+    return original['status'], original['resposta'], True
+
+
+def executar(usuario_id, rota, valor, dados, funcao):
+    """
+    Roda `funcao` uma única vez por (usuário, rota, chave).
+
+    Usado pelo decorator e pela sincronização em lote (/api/sync), que
+    aplica cada operação com a chave e a rota de origem: a mesma operação
+    enviada direto e depois pela fila offline não é gravada duas vezes.
+
+    Args:
+        usuario_id: ID do usuário autenticado.
+        rota: Rota da operação (ex.: '/api/entradas').
+        valor: Valor do Idempotency-Key.
+        dados: Conteúdo da operação (a mesma chave com outro conteúdo é recusada).
+        funcao: Executa a operação e retorna (status, resposta JSON em texto).
+
+    Returns:
+        Tupla (status, resposta JSON em texto, repetida).
+    """
+    if len(valor) > 255 or not valor.isprintable():
+        return 400, _json_erro(f'{CABECALHO} inválida (até 255 caracteres imprimíveis)'), False
+
+    agora = time.time()
+    _purgar_vencidas(agora)
+    chave = _hash(str(usuario_id), rota, valor)
+    hash_corpo = _hash_dados(dados)
+
+    original = IdempotenciaRepository.buscar(chave, agora - TTL_S)
+    if original is not None:
+        return _responder_original(original, hash_corpo)
+
+    estado = {'conflito': False}
+
+    def _reservar(conn):
+        if not IdempotenciaRepository.reservar(conn, chave, hash_corpo, agora, agora - TTL_S):
+            # Desfaz a escrita que levaria a reserva junto
+            estado['conflito'] = True
+            raise _ChaveEmUso(chave)
+
+    with database.vincular_primeira_escrita(_reservar) as vinculo:
+        try:
+            status, texto = funcao()
+        except Exception:
+            # Com a reserva gravada, a repetição recebe 409 até a chave vencer
+            if not estado['conflito']:
+                raise
+    if estado['conflito']:
+        # A rota pode ter transformado o _ChaveEmUso numa resposta de erro
+        original = IdempotenciaRepository.buscar(chave, agora - TTL_S)
+        if original is None:
+            return 409, _json_erro('Requisição anterior com a mesma chave ainda em processamento'), False
+        return _responder_original(original, hash_corpo)
+
+    if 200 <= status < 300 or vinculo['gravada']:
+        try:
+            IdempotenciaRepository.concluir(chave, hash_corpo, agora, status, texto)
+        except Exception as e:
+            # A escrita já foi feita: responde mesmo assim (a repetição
+            # recebe 409 até a chave vencer)
+            print(f"⚠️ Idempotency-Key não registrada: {e}", file=sys.stderr)
+    return status, texto, False
+
+
+def idempotente(f):
+    """Decorator (depois de @login_required) que aplica o Idempotency-Key à rota."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        valor = request.headers.get(CABECALHO, '').strip()
+        if not valor:
+            return f(*args, **kwargs)
+
+        def _rodar():
+            resposta = make_response(f(*args, **kwargs))
+            return resposta.status_code, resposta.get_data(as_text=True)
+
+        dados = request.get_json(silent=True)
+        if dados is None:
+            dados = request.get_data(as_text=True)
+        status, texto, repetida = executar(request.usuario['id'], request.path, valor, dados, _rodar)
+
+        resposta = Response(texto, status=status, mimetype='application/json')
+        if status == 409:
+            resposta.headers['Retry-After'] = '1'
+        if repetida:
+            resposta.headers['Idempotent-Replayed'] = 'true'
+        return resposta
+    return decorated
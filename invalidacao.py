@@ -0,0 +1,224 @@
+"""
+Invalidação de caches em memória entre processos.
+
+Cada worker do gunicorn (ou instância serverless) tem os seus caches —
+histórico do estoque, geração dos tokens assinados, preço ativo. Uma
+escrita num processo deixava os outros com dados velhos até o TTL vencer.
+
+Os caches assinam chaves com nome (`assinar`) e os services publicam a
+invalidação depois do commit (`publicar`): o próprio processo descarta na
+hora e os outros recebem pelo barramento (INVALIDACAO_BARRAMENTO):
+
+- notify: PostgreSQL LISTEN/NOTIFY, numa conexão dedicada por processo
+          (padrão no PostgreSQL); ao reconectar tudo é descartado.
+- tabela: log `invalidacoes` consultado por número de versão antes de cada
+          leitura de cache, no máximo a cada INVALIDACAO_POLL_MS (padrão no
+          SQLite, atrás do pooler em modo transação e na Vercel, onde não
+          há conexão longa nem thread de fundo confiável).
+- local:  só o próprio processo (um worker só).
+
+Quem lê um cache chama `verificar()` antes: na tabela é aí que o log é
+lido; no notify garante a thread que escuta.
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+
+import database
+
+
+CANAL = 'eggvault_invalidacoes'
+POLL_S = float(os.environ.get('INVALIDACAO_POLL_MS', '1000')) / 1000
+RETENCAO_S = 3600
+PURGA_INTERVALO_S = 300
+
+
+def _backend():
+    escolhido = os.environ.get('INVALIDACAO_BARRAMENTO', 'auto').strip().lower()
+    if escolhido != 'auto':
+        return escolhido
+    if (database.USE_POSTGRES and not os.environ.get('VERCEL')
+            and not database._atras_de_pooler_transacional(database.DATABASE_URL)):
+        return 'notify'
+    return 'tabela'
+
+
+BACKEND = _backend()
+
+_assinaturas = {}                 # chave → [ao_invalidar(argumento)]
+_lock = threading.Lock()
+_ouvinte = None
+_origem = [None, None]            # (pid, identificador do processo)
+_ultimo = [None]                  # última versão do log aplicada (tabela)
+_ultima_verificacao = [0.0]
+_ultima_purga = [0.0]
+estatisticas_invalidacao = {'publicadas': 0, 'recebidas': 0, 'descartes_totais': 0, 'falhas': 0}
+
+
+def _identificador():
+    """Identifica este processo (muda depois de um fork)."""
+    pid = os.getpid()
+    if _origem[0] != pid:
+        _origem[:] = [pid, f'{pid}-{secrets.token_hex(4)}']
+    return _origem[1]
+
+
+def assinar(chave, ao_invalidar):
+    """
+    Registra quem descarta um cache quando `chave` for invalidada.
+
+    `ao_invalidar(argumento)` recebe o argumento publicado (ex.: o mês ou o
+    id do usuário) ou None, que significa descartar tudo.
+    """
+    with _lock:
+        _assinaturas.setdefault(chave, []).append(ao_invalidar)
+
+
+def _aplicar(chave, argumento):
+    with _lock:
+        funcoes = list(_assinaturas.get(chave, ()))
+    for funcao in funcoes:
+        try:
+            funcao(argumento)
+        except Exception as e:
+            print(f"⚠️ Invalidação de {chave} falhou: {e}", file=sys.stderr)
+
+
+def _aplicar_todas():
+    """Descarta todos os caches: alguma invalidação pode ter se perdido."""
+    estatisticas_invalidacao['descartes_totais'] += 1
+    with _lock:
+        chaves = list(_assinaturas)
+    for chave in chaves:
+        _aplicar(chave, None)
+
+
+# ═══════════════════════════════════════════
+# PUBLICAÇÃO
+# ═══════════════════════════════════════════
+
+def publicar(chave, argumento=None):
+    """
+    Invalida `chave` neste processo e nos outros.
+
+    Chamar depois do commit da escrita, para nenhum processo recarregar o
+    cache com o estado anterior. Falha no envio só é registrada: os outros
+    processos ficam com o cache até o TTL dele (quando houver).
+    """
+    _aplicar(chave, argumento)
+    if BACKEND not in ('notify', 'tabela'):
+        return
+
+    origem = _identificador()
+    agora = time.time()
+    purgar = BACKEND == 'tabela' and agora - _ultima_purga[0] >= PURGA_INTERVALO_S
+    if purgar:
+        _ultima_purga[0] = agora
+
+    def _gravar(conn):
+        if BACKEND == 'notify':
+            conn.execute("SELECT pg_notify(?, ?)", (CANAL, json.dumps(
+                {'chave': chave, 'argumento': argumento, 'origem': origem})))
+            return
+        if database.USE_POSTGRES:
+            # As versões ficam visíveis na ordem: nenhum leitor pula uma
+            conn.execute("SELECT pg_advisory_xact_lock(hashtext(?))", (CANAL,))
+        conn.execute(
+            "INSERT INTO invalidacoes (chave, argumento, origem, criado_em) VALUES (?, ?, ?, ?)",
+            (chave, json.dumps(argumento), origem, agora)
+        )
+        if purgar:
+            conn.execute(
+                "DELETE FROM invalidacoes WHERE criado_em < ? "
+                "AND id < (SELECT MAX(id) FROM invalidacoes)",
+                (agora - RETENCAO_S,)
+            )
+
+    try:
+        database.executar_escrita(_gravar)
+        estatisticas_invalidacao['publicadas'] += 1
+    except Exception as e:
+        estatisticas_invalidacao['falhas'] += 1
+        print(f"⚠️ Invalidação de {chave} não publicada: {e}", file=sys.stderr)
+
+
+# ═══════════════════════════════════════════
+# RECEBIMENTO
+# ═══════════════════════════════════════════
+
+def verificar():
+    """Aplica as invalidações de outros processos; chamar antes de ler um cache."""
+    if BACKEND == 'notify':
+        _garantir_ouvinte()
+    elif BACKEND == 'tabela':
+        agora = time.monotonic()
+        with _lock:
+            if agora - _ultima_verificacao[0] < POLL_S:
+                return
+            _ultima_verificacao[0] = agora
+        try:
+            _ler_tabela()
+        except Exception as e:
+            print(f"⚠️ Leitura de invalidações falhou: {e}", file=sys.stderr)
+
+
+def _ler_tabela():
+    conn = database.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(id) AS primeira, MAX(id) AS ultima FROM invalidacoes")
+        row = cursor.fetchone()
+        primeira, ultima = row['primeira'], row['ultima'] or 0
+        ultimo = _ultimo[0]
+        if ultimo is None or ultima == ultimo:
+            # Primeira leitura: os caches ainda estão vazios
+            _ultimo[0] = ultima
+            return
+        if ultima < ultimo or (primeira is not None and primeira > ultimo + 1):
+            # Banco recriado/restaurado ou log purgado além do que foi lido
+            _ultimo[0] = ultima
+            _aplicar_todas()
+            return
+        cursor.execute(
+            "SELECT chave, argumento, origem FROM invalidacoes WHERE id > ? AND id <= ? ORDER BY id",
+            (ultimo, ultima)
+        )
+        linhas = cursor.fetchall()
+    finally:
+        conn.close()
+
+    _ultimo[0] = ultima
+    origem = _identificador()
+    for linha in linhas:
+        if linha['origem'] != origem:
+            estatisticas_invalidacao['recebidas'] += 1
+            _aplicar(linha['chave'], json.loads(linha['argumento']))
+
+
+def _notificado(_canal, payload):
+    mensagem = json.loads(payload)
+    if mensagem['origem'] != _identificador():
+        estatisticas_invalidacao['recebidas'] += 1
+        _aplicar(mensagem['chave'], mensagem['argumento'])
+
+
+def _garantir_ouvinte():
+    global _ouvinte
+    if _ouvinte is not None and _ouvinte.is_alive():
+        return
+    with _lock:
+        if _ouvinte is None or not _ouvinte.is_alive():
+            _ouvinte = threading.Thread(
+                target=database.escutar, args=([CANAL], _notificado, _aplicar_todas),
+                name='invalidacao-ouvinte', daemon=True
+            )
+            _ouvinte.start()
+
+
+def estatisticas():
+    """Barramento e contadores de invalidações deste processo."""
+    return {'barramento': BACKEND, **estatisticas_invalidacao}
@@ -0,0 +1,128 @@
+"""
+Manutenção periódica do SQLite.
+
+A cada SQLITE_MANUTENCAO_INTERVALO segundos (padrão 3600; 0 desliga) uma
+thread por worker roda:
+
+- PRAGMA optimize: atualiza as estatísticas do planejador só onde mudaram;
+- PRAGMA incremental_vacuum: devolve ao disco até SQLITE_VACUUM_PAGINAS
+  páginas livres (bancos criados com auto_vacuum = INCREMENTAL);
+- PRAGMA wal_checkpoint(TRUNCATE): copia o WAL para o banco e zera o
+  arquivo -wal, que sem isso só cresce enquanto houver leitores.
+
+O admin também pode rodar na hora por POST /api/admin/manutencao. No
+PostgreSQL (autovacuum do próprio servidor) nada é instalado.
+"""
+
+import os
+import sys
+import time
+import threading
+from datetime import datetime
+
+import database
+
+
+INTERVALO = int(os.environ.get('SQLITE_MANUTENCAO_INTERVALO', '3600'))
+VACUUM_PAGINAS = int(os.environ.get('SQLITE_VACUUM_PAGINAS', '1000'))
+
+_lock = threading.Lock()
+_ultima = None
+_execucoes = 0
+_pid = None
+
+
+def _tamanho_wal():
+    try:
+        return os.path.getsize(database.DB_PATH + '-wal')
+    except OSError:
+        return 0
+
+
+def executar():
+    """
+    Roda optimize, incremental_vacuum e checkpoint do WAL.
+
+    Returns:
+        dict com o resultado de cada etapa.
+
+    Raises:
+        ValueError: Se o banco não for SQLite.
+    """
+    global _ultima, _execucoes
+    if database.USE_POSTGRES:
+        raise ValueError("Manutenção disponível apenas no SQLite")
+
+    inicio = time.perf_counter()
+    conn = database._conectar_sqlite()
+    conn.isolation_level = None
+    try:
+        wal_antes = _tamanho_wal()
+        conn.execute("PRAGMA optimize")
+
+        livres_antes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        if incremental and livres_antes:
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGINAS})").fetchall()
+        livres_depois = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+        ocupado, paginas_wal, copiadas = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
+
+    resultado = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'paginas_livres': {'antes': livres_antes, 'depois': livres_depois,
+                           'auto_vacuum_incremental': incremental},
+        'checkpoint': {'ocupado': bool(ocupado), 'paginas_wal': paginas_wal, 'copiadas': copiadas},
+        'wal_bytes': {'antes': wal_antes, 'depois': _tamanho_wal()},
+    }
+    with _lock:
+        _ultima = resultado
+        _execucoes += 1
+    return resultado
+
+
+def status():
+    """Perfil, PRAGMAs em uso e última manutenção do processo atual."""
+    with _lock:
+        ultima, execucoes = _ultima, _execucoes
+    return {
+        'pid': os.getpid(),
+        'banco': 'postgres' if database.USE_POSTGRES else 'sqlite',
+        'perfil': None if database.USE_POSTGRES else database.SQLITE_PERFIL,
+        'pragmas': {} if database.USE_POSTGRES else database.pragmas_sqlite(),
+        'intervalo_s': INTERVALO,
+        'agendada': _pid == os.getpid(),
+        'execucoes': execucoes,
+        'ultima': ultima,
+    }
+
+
+def _laco():
+    while True:
+        time.sleep(INTERVALO)
+        try:
+            executar()
+        except Exception as e:
+            print(f"⚠️ Manutenção do SQLite falhou: {e}", file=sys.stderr)
+
+
+def _agendar():
+    """Inicia a thread de manutenção no worker atual (uma vez por pid)."""
+    global _pid
+    if _pid == os.getpid():
+        return
+    with _lock:
+        if _pid == os.getpid():
+            return
+        _pid = os.getpid()
+    threading.Thread(target=_laco, name='sqlite-manutencao', daemon=True).start()
+
+
+def instalar(app):
+    """Agenda a manutenção no primeiro request de cada worker (após o fork)."""
+    if database.USE_POSTGRES or INTERVALO <= 0:
+        return
+    app.before_request(_agendar)
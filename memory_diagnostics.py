@@ -0,0 +1,227 @@
+"""
+Diagnóstico de memória com tracemalloc.
+
+O admin liga/desliga o tracemalloc em tempo de execução, tira snapshots,
+compara dois snapshots e consulta as linhas que mais alocam e o RSS do
+worker. Os dados são por processo (cada resposta informa o pid).
+
+As rotas de exportação usam `medir_pico`, que anota na resposta
+(cabeçalho X-Memory-Peak) e nos agregados por rota o pico de memória da
+requisição: pelo tracemalloc quando ativo; senão pela variação do RSS.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+
+from flask import request
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MAX_SNAPSHOTS = int(os.environ.get('MEMORIA_MAX_SNAPSHOTS', '5'))
+
+_lock = threading.Lock()
+_snapshots = {}      # id → {'snapshot': Snapshot, 'data': iso}
+_proximo_id = 1
+_picos = {}          # rota → {'requisicoes', 'max_kb', 'ultimo_kb', 'fonte'}
+
+
+# ═══════════════════════════════════════════
+# RSS
+# ═══════════════════════════════════════════
+
+def rss_kb():
+    """RSS atual do processo em KiB (None se indisponível)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def rss_pico_kb():
+    """Maior RSS já atingido pelo processo em KiB (None se indisponível)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == 'darwin' else pico
+
+
+# ═══════════════════════════════════════════
+# TRACEMALLOC
+# ═══════════════════════════════════════════
+
+def iniciar(frames=1):
+    """Liga o tracemalloc guardando `frames` quadros de pilha por alocação."""
+    frames = int(frames)
+    if not 1 <= frames <= 50:
+        raise ValueError("frames deve estar entre 1 e 50")
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(frames)
+
+
+def parar():
+    """Desliga o tracemalloc e descarta os snapshots."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+
+def _linhas(estatisticas, limite):
+    resultado = []
+    for stat in estatisticas[:limite]:
+        quadro = stat.traceback[0]
+        item = {
+            'arquivo': quadro.filename,
+            'linha': quadro.lineno,
+            'tamanho_kb': round(stat.size / 1024, 1),
+            'blocos': stat.count,
+        }
+        if hasattr(stat, 'size_diff'):
+            item['diferenca_kb'] = round(stat.size_diff / 1024, 1)
+            item['diferenca_blocos'] = stat.count_diff
+        resultado.append(item)
+    return resultado
+
+
+def _filtrar(snapshot):
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+
+
+def _exigir_tracemalloc():
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc não está ativo")
+
+
+def tirar_snapshot():
+    """Guarda um snapshot (mantém os MAX_SNAPSHOTS mais recentes) e retorna seu id."""
+    global _proximo_id
+    _exigir_tracemalloc()
+    snapshot = _filtrar(tracemalloc.take_snapshot())
+    with _lock:
+        snapshot_id = _proximo_id
+        _proximo_id += 1
+        _snapshots[snapshot_id] = {'snapshot': snapshot, 'data': datetime.now().isoformat()}
+        for antigo in sorted(_snapshots)[:-MAX_SNAPSHOTS]:
+            del _snapshots[antigo]
+    return snapshot_id
+
+
+def top(limite=20):
+    """Linhas que mais alocam no momento."""
+    _exigir_tracemalloc()
+    snapshot = _filtrar(tracemalloc.take_snapshot())
+    return _linhas(snapshot.statistics('lineno'), limite)
+
+
+def diff(de, para=None, limite=20):
+    """
+    Compara dois snapshots por linha.
+
+    Args:
+        de: id do snapshot base.
+        para: id do snapshot final (None = snapshot tirado agora).
+
+    Raises:
+        ValueError: Se algum snapshot não existir.
+    """
+    with _lock:
+        base = _snapshots.get(de)
+        final = _snapshots.get(para) if para is not None else None
+    if base is None or (para is not None and final is None):
+        raise ValueError("Snapshot não encontrado")
+    if final is None:
+        _exigir_tracemalloc()
+        snapshot_final = _filtrar(tracemalloc.take_snapshot())
+    else:
+        snapshot_final = final['snapshot']
+    return _linhas(snapshot_final.compare_to(base['snapshot'], 'lineno'), limite)
+
+
+def status():
+    """Estado do diagnóstico no processo atual."""
+    atual, pico = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    with _lock:
+        snapshots = [{'id': i, 'data': s['data']} for i, s in sorted(_snapshots.items())]
+        picos = {rota: dict(item) for rota, item in _picos.items()}
+    return {
+        'pid': os.getpid(),
+        'rss_kb': rss_kb(),
+        'rss_pico_kb': rss_pico_kb(),
+        'tracemalloc': {
+            'ativo': tracemalloc.is_tracing(),
+            'frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else 0,
+            'atual_kb': round(atual / 1024, 1),
+            'pico_kb': round(pico / 1024, 1),
+        },
+        'snapshots': snapshots,
+        'picos_por_rota': picos,
+    }
+
+
+# ═══════════════════════════════════════════
+# PICO POR REQUISIÇÃO
+# ═══════════════════════════════════════════
+
+def _registrar_pico(rota, kb, fonte):
+    with _lock:
+        item = _picos.get(rota)
+        if item is None:
+            item = _picos[rota] = {'requisicoes': 0, 'max_kb': 0, 'ultimo_kb': 0, 'fonte': fonte}
+        item['requisicoes'] += 1
+        item['ultimo_kb'] = kb
+        item['max_kb'] = max(item['max_kb'], kb)
+        item['fonte'] = fonte
+
+
+def medir_pico(f):
+    """
+    Decorator que mede o pico de memória da requisição.
+
+    Com tracemalloc ativo usa o pico rastreado (reset_peak no início; com
+    requisições simultâneas o valor inclui as alocações delas). Sem
+    tracemalloc usa o maior valor entre o crescimento do RSS e o do pico
+    de RSS do processo (também quando o tracemalloc é parado no meio da
+    requisição, por isso a linha de base do RSS é sempre tomada).
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        rss_inicial, pico_inicial = rss_kb(), rss_pico_kb()
+        rastreando = tracemalloc.is_tracing()
+        if rastreando:
+            tracemalloc.reset_peak()
+            inicial = tracemalloc.get_traced_memory()[0]
+
+        response = f(*args, **kwargs)
+
+        if rastreando and tracemalloc.is_tracing():
+            kb = max(0, tracemalloc.get_traced_memory()[1] - inicial) // 1024
+            fonte = 'tracemalloc'
+        else:
+            crescimentos = [0]
+            if rss_inicial is not None:
+                crescimentos.append((rss_kb() or 0) - rss_inicial)
+            if pico_inicial is not None:
+                crescimentos.append((rss_pico_kb() or 0) - pico_inicial)
+            kb = max(crescimentos)
+            fonte = 'rss'
+
+        _registrar_pico(request.url_rule.rule if request.url_rule else request.path, kb, fonte)
+        if hasattr(response, 'headers'):
+            response.headers['X-Memory-Peak'] = f'{kb}KiB; fonte={fonte}'
+        return response
+    return decorated
@@ -0,0 +1,392 @@
+"""
+Métricas de requisição: tempo total, banco, autenticação e serialização.
+
+Cada requisição ganha um cabeçalho Server-Timing e alimenta histogramas
+por rota (em memória, por processo), expostos em formato Prometheus.
+Desligue com METRICS_ENABLED=0.
+"""
+
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+import database
+
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').strip() not in ('0', 'false', 'no')
+
+# Limites dos buckets em segundos (mesmos padrões do cliente Prometheus)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTIS = (0.5, 0.95, 0.99)
+
+
+# ═══════════════════════════════════════════
+# HISTOGRAMA
+# ═══════════════════════════════════════════
+
+class Histograma:
+    """Histograma de buckets fixos com estimativa de quantis."""
+
+    def __init__(self, limites=BUCKETS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)   # último = +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, q):
+        """Estima o quantil por interpolação linear dentro do bucket."""
+        if self.total == 0:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for i, contagem in enumerate(self.contagens):
+            if acumulado + contagem >= alvo and contagem:
+                inferior = self.limites[i - 1] if i > 0 else 0.0
+                if i == len(self.limites):
+                    return inferior
+                superior = self.limites[i]
+                return inferior + (superior - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+    def acumulados(self):
+        """Contagens cumulativas por limite (formato `le` do Prometheus)."""
+        resultado, acumulado = [], 0
+        for limite, contagem in zip(self.limites + (float('inf'),), self.contagens):
+            acumulado += contagem
+            resultado.append((limite, acumulado))
+        return resultado
+
+
+# ═══════════════════════════════════════════
+# REGISTRO POR ROTA
+# ═══════════════════════════════════════════
+
+_lock = threading.Lock()
+_rotas = {}      # (metodo, rota) → {'duracao': Histograma, 'db': Histograma, 'queries': int, 'status': {}}
+
+
+def _observar_requisicao(metodo, rota, status, duracao, db, queries):
+    with _lock:
+        item = _rotas.get((metodo, rota))
+        if item is None:
+            item = {'duracao': Histograma(), 'db': Histograma(), 'queries': 0, 'status': {}}
+            _rotas[(metodo, rota)] = item
+        item['duracao'].observar(duracao)
+        item['db'].observar(db)
+        item['queries'] += queries
+        item['status'][status] = item['status'].get(status, 0) + 1
+
+
+def resumo():
+    """Retorna p50/p95/p99 e contagens por rota (útil para testes e benchmarks)."""
+    with _lock:
+        return {
+            f'{metodo} {rota}': {
+                'requisicoes': item['duracao'].total,
+                'queries': item['queries'],
+                **{f'p{int(q * 100)}': item['duracao'].quantil(q) for q in QUANTIS},
+            }
+            for (metodo, rota), item in _rotas.items()
+        }
+
+
+def limpar():
+    """Zera os histogramas."""
+    with _lock:
+        _rotas.clear()
+
+
+# ═══════════════════════════════════════════
+# MEDIÇÃO DENTRO DA REQUISIÇÃO
+# ═══════════════════════════════════════════
+
+def _atual():
+    if has_request_context():
+        return g.get('_metricas')
+    return None
+
+
+@contextmanager
+def medir(etapa):
+    """Soma o tempo do bloco à etapa `etapa` da requisição atual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas = _atual()
+        if metricas is not None:
+            metricas[etapa] = metricas.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+class _ObservadorDB:
+    """Acumula tempo e número de queries na requisição atual."""
+
+    def query(self, sql, params, duracao, conn):
+        metricas = _atual()
+        if metricas is not None:
+            metricas['db'] += duracao
+            metricas['queries'] += 1
+
+    def fetch(self, duracao):
+        metricas = _atual()
+        if metricas is not None:
+            metricas['db'] += duracao
+
+
+class JSONProviderMedido(DefaultJSONProvider):
+    """Provedor JSON que mede o tempo de serialização das respostas."""
+
+    def response(self, *args, **kwargs):
+        with medir('json'):
+            return super().response(*args, **kwargs)
+
+
+# ═══════════════════════════════════════════
+# INTEGRAÇÃO COM O FLASK
+# ═══════════════════════════════════════════
+
+def _antes():
+    g._metricas = {'inicio': time.perf_counter(), 'db': 0.0, 'queries': 0}
+
+
+def _depois(response):
+    metricas = g.pop('_metricas', None)
+    if metricas is None:
+        return response
+
+    duracao = time.perf_counter() - metricas['inicio']
+    partes = [f'app;dur={duracao * 1000:.2f}']
+    partes.append(f'db;dur={metricas["db"] * 1000:.2f};desc="{metricas["queries"]} queries"')
+    for etapa in ('auth', 'json'):
+        if etapa in metricas:
+            partes.append(f'{etapa};dur={metricas[etapa] * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(partes)
+
+    rota = request.url_rule.rule if request.url_rule else 'nao_encontrada'
+    if not rota.startswith('/static'):
+        _observar_requisicao(
+            request.method, rota, response.status_code, duracao, metricas['db'], metricas['queries']
+        )
+    return response
+
+
+def instalar(app):
+    """Liga a medição de requisições no app (no-op com METRICS_ENABLED=0)."""
+    if not METRICS_ENABLED:
+        return
+    app.json = JSONProviderMedido(app)
+    app.before_request(_antes)
+    app.after_request(_depois)
+    database.registrar_observador(_ObservadorDB())
+
+
+# ═══════════════════════════════════════════
+# EXPOSIÇÃO (Prometheus)
+# ═══════════════════════════════════════════
+
+def _rotulos(**rotulos):
+    return ','.join(f'{k}="{v}"' for k, v in rotulos.items())
+
+
+def _formatar_le(limite):
+    return '+Inf' if limite == float('inf') else repr(limite)
+
+
+def prometheus():
+    """Renderiza as métricas no formato texto do Prometheus (0.0.4)."""
+    linhas = []
+    with _lock:
+        itens = sorted(_rotas.items())
+
+        for nome, chave, ajuda in (
+            ('eggvault_http_request_duration_seconds', 'duracao', 'Tempo total da requisição'),
+            ('eggvault_http_request_db_seconds', 'db', 'Tempo gasto no banco por requisição'),
+        ):
+            linhas.append(f'# HELP {nome} {ajuda}')
+            linhas.append(f'# TYPE {nome} histogram')
+            for (metodo, rota), item in itens:
+                hist = item[chave]
+                for limite, acumulado in hist.acumulados():
+                    rotulos = _rotulos(method=metodo, route=rota, le=_formatar_le(limite))
+                    linhas.append(f'{nome}_bucket{{{rotulos}}} {acumulado}')
+                rotulos = _rotulos(method=metodo, route=rota)
+                linhas.append(f'{nome}_sum{{{rotulos}}} {hist.soma:.6f}')
+                linhas.append(f'{nome}_count{{{rotulos}}} {hist.total}')
+
+        nome = 'eggvault_http_request_duration_quantile_seconds'
+        linhas.append(f'# HELP {nome} Quantis estimados do tempo total por rota')
+        linhas.append(f'# TYPE {nome} gauge')
+        for (metodo, rota), item in itens:
+            for q in QUANTIS:
+                rotulos = _rotulos(method=metodo, route=rota, quantile=q)
+                linhas.append(f'{nome}{{{rotulos}}} {item["duracao"].quantil(q):.6f}')
+
+        nome = 'eggvault_http_requests_total'
+        linhas.append(f'# HELP {nome} Requisições por rota e status')
+        linhas.append(f'# TYPE {nome} counter')
+        for (metodo, rota), item in itens:
+            for status, total in sorted(item['status'].items()):
+                linhas.append(f'{nome}{{{_rotulos(method=metodo, route=rota, status=status)}}} {total}')
+
+        nome = 'eggvault_db_queries_total'
+        linhas.append(f'# HELP {nome} Queries executadas por rota')
+        linhas.append(f'# TYPE {nome} counter')
+        for (metodo, rota), item in itens:
+            linhas.append(f'{nome}{{{_rotulos(method=metodo, route=rota)}}} {item["queries"]}')
+
+    linhas.extend(_linhas_banco())
+    linhas.extend(_linhas_eventos())
+    linhas.extend(_linhas_invalidacao())
+    return '\n'.join(linhas) + '\n'
+
+
+def _histograma_prometheus(nome, ajuda, hist):
+    linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+    for limite, acumulado in hist.acumulados():
+        linhas.append(f'{nome}_bucket{{le="{_formatar_le(limite)}"}} {acumulado}')
+    linhas.append(f'{nome}_sum {hist.soma:.6f}')
+    linhas.append(f'{nome}_count {hist.total}')
+    return linhas
+
+
+def _linhas_banco():
+    """SQLite: novas tentativas por SQLITE_BUSY e o escritor; PostgreSQL: pool e prepared statements."""
+    if database.USE_POSTGRES:
+        return _linhas_postgres()
+    contadores = database.estatisticas_escrita
+    linhas = [
+        '# HELP eggvault_sqlite_busy_retries_total Novas tentativas de escrita por banco ocupado',
+        '# TYPE eggvault_sqlite_busy_retries_total counter',
+        f'eggvault_sqlite_busy_retries_total {contadores["tentativas_busy"]}',
+        '# HELP eggvault_sqlite_busy_failures_total Escritas que falharam após esgotar as tentativas',
+        '# TYPE eggvault_sqlite_busy_failures_total counter',
+        f'eggvault_sqlite_busy_failures_total {contadores["falhas_busy"]}',
+    ]
+    if not database.SQLITE_WRITER:
+        return linhas
+
+    import sqlite_writer
+    est = sqlite_writer.estatisticas()
+    linhas += [
+        '# HELP eggvault_sqlite_writer_queue_depth Unidades de escrita aguardando na fila',
+        '# TYPE eggvault_sqlite_writer_queue_depth gauge',
+        f'eggvault_sqlite_writer_queue_depth {est["fila"]}',
+        '# HELP eggvault_sqlite_writer_commits_total Commits (lotes) feitos pelo escritor',
+        '# TYPE eggvault_sqlite_writer_commits_total counter',
+        f'eggvault_sqlite_writer_commits_total {est["commits"]}',
+        '# HELP eggvault_sqlite_writer_units_total Unidades de escrita processadas',
+        '# TYPE eggvault_sqlite_writer_units_total counter',
+        f'eggvault_sqlite_writer_units_total {est["unidades"]}',
+        '# HELP eggvault_sqlite_writer_unit_errors_total Unidades desfeitas por erro',
+        '# TYPE eggvault_sqlite_writer_unit_errors_total counter',
+        f'eggvault_sqlite_writer_unit_errors_total {est["erros_unidade"]}',
+        '# HELP eggvault_sqlite_writer_timeouts_total Unidades descartadas por SQLITE_WRITER_TIMEOUT_S',
+        '# TYPE eggvault_sqlite_writer_timeouts_total counter',
+        f'eggvault_sqlite_writer_timeouts_total {est["expiradas"]}',
+    ]
+    linhas += _histograma_prometheus(
+        'eggvault_sqlite_writer_batch_size', 'Unidades por commit', est['lote_histograma'])
+    linhas += _histograma_prometheus(
+        'eggvault_sqlite_writer_queue_wait_seconds', 'Espera na fila até o lote começar',
+        est['espera_fila_histograma'])
+    return linhas
+
+
+def _linhas_eventos():
+    """Conexões SSE abertas neste processo e eventos publicados/entregues."""
+    import eventos
+    est = eventos.estatisticas()
+    linhas = []
+    for nome, tipo, ajuda, valor in (
+        ('eggvault_sse_clients', 'gauge', 'Conexões /api/eventos abertas neste processo', est['assinantes']),
+        ('eggvault_events_published_total', 'counter', 'Eventos publicados no barramento', est['publicados']),
+        ('eggvault_events_delivered_total', 'counter', 'Eventos entregues às conexões SSE', est['entregues']),
+        ('eggvault_events_dropped_total', 'counter', 'Eventos descartados (cliente lento)', est['descartados']),
+        ('eggvault_events_publish_failures_total', 'counter', 'Publicações que falharam', est['falhas']),
+    ):
+        linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}', f'{nome} {valor}']
+    return linhas
+
+
+def _linhas_invalidacao():
+    """Invalidações de cache publicadas e recebidas de outros processos."""
+    import invalidacao
+    est = invalidacao.estatisticas()
+    linhas = []
+    for nome, ajuda, valor in (
+        ('eggvault_cache_invalidations_published_total', 'Invalidações publicadas por este processo',
+         est['publicadas']),
+        ('eggvault_cache_invalidations_received_total', 'Invalidações recebidas de outros processos',
+         est['recebidas']),
+        ('eggvault_cache_full_resets_total', 'Descartes de todos os caches (reconexão ou log perdido)',
+         est['descartes_totais']),
+        ('eggvault_cache_invalidation_failures_total', 'Invalidações que não foram publicadas',
+         est['falhas']),
+    ):
+        linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} counter', f'{nome} {valor}']
+    return linhas
+
+
+def _linhas_postgres():
+    """Pool de conexões e prepared statements do PostgreSQL."""
+    est = database.estatisticas_postgres()
+    linhas = []
+    for nome, tipo, ajuda, valor in (
+        ('eggvault_pg_pool_idle_connections', 'gauge', 'Conexões ociosas no pool', est['pool_ociosas']),
+        ('eggvault_pg_prepared_enabled', 'gauge', 'Prepared statements ativos (0 = desligados, ex.: pooler)',
+         int(est['prepared_ativo'])),
+        ('eggvault_pg_prepared_total', 'counter', 'Statements preparados', est['preparados']),
+        ('eggvault_pg_prepared_executions_total', 'counter', 'Execuções por EXECUTE', est['execucoes']),
+        ('eggvault_pg_prepared_evictions_total', 'counter', 'Statements desalocados pelo LRU', est['desalocados']),
+        ('eggvault_pg_prepared_rejected_total', 'counter', 'Queries que o PostgreSQL não aceitou preparar',
+         est['recusados']),
+        ('eggvault_db_circuit_state', 'gauge', 'Disjuntor do banco (0 = fechado, 1 = meio-aberto, 2 = aberto)',
+         ('fechado', 'meio_aberto', 'aberto').index(est['disjuntor']['estado'])),
+        ('eggvault_db_circuit_opens_total', 'counter', 'Vezes que o disjuntor abriu', est['disjuntor']['aberturas']),
+        ('eggvault_db_circuit_rejected_total', 'counter', 'Chamadas recusadas com o disjuntor aberto',
+         est['disjuntor']['rejeitadas']),
+    ):
+        linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}', f'{nome} {valor}']
+    linhas += [
+        '# HELP eggvault_db_retries_total Novas tentativas por falha transitória',
+        '# TYPE eggvault_db_retries_total counter',
+    ] + [
+        f'eggvault_db_retries_total{{{_rotulos(operacao=operacao)}}} {est[f"tentativas_{operacao}"]}'
+        for operacao in ('conexao', 'leitura', 'escrita')
+    ]
+    if not database.REPLICA_URLS:
+        return linhas
+
+    linhas += [
+        '# HELP eggvault_pg_replica_reads_total Leituras roteáveis por destino (réplica ou primário)',
+        '# TYPE eggvault_pg_replica_reads_total counter',
+        f'eggvault_pg_replica_reads_total{{{_rotulos(destino="replica")}}} {est["leituras_replica"]}',
+        f'eggvault_pg_replica_reads_total{{{_rotulos(destino="primario")}}} {est["leituras_primario"]}',
+        '# HELP eggvault_pg_replica_connect_failures_total Conexões com réplica que falharam',
+        '# TYPE eggvault_pg_replica_connect_failures_total counter',
+        f'eggvault_pg_replica_connect_failures_total {est["falhas_replica"]}',
+        '# HELP eggvault_pg_replica_lag_seconds Último atraso de replicação medido (NaN = desconhecido)',
+        '# TYPE eggvault_pg_replica_lag_seconds gauge',
+    ]
+    for replica in est['replicas']:
+        atraso = 'NaN' if replica['atraso_s'] is None else replica['atraso_s']
+        linhas.append(f'eggvault_pg_replica_lag_seconds{{{_rotulos(replica=replica["replica"])}}} {atraso}')
+    linhas += [
+        '# HELP eggvault_pg_replica_available Réplica recebendo leituras (atraso dentro do limite)',
+        '# TYPE eggvault_pg_replica_available gauge',
+    ]
+    for replica in est['replicas']:
+        linhas.append(f'eggvault_pg_replica_available{{{_rotulos(replica=replica["replica"])}}} '
+                      f'{int(replica["disponivel"])}')
+    return linhas
@@ -0,0 +1,319 @@
+"""
+Profiler sob demanda para requisições em produção.
+
+Desligado por padrão. Quando ativado (PROFILER_ENABLED=1 ou pelo admin em
+PUT /api/admin/profiler) o app WSGI é envolvido por um middleware que
+perfila com cProfile:
+
+  - 1 a cada `amostragem` requisições (0 = nenhuma por amostragem);
+  - requisições cujo caminho começa com `rota`;
+  - requisições de um admin autenticado que trazem o cabeçalho `cabecalho`.
+
+Para cada requisição perfilada são gravados em PROFILER_DIR:
+
+  <id>.prof       estatísticas brutas (pstats / snakeviz)
+  <id>.txt        top funções por tempo acumulado
+  <id>.collapsed  pilhas colapsadas (flamegraph.pl, speedscope)
+  <id>.json       metadados (rota, status, duração)
+
+Desativado, o middleware é removido e app.wsgi_app volta a ser o original.
+Cada worker tem a sua configuração: a feita pelo admin é repassada aos
+outros pelo barramento de invalidação (chave 'profiler'); um worker que
+perder o aviso ou subir depois fica com a de PROFILER_ENABLED.
+"""
+
+import io
+import os
+import re
+import json
+import time
+import pstats
+import cProfile
+import itertools
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from werkzeug.http import parse_cookie
+
+import invalidacao
+
+
+PROFILER_DIR = Path(os.environ.get('PROFILER_DIR', '').strip() or (
+    '/tmp/eggvault_profiles' if os.environ.get('VERCEL') else Path(__file__).parent / 'profiles'
+))
+PROFILER_MAX = int(os.environ.get('PROFILER_MAX', '50'))
+TOP_FUNCOES = 40
+
+_EXTENSOES = ('.prof', '.txt', '.collapsed', '.json')
+_RE_ARQUIVO = re.compile(r'^[\w.-]+\.(?:prof|txt|collapsed|json)$')
+
+_config = {'ativo': False, 'amostragem': 0, 'rota': '', 'cabecalho': ''}
+_config_lock = threading.Lock()
+_app = [None]
+_BOOLEANOS = {'1': True, 'true': True, 'yes': True, 'sim': True,
+              '0': False, 'false': False, 'no': False, 'nao': False, 'não': False}
+
+# No Python 3.12+ só um cProfile pode estar ativo por processo; requisições
+# concorrentes que também seriam perfiladas passam sem profiler.
+_perfilando = threading.Lock()
+
+
+# ═══════════════════════════════════════════
+# PILHAS COLAPSADAS
+# ═══════════════════════════════════════════
+
+def _nome_funcao(func):
+    arquivo, linha, nome = func
+    if arquivo == '~':
+        return nome.replace(';', ',')
+    return f'{os.path.basename(arquivo)}:{linha}({nome})'.replace(';', ',')
+
+
+def pilhas_colapsadas(stats, profundidade_max=64, minimo=1e-5):
+    """
+    Reconstrói pilhas aproximadas a partir do grafo caller → callee do cProfile.
+
+    O cProfile guarda apenas arestas, então o tempo de cada função é
+    distribuído entre os chamadores na proporção do tempo acumulado de cada
+    aresta. Retorna linhas 'raiz;...;folha <microssegundos>'.
+    """
+    chamados = {}
+    raizes = []
+    for func, (_cc, _nc, _tt, _ct, chamadores) in stats.items():
+        if not chamadores:
+            raizes.append(func)
+        for chamador, aresta in chamadores.items():
+            chamados.setdefault(chamador, []).append((func, aresta[3]))
+
+    totais = {}
+
+    def visitar(func, pilha, fator):
+        _cc, _nc, tt, ct, _ = stats[func]
+        proprio = tt * fator
+        if proprio >= minimo:
+            chave = ';'.join(_nome_funcao(f) for f in pilha)
+            totais[chave] = totais.get(chave, 0.0) + proprio
+        if len(pilha) >= profundidade_max:
+            return
+        for filho, ct_aresta in chamados.get(func, ()):
+            ct_filho = stats[filho][3]
+            if filho in pilha or ct_filho <= 0:
+                continue
+            fator_filho = fator * ct_aresta / ct_filho
+            if fator_filho * ct_filho >= minimo:
+                visitar(filho, pilha + (filho,), fator_filho)
+
+    for raiz in raizes:
+        visitar(raiz, (raiz,), 1.0)
+
+    return [f'{pilha} {int(round(segundos * 1_000_000))}'
+            for pilha, segundos in sorted(totais.items()) if segundos * 1_000_000 >= 1]
+
+
+# ═══════════════════════════════════════════
+# ARMAZENAMENTO
+# ═══════════════════════════════════════════
+
+def _salvar(profile, meta):
+    PROFILER_DIR.mkdir(parents=True, exist_ok=True)
+    rota = re.sub(r'[^\w-]+', '_', meta['caminho']).strip('_') or 'raiz'
+    identificador = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{meta['metodo']}_{rota}"[:150]
+    base = PROFILER_DIR / identificador
+
+    profile.dump_stats(str(base) + '.prof')
+
+    texto = io.StringIO()
+    stats = pstats.Stats(profile, stream=texto)
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCOES)
+    (Path(str(base) + '.txt')).write_text(texto.getvalue(), encoding='utf-8')
+
+    linhas = pilhas_colapsadas(stats.stats)
+    (Path(str(base) + '.collapsed')).write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+
+    meta = {'id': identificador, **meta}
+    (Path(str(base) + '.json')).write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+
+    _aplicar_retencao()
+    return meta
+
+
+def _aplicar_retencao():
+    """Mantém apenas os PROFILER_MAX perfis mais recentes."""
+    metas = sorted(PROFILER_DIR.glob('*.json'))
+    for antigo in metas[:max(0, len(metas) - PROFILER_MAX)]:
+        for ext in _EXTENSOES:
+            Path(str(antigo)[:-len('.json')] + ext).unlink(missing_ok=True)
+
+
+def listar(limite=50):
+    """Perfis gravados, do mais recente para o mais antigo."""
+    if not PROFILER_DIR.exists():
+        return []
+    perfis = []
+    for caminho in sorted(PROFILER_DIR.glob('*.json'), reverse=True)[:limite]:
+        try:
+            meta = json.loads(caminho.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        meta['arquivos'] = [
+            meta['id'] + ext for ext in _EXTENSOES[:-1]
+            if (PROFILER_DIR / (meta['id'] + ext)).exists()
+        ]
+        perfis.append(meta)
+    return perfis
+
+
+def caminho_arquivo(nome):
+    """Caminho de um arquivo de perfil (None se o nome for inválido ou não existir)."""
+    if not _RE_ARQUIVO.match(nome or ''):
+        return None
+    caminho = PROFILER_DIR / nome
+    return caminho if caminho.is_file() else None
+
+
+# ═══════════════════════════════════════════
+# MIDDLEWARE
+# ═══════════════════════════════════════════
+
+def _admin(environ):
+    """A requisição traz o token de um admin (Authorization ou cookie auth_token)."""
+    from services.auth_service import AuthService
+    token = environ.get('HTTP_AUTHORIZATION', '').replace('Bearer ', '')
+    if not token:
+        token = parse_cookie(environ).get('auth_token', '')
+    usuario = AuthService.validar_token(token)
+    return bool(usuario and usuario.get('is_admin'))
+
+
+class ProfilerMiddleware:
+    """Middleware WSGI que perfila as requisições selecionadas."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self._contador = itertools.count(1)
+
+    def _selecionada(self, environ):
+        with _config_lock:
+            amostragem, rota, cabecalho = _config['amostragem'], _config['rota'], _config['cabecalho']
+        if rota and environ.get('PATH_INFO', '').startswith(rota):
+            return True
+        if cabecalho and environ.get('HTTP_' + cabecalho.upper().replace('-', '_')) and _admin(environ):
+            return True
+        return amostragem > 0 and next(self._contador) % amostragem == 0
+
+    def __call__(self, environ, start_response):
+        if not self._selecionada(environ) or not _perfilando.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        status = {}
+
+        def start_response_capturado(codigo, headers, *args):
+            status['codigo'] = int(codigo.split(' ', 1)[0])
+            return start_response(codigo, headers, *args)
+
+        profile = cProfile.Profile()
+        inicio = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                return self.wsgi_app(environ, start_response_capturado)
+            finally:
+                profile.disable()
+        finally:
+            _perfilando.release()
+            try:
+                _salvar(profile, {
+                    'metodo': environ.get('REQUEST_METHOD', ''),
+                    'caminho': environ.get('PATH_INFO', ''),
+                    'query': environ.get('QUERY_STRING', ''),
+                    'status': status.get('codigo'),
+                    'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2),
+                    'data': datetime.now().isoformat(),
+                })
+            except OSError as e:
+                print(f"⚠️  Falha ao gravar perfil: {e}")
+
+
+# ═══════════════════════════════════════════
+# CONTROLE
+# ═══════════════════════════════════════════
+
+def configuracao():
+    with _config_lock:
+        return dict(_config)
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    chave = str(valor).strip().lower()
+    if chave not in _BOOLEANOS:
+        raise ValueError("Ativo deve ser true ou false")
+    return _BOOLEANOS[chave]
+
+
+def configurar(app, ativo=None, amostragem=None, rota=None, cabecalho=None, propagar=False):
+    """
+    Atualiza a configuração e liga/desliga o middleware.
+
+    Com `propagar`, a configuração resultante vai também para os outros
+    workers pelo barramento de invalidação.
+
+    Raises:
+        ValueError: Se algum valor for inválido.
+    """
+    if ativo is not None:
+        ativo = _booleano(ativo)
+    if amostragem is not None:
+        amostragem = int(amostragem)
+        if amostragem < 0:
+            raise ValueError("Amostragem deve ser >= 0")
+    if rota is not None:
+        rota = str(rota).strip()
+        if rota and not rota.startswith('/'):
+            raise ValueError("Rota deve começar com '/'")
+    if cabecalho is not None:
+        cabecalho = str(cabecalho).strip()
+        if cabecalho and not re.match(r'^[A-Za-z0-9-]+$', cabecalho):
+            raise ValueError("Cabeçalho inválido")
+
+    with _config_lock:
+        for chave, valor in (('amostragem', amostragem), ('rota', rota), ('cabecalho', cabecalho)):
+            if valor is not None:
+                _config[chave] = valor
+        if ativo is not None:
+            _config['ativo'] = ativo
+
+        envolvido = isinstance(app.wsgi_app, ProfilerMiddleware)
+        if _config['ativo'] and not envolvido:
+            app.wsgi_app = ProfilerMiddleware(app.wsgi_app)
+        elif not _config['ativo'] and envolvido:
+            app.wsgi_app = app.wsgi_app.wsgi_app
+        config = dict(_config)
+
+    if propagar:
+        invalidacao.publicar('profiler', config)
+    return config
+
+
+def _recebida(config):
+    """Aplica a configuração publicada por outro worker."""
+    # None é o descarte geral de caches: não há o que recarregar aqui
+    if config is not None and _app[0] is not None:
+        configurar(_app[0], **config)
+
+
+def instalar(app):
+    """Ativa o profiler na inicialização se PROFILER_ENABLED=1."""
+    _app[0] = app
+    if os.environ.get('PROFILER_ENABLED', '0').strip() in ('1', 'true', 'yes'):
+        configurar(
+            app, ativo=True,
+            amostragem=os.environ.get('PROFILER_AMOSTRAGEM', '100'),
+            rota=os.environ.get('PROFILER_ROTA', ''),
+            cabecalho=os.environ.get('PROFILER_CABECALHO', 'X-Profile'),
+        )
+
+
+invalidacao.assinar('profiler', _recebida)
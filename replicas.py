@@ -0,0 +1,75 @@
+"""
+Read-your-writes com réplicas de leitura do PostgreSQL.
+
+Com DATABASE_REPLICA_URLS configurada, as leituras marcadas nos
+repositórios (get_connection(leitura=True): relatórios, exportações,
+listagens do mês, painel) podem ir para uma réplica. Para que quem
+acabou de gravar veja o que gravou:
+
+- requests que escrevem (POST/PUT/PATCH/DELETE) leem só do primário;
+- depois de uma escrita bem-sucedida o navegador recebe o cookie
+  ev_primario, e até ele vencer as leituras daquele usuário continuam no
+  primário. A janela é REPLICA_LAG_MAX_S + REPLICA_VERIFICACAO_S: uma
+  réplica só é usada com atraso medido de até REPLICA_LAG_MAX_S, e a
+  medida pode ter até REPLICA_VERIFICACAO_S segundos.
+
+Fora de requests (scripts, jobs) use `with database.primario():` onde
+for preciso ler a própria escrita. Sem réplicas nada é instalado.
+"""
+
+import math
+import time
+
+from flask import g, request
+
+import database
+
+
+COOKIE = 'ev_primario'
+METODOS_LEITURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+def janela_primario():
+    """Segundos em que as leituras ficam no primário após uma escrita."""
+    return database.REPLICA_LAG_MAX_S + database.REPLICA_VERIFICACAO_S
+
+
+def _escreveu_recentemente():
+    try:
+        return float(request.cookies.get(COOKIE, '0')) > time.time()
+    except ValueError:
+        return False
+
+
+def _antes():
+    if request.method not in METODOS_LEITURA or _escreveu_recentemente():
+        g.replicas_token = database._forcar_primario.set(True)
+
+
+def _depois(response):
+    if request.method not in METODOS_LEITURA and response.status_code < 400:
+        janela = janela_primario()
+        response.set_cookie(
+            COOKIE, f'{time.time() + janela:.3f}', max_age=math.ceil(janela),
+            httponly=True, samesite='Lax', secure=request.is_secure
+        )
+    return response
+
+
+def _limpar(_erro=None):
+    token = g.pop('replicas_token', None)
+    if token is not None:
+        try:
+            database._forcar_primario.reset(token)
+        except ValueError:
+            # Token de outro contexto (ex.: teardown em outra thread)
+            database._forcar_primario.set(False)
+
+
+def instalar(app):
+    """Liga o read-your-writes no app (no-op sem réplicas configuradas)."""
+    if not database.REPLICA_URLS:
+        return
+    app.before_request(_antes)
+    app.after_request(_depois)
+    app.teardown_request(_limpar)
@@ -0,0 +1,73 @@
+"""Repositório do log de alterações (delta-sync das listagens da SPA)."""
+
+from database import get_connection, executar_escrita, TABELAS_ALTERACOES
+
+
+class AlteracaoRepository:
+    """Leitura da tabela alteracoes, alimentada por triggers no banco."""
+
+    @staticmethod
+    def versao_atual():
+        """Maior sequência do log (0 se vazio)."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS versao, MIN(id) AS primeira FROM alteracoes")
+        row = cursor.fetchone()
+        conn.close()
+        return row['versao'], row['primeira']
+
+    @staticmethod
+    def listar(desde, ate, tabelas, limite):
+        """
+        Última alteração de cada registro no intervalo (desde, ate].
+
+        Um registro alterado várias vezes aparece uma vez só, na sequência
+        da alteração mais recente.
+
+        Returns:
+            Lista de dicts com id (sequência), tabela, registro_id e operacao.
+        """
+        marcadores = ', '.join('?' for _ in tabelas)
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT a.id, a.tabela, a.registro_id, a.operacao FROM alteracoes a
+                WHERE a.id > ? AND a.id <= ? AND a.tabela IN ({marcadores})
+                  AND NOT EXISTS (
+                      SELECT 1 FROM alteracoes b
+                      WHERE b.tabela = a.tabela AND b.registro_id = a.registro_id
+                        AND b.id > a.id AND b.id <= ?
+                  )
+                ORDER BY a.id LIMIT ?""",
+            (desde, ate, *tabelas, ate, limite)
+        )
+        rows = [dict(r) for r in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    @staticmethod
+    def registros(tabela, ids):
+        """Estado atual dos registros de uma tabela do log, por id."""
+        if tabela not in TABELAS_ALTERACOES:
+            raise ValueError(f"Tabela sem log de alterações: {tabela}")
+        marcadores = ', '.join('?' for _ in ids)
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM {tabela} WHERE id IN ({marcadores})", tuple(ids))
+        rows = {r['id']: dict(r) for r in cursor.fetchall()}
+        conn.close()
+        return rows
+
+    @staticmethod
+    def purgar(antes):
+        """
+        Remove alterações antigas, mantendo a mais recente (a versão atual).
+
+        Returns:
+            Quantas foram removidas.
+        """
+        return executar_escrita(lambda conn: conn.execute(
+            "DELETE FROM alteracoes WHERE criado_em < ? "
+            "AND id < (SELECT MAX(id) FROM alteracoes)",
+            (antes,)
+        ).rowcount)
@@ -1,6 +1,6 @@
 """Repositório de acesso a dados de Clientes."""
 
-from database import get_connection
+from database import get_connection, executar_escrita
 from datetime import datetime
 
 
@@ -10,22 +10,21 @@ class ClienteRepository:
     @staticmethod
     def create(nome, numero=None):
         """Cria um novo cliente. Retorna o ID criado."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """INSERT INTO clientes (nome, numero, data_criacao)
-               VALUES (?, ?, ?)""",
-            (nome.strip(), numero, datetime.now().isoformat())
-        )
-        cliente_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return cliente_id
+        def _inserir(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO clientes (nome, numero, data_criacao)
+                   VALUES (?, ?, ?)""",
+                (nome.strip(), numero, datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+        return executar_escrita(_inserir)
 
     @staticmethod
     def get_all():
         """Retorna todos os clientes ordenados por nome."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM clientes ORDER BY nome ASC"
@@ -47,51 +46,45 @@ class ClienteRepository:
     @staticmethod
     def update(cliente_id, nome=None, numero=None):
         """Atualiza nome e/ou número de um cliente."""
-        conn = get_connection()
-        cursor = conn.cursor()
+        def _atualizar(conn):
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM clientes WHERE id = ?", (cliente_id,))
-        row = cursor.fetchone()
-        if row is None:
-            conn.close()
-            raise ValueError("Cliente não encontrado")
+            cursor.execute("SELECT * FROM clientes WHERE id = ?", (cliente_id,))
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError("Cliente não encontrado")
 
-        novo_nome = nome.strip() if nome is not None else row['nome']
-        novo_numero = numero if numero is not None else row['numero']
+            novo_nome = nome.strip() if nome is not None else row['nome']
+            novo_numero = numero if numero is not None else row['numero']
 
-        cursor.execute(
-            "UPDATE clientes SET nome = ?, numero = ? WHERE id = ?",
-            (novo_nome, novo_numero, cliente_id)
-        )
-        conn.commit()
-        conn.close()
+            cursor.execute(
+                "UPDATE clientes SET nome = ?, numero = ? WHERE id = ?",
+                (novo_nome, novo_numero, cliente_id)
+            )
+
+        executar_escrita(_atualizar)
 
     @staticmethod
     def delete(cliente_id):
         """Remove um cliente."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM clientes WHERE id = ?", (cliente_id,))
-        if cursor.fetchone() is None:
-            conn.close()
-            raise ValueError("Cliente não encontrado")
-        cursor.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
-        conn.commit()
-        conn.close()
+        def _remover(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM clientes WHERE id = ?", (cliente_id,))
+            if cursor.fetchone() is None:
+                raise ValueError("Cliente não encontrado")
+            cursor.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
+
+        executar_escrita(_remover)
 
     @staticmethod
     def update_ultima_compra(cliente_id, data_compra=None):
         """Atualiza o campo data_ultima_compra do cliente."""
         if data_compra is None:
             data_compra = datetime.now().isoformat()
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
+        executar_escrita(lambda conn: conn.execute(
             "UPDATE clientes SET data_ultima_compra = ? WHERE id = ?",
             (data_compra, cliente_id)
-        )
-        conn.commit()
-        conn.close()
+        ))
 
     @staticmethod
     def exists_by_nome_numero(nome, numero, exclude_id=None):
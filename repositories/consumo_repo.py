@@ -1,30 +1,31 @@
-from database import get_connection
+from database import get_connection, executar_escrita
 from datetime import datetime
 
 
 class ConsumoRepository:
     @staticmethod
-    def create(quantidade, observacao='', mes_referencia=None, usuario_id=None, usuario_nome=''):
-        """Cria um novo registro de consumo pessoal."""
+    def create(quantidade, observacao='', mes_referencia=None, usuario_id=None, usuario_nome='', data=None):
+        """Cria um novo registro de consumo pessoal (`data`: hora do registro; padrão: agora)."""
+        return executar_escrita(lambda conn: ConsumoRepository.inserir(
+            conn, quantidade, observacao, mes_referencia, usuario_id, usuario_nome, data))
+
+    @staticmethod
+    def inserir(conn, quantidade, observacao='', mes_referencia=None, usuario_id=None, usuario_nome='', data=None):
+        """Como create, dentro da transação de `conn` (sem commit). Retorna o ID."""
         if mes_referencia is None:
             mes_referencia = datetime.now().strftime('%Y-%m')
-
-        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO consumo (quantidade, data, observacao, mes_referencia, usuario_id, usuario_nome)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (quantidade, datetime.now().isoformat(), observacao, mes_referencia, usuario_id, usuario_nome)
+            (quantidade, (data or datetime.now()).isoformat(), observacao, mes_referencia, usuario_id, usuario_nome)
         )
-        entry_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return entry_id
+        return cursor.lastrowid
 
     @staticmethod
     def get_by_month(mes_referencia):
         """Retorna todos os registros de consumo de um mês específico."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM consumo WHERE mes_referencia = ? ORDER BY data DESC",
@@ -37,7 +38,7 @@ class ConsumoRepository:
     @staticmethod
     def get_total_by_month(mes_referencia):
         """Retorna o total de ovos consumidos em um mês."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT COALESCE(SUM(quantidade), 0) as total FROM consumo WHERE mes_referencia = ?",
@@ -49,16 +50,15 @@ class ConsumoRepository:
 
     @staticmethod
     def delete(entry_id):
-        conn = get_connection()
+        return executar_escrita(lambda conn: ConsumoRepository.remover(conn, entry_id))
+
+    @staticmethod
+    def remover(conn, entry_id):
+        """Remove o registro na transação de `conn` (sem commit). Retorna (quantidade, mes_referencia)."""
         cursor = conn.cursor()
         cursor.execute("SELECT quantidade, mes_referencia FROM consumo WHERE id = ?", (entry_id,))
         row = cursor.fetchone()
         if row is None:
-            conn.close()
             raise ValueError("Registro de consumo não encontrado")
-        quantidade = row['quantidade']
-        mes_referencia = row['mes_referencia']
         cursor.execute("DELETE FROM consumo WHERE id = ?", (entry_id,))
-        conn.commit()
-        conn.close()
-        return quantidade, mes_referencia
+        return row['quantidade'], row['mes_referencia']
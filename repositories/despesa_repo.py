@@ -1,6 +1,6 @@
 """Repositório de acesso a dados de Despesas."""
 
-from database import get_connection
+from database import get_connection, executar_escrita
 from datetime import datetime
 
 
@@ -13,22 +13,21 @@ class DespesaRepository:
         if mes_referencia is None:
             mes_referencia = datetime.now().strftime('%Y-%m')
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """INSERT INTO despesas (valor, descricao, data, mes_referencia, usuario_id, usuario_nome)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (valor, descricao, datetime.now().isoformat(), mes_referencia, usuario_id, usuario_nome)
-        )
-        entry_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return entry_id
+        def _inserir(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO despesas (valor, descricao, data, mes_referencia, usuario_id, usuario_nome)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (valor, descricao, datetime.now().isoformat(), mes_referencia, usuario_id, usuario_nome)
+            )
+            return cursor.lastrowid
+
+        return executar_escrita(_inserir)
 
     @staticmethod
     def get_by_month(mes_referencia):
         """Retorna todas as despesas de um mês específico."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM despesas WHERE mes_referencia = ? ORDER BY data DESC",
@@ -41,7 +40,7 @@ class DespesaRepository:
     @staticmethod
     def get_total_by_month(mes_referencia):
         """Retorna o total de despesas em um mês."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT COALESCE(SUM(valor), 0) as total FROM despesas WHERE mes_referencia = ?",
@@ -54,16 +53,13 @@ class DespesaRepository:
     @staticmethod
     def delete(entry_id):
         """Remove uma despesa pelo ID e retorna o valor."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT valor, mes_referencia FROM despesas WHERE id = ?", (entry_id,))
-        row = cursor.fetchone()
-        if row is None:
-            conn.close()
-            raise ValueError("Despesa não encontrada")
-        valor = row['valor']
-        mes_referencia = row['mes_referencia']
-        cursor.execute("DELETE FROM despesas WHERE id = ?", (entry_id,))
-        conn.commit()
-        conn.close()
-        return valor, mes_referencia
+        def _remover(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT valor, mes_referencia FROM despesas WHERE id = ?", (entry_id,))
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError("Despesa não encontrada")
+            cursor.execute("DELETE FROM despesas WHERE id = ?", (entry_id,))
+            return row['valor'], row['mes_referencia']
+
+        return executar_escrita(_remover)
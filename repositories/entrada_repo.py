@@ -1,6 +1,6 @@
 """Repositório de acesso a dados de Entradas."""
 
-from database import get_connection
+from database import get_connection, executar_escrita
 from datetime import datetime
 
 
@@ -8,27 +8,28 @@ class EntradaRepository:
     """Operações CRUD para a tabela entradas."""
 
     @staticmethod
-    def create(quantidade, observacao='', mes_referencia=None, usuario_id=None, usuario_nome=''):
-        """Cria um novo registro de entrada."""
+    def create(quantidade, observacao='', mes_referencia=None, usuario_id=None, usuario_nome='', data=None):
+        """Cria um novo registro de entrada (`data`: hora do registro; padrão: agora)."""
+        return executar_escrita(lambda conn: EntradaRepository.inserir(
+            conn, quantidade, observacao, mes_referencia, usuario_id, usuario_nome, data))
+
+    @staticmethod
+    def inserir(conn, quantidade, observacao='', mes_referencia=None, usuario_id=None, usuario_nome='', data=None):
+        """Como create, dentro da transação de `conn` (sem commit). Retorna o ID."""
         if mes_referencia is None:
             mes_referencia = datetime.now().strftime('%Y-%m')
-
-        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO entradas (quantidade, data, observacao, mes_referencia, usuario_id, usuario_nome)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (quantidade, datetime.now().isoformat(), observacao, mes_referencia, usuario_id, usuario_nome)
+            (quantidade, (data or datetime.now()).isoformat(), observacao, mes_referencia, usuario_id, usuario_nome)
         )
-        entry_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return entry_id
+        return cursor.lastrowid
 
     @staticmethod
     def get_by_month(mes_referencia):
         """Retorna todas as entradas de um mês específico."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM entradas WHERE mes_referencia = ? ORDER BY data DESC",
@@ -41,7 +42,7 @@ class EntradaRepository:
     @staticmethod
     def get_total_by_month(mes_referencia):
         """Retorna o total de ovos que entraram em um mês."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT COALESCE(SUM(quantidade), 0) as total FROM entradas WHERE mes_referencia = ?",
@@ -62,16 +63,15 @@ class EntradaRepository:
 
     @staticmethod
     def delete(entry_id):
-        conn = get_connection()
+        return executar_escrita(lambda conn: EntradaRepository.remover(conn, entry_id))
+
+    @staticmethod
+    def remover(conn, entry_id):
+        """Remove o registro na transação de `conn` (sem commit). Retorna (quantidade, mes_referencia)."""
         cursor = conn.cursor()
         cursor.execute("SELECT quantidade, mes_referencia FROM entradas WHERE id = ?", (entry_id,))
         row = cursor.fetchone()
         if row is None:
-            conn.close()
             raise ValueError("Entrada não encontrada")
-        quantidade = row['quantidade']
-        mes_referencia = row['mes_referencia']
         cursor.execute("DELETE FROM entradas WHERE id = ?", (entry_id,))
-        conn.commit()
-        conn.close()
-        return quantidade, mes_referencia
+        return row['quantidade'], row['mes_referencia']
@@ -1,30 +1,110 @@
 """Repositório de acesso a dados do Estoque."""
 
-from database import get_connection
+import os
+from database import get_connection, executar_escrita, USE_POSTGRES
 from datetime import datetime
 
 
+# Chave do advisory lock que serializa as saídas de estoque no PostgreSQL
+_LOCK_ESTOQUE = 7_320_001
+
+
 class EstoqueRepository:
-    """Operações CRUD para a tabela estoque."""
+    """
+    Livro-razão do estoque.
+
+    Cada operação grava um movimento assinado em estoque_movimentos (nenhuma
+    linha é atualizada). A cada SNAPSHOT_INTERVALO movimentos é gravado um
+    snapshot com o saldo acumulado, de modo que o saldo atual — ou em qualquer
+    instante — é o último snapshot mais a soma de poucos movimentos.
+    """
+
+    SNAPSHOT_INTERVALO = int(os.environ.get('ESTOQUE_SNAPSHOT_INTERVALO', '100'))
 
     @staticmethod
-    def get_current():
-        """Retorna o registro atual de estoque."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM estoque ORDER BY id DESC LIMIT 1")
+    def _ultimo_snapshot(cursor, ate_data=None):
+        """Retorna o snapshot mais recente (opcionalmente até uma data)."""
+        if ate_data is None:
+            cursor.execute(
+                "SELECT movimento_id, quantidade_total, data FROM estoque_snapshots "
+                "ORDER BY movimento_id DESC LIMIT 1"
+            )
+        else:
+            cursor.execute(
+                "SELECT movimento_id, quantidade_total, data FROM estoque_snapshots "
+                "WHERE data <= ? ORDER BY movimento_id DESC LIMIT 1",
+                (ate_data,)
+            )
         row = cursor.fetchone()
-        conn.close()
         return dict(row) if row else None
 
     @staticmethod
-    def update_quantidade(delta, operacao='add'):
+    def _saldo(cursor):
+        """Calcula o saldo atual: último snapshot + movimentos posteriores."""
+        snapshot = EstoqueRepository._ultimo_snapshot(cursor)
+        base_id = snapshot['movimento_id'] if snapshot else 0
+        cursor.execute(
+            "SELECT COALESCE(SUM(delta), 0) AS soma, MAX(id) AS ultimo_id, MAX(data) AS ultima_data "
+            "FROM estoque_movimentos WHERE id > ?",
+            (base_id,)
+        )
+        row = dict(cursor.fetchone())
+        if snapshot is None and row['ultimo_id'] is None:
+            return None
+        return {
+            'id': row['ultimo_id'] or base_id,
+            'quantidade_total': (snapshot['quantidade_total'] if snapshot else 0) + row['soma'],
+            'ultima_atualizacao': row['ultima_data'] or snapshot['data'],
+        }
+
+    @staticmethod
+    def get_current(cursor=None):
+        """Retorna o saldo atual do estoque (id e data do último movimento).
+
+        Aceita um cursor já aberto para compartilhar a conexão com outras
+        consultas (ex.: bootstrap do painel).
+        """
+        if cursor is not None:
+            return EstoqueRepository._saldo(cursor)
+        conn = get_connection(leitura=True)
+        saldo = EstoqueRepository._saldo(conn.cursor())
+        conn.close()
+        return saldo
+
+    @staticmethod
+    def get_em(data):
         """
-        Atualiza a quantidade do estoque.
+        Retorna o saldo do estoque em um instante.
 
         Args:
-            delta: Quantidade a adicionar ou subtrair.
-            operacao: 'add' para entrada, 'subtract' para saída.
+            data: Data/hora ISO (mesmo formato gravado nos movimentos).
+
+        Returns:
+            Quantidade total naquele instante.
+        """
+        conn = get_connection(leitura=True)
+        cursor = conn.cursor()
+        snapshot = EstoqueRepository._ultimo_snapshot(cursor, data)
+        base_id = snapshot['movimento_id'] if snapshot else 0
+        cursor.execute(
+            "SELECT COALESCE(SUM(delta), 0) AS soma FROM estoque_movimentos "
+            "WHERE id > ? AND data <= ?",
+            (base_id, data)
+        )
+        soma = cursor.fetchone()['soma']
+        conn.close()
+        return (snapshot['quantidade_total'] if snapshot else 0) + soma
+
+    @staticmethod
+    def registrar_movimento(delta, origem, referencia_id=None, data=None):
+        """
+        Grava um movimento de estoque.
+
+        Args:
+            delta: Quantidade assinada (positiva entra, negativa sai).
+            origem: Tipo do movimento ('entrada', 'saida', 'estorno_entrada', ...).
+            referencia_id: ID do registro que originou o movimento.
+            data: Hora do movimento (datetime); padrão: agora.
 
         Returns:
             Nova quantidade total.
@@ -32,42 +112,165 @@ class EstoqueRepository:
         Raises:
             ValueError: Se o estoque ficar negativo.
         """
-        conn = get_connection()
+        total, pendentes = executar_escrita(
+            lambda conn: EstoqueRepository.gravar_movimento(conn, delta, origem, referencia_id, data))
+        EstoqueRepository.snapshot_se_preciso(pendentes)
+        return total
+
+    @staticmethod
+    def gravar_movimento(conn, delta, origem, referencia_id=None, data=None):
+        """
+        Grava um movimento dentro da transação de `conn` (sem commit).
+
+        Usado para gravar o registro que originou o movimento (entrada,
+        venda, remoção...) na mesma transação: se o estoque ficaria
+        negativo, nenhum dos dois é gravado.
+
+        Returns:
+            Tupla (nova quantidade total, movimentos desde o último
+            snapshot), a passar para snapshot_se_preciso depois do commit.
+
+        Raises:
+            ValueError: Se o estoque ficar negativo.
+        """
         cursor = conn.cursor()
 
+        if USE_POSTGRES and delta < 0:
+            # Apenas saídas disputam o lock; entradas só fazem INSERT.
+            cursor.execute("SELECT pg_advisory_xact_lock(?)", (_LOCK_ESTOQUE,))
+
+        # Insere somente se o saldo não ficar negativo (checagem e escrita
+        # no mesmo comando).
         cursor.execute(
-            "SELECT id, quantidade_total FROM estoque ORDER BY id DESC LIMIT 1"
+            "INSERT INTO estoque_movimentos (delta, origem, referencia_id, data) "
+            "SELECT ?, ?, ?, ? WHERE "
+            "COALESCE((SELECT quantidade_total FROM estoque_snapshots "
+            "          ORDER BY movimento_id DESC LIMIT 1), 0) + "
+            "COALESCE((SELECT SUM(delta) FROM estoque_movimentos WHERE id > "
+            "          COALESCE((SELECT MAX(movimento_id) FROM estoque_snapshots), 0)), 0) + ? >= 0",
+            (delta, origem, referencia_id, (data or datetime.now()).isoformat(), delta)
         )
-        row = cursor.fetchone()
+        if cursor.rowcount == 0:
+            raise ValueError("Estoque insuficiente para esta operação")
 
-        if row is None:
-            cursor.execute(
-                "INSERT INTO estoque (quantidade_total, ultima_atualizacao) VALUES (0, ?)",
-                (datetime.now().isoformat(),)
-            )
-            conn.commit()
-            current_qty = 0
-            estoque_id = cursor.lastrowid
-        else:
-            current_qty = row['quantidade_total']
-            estoque_id = row['id']
+        movimento_id = cursor.lastrowid
+        snapshot = EstoqueRepository._ultimo_snapshot(cursor)
+        pendentes = movimento_id - (snapshot['movimento_id'] if snapshot else 0)
+        return EstoqueRepository._saldo(cursor)['quantidade_total'], pendentes
 
-        if operacao == 'add':
-            new_qty = current_qty + delta
-        elif operacao == 'subtract':
-            new_qty = current_qty - delta
-        else:
-            conn.close()
-            raise ValueError(f"Operação inválida: {operacao}")
+    @staticmethod
+    def snapshot_se_preciso(pendentes):
+        """Grava um snapshot se já houver SNAPSHOT_INTERVALO movimentos desde o último."""
+        # O snapshot vai em outra transação: no PostgreSQL ele precisa ver
+        # as inserções concorrentes já confirmadas.
+        if pendentes >= EstoqueRepository.SNAPSHOT_INTERVALO:
+            executar_escrita(EstoqueRepository._criar_snapshot)
 
-        if new_qty < 0:
-            conn.close()
-            raise ValueError("Estoque insuficiente para esta operação")
+    @staticmethod
+    def _criar_snapshot(conn):
+        """Grava um snapshot com o saldo até o último movimento confirmado (sem commit)."""
+        cursor = conn.cursor()
+        if USE_POSTGRES:
+            # Espera as inserções em andamento terminarem, para que nenhum
+            # id menor que o do snapshot ainda esteja pendente.
+            cursor.execute("LOCK TABLE estoque_movimentos IN SHARE MODE")
+        saldo = EstoqueRepository._saldo(cursor)
+        # Data = a maior até ele: um movimento retroativo (anotado offline)
+        # tem id maior que movimentos mais novos, e get_em só pode usar o
+        # snapshot num instante em que todos os movimentos dele já valiam
+        cursor.execute(
+            "INSERT INTO estoque_snapshots (movimento_id, quantidade_total, data) "
+            "SELECT ?, ?, MAX(data) FROM estoque_movimentos WHERE id <= ? "
+            "ON CONFLICT (movimento_id) DO NOTHING",
+            (saldo['id'], saldo['quantidade_total'], saldo['id'])
+        )
+
+    # Expressão do período (chave ordenável) por granularidade e banco
+    _PERIODO_SQL = {
+        'sqlite': {
+            'dia': "substr(data, 1, 10)",
+            'semana': "date(substr(data, 1, 10), 'weekday 0', '-6 days')",
+            'mes': "substr(data, 1, 7)",
+        },
+        'postgres': {
+            'dia': "to_char(data, 'YYYY-MM-DD')",
+            'semana': "to_char(date_trunc('week', data), 'YYYY-MM-DD')",
+            'mes': "to_char(data, 'YYYY-MM')",
+        },
+    }
+
+    # Origens que espelham um registro de entradas/saidas/quebrados/consumo
+    _ORIGENS_DE_EVENTO = ('entrada', 'saida', 'quebrado', 'consumo', 'estorno_entrada',
+                          'estorno_saida', 'estorno_quebrado', 'estorno_consumo')
+
+    @staticmethod
+    def get_historico(granularidade, desde=None, saldo_inicial=0):
+        """
+        Série do estoque por período, em uma única passada.
 
+        Soma entradas, saídas, quebrados e consumo por período e calcula o
+        saldo acumulado com SUM() OVER (ORDER BY periodo). Movimentos do
+        livro-razão sem registro correspondente (ajustes manuais e o saldo
+        legado) entram como `ajustes`; do saldo_inicial conta só a parte que
+        os registros anteriores a ele não explicam.
+
+        Args:
+            granularidade: 'dia', 'semana' ou 'mes'.
+            desde: Data 'YYYY-MM-DD' do início do primeiro período (None = tudo).
+            saldo_inicial: Saldo acumulado antes de `desde`.
+
+        Returns:
+            Lista de dicts com periodo, entradas, saidas, quebrados, consumo,
+            ajustes e saldo.
+        """
+        periodo = EstoqueRepository._PERIODO_SQL['postgres' if USE_POSTGRES else 'sqlite'][granularidade]
+        filtro = "WHERE data >= ?" if desde else ""
+        filtro_ajustes = "AND m.data >= ?" if desde else ""
+        params = (desde,) * 5 if desde else ()
+        origens = ', '.join(f"'{o}'" for o in EstoqueRepository._ORIGENS_DE_EVENTO)
+        registrado_ate = " - ".join(
+            f"COALESCE((SELECT SUM(quantidade) FROM {t} WHERE {t}.data <= m.data), 0)"
+            for t in ('entradas', 'saidas', 'quebrados', 'consumo')
+        )
+
+        conn = get_connection(leitura=True)
+        cursor = conn.cursor()
         cursor.execute(
-            "UPDATE estoque SET quantidade_total = ?, ultima_atualizacao = ? WHERE id = ?",
-            (new_qty, datetime.now().isoformat(), estoque_id)
+            f"""WITH movimentos AS (
+                    SELECT data, quantidade AS entradas, 0 AS saidas, 0 AS quebrados,
+                           0 AS consumo, 0 AS ajustes
+                      FROM entradas {filtro}
+                    UNION ALL
+                    SELECT data, 0, quantidade, 0, 0, 0 FROM saidas {filtro}
+                    UNION ALL
+                    SELECT data, 0, 0, quantidade, 0, 0 FROM quebrados {filtro}
+                    UNION ALL
+                    SELECT data, 0, 0, 0, quantidade, 0 FROM consumo {filtro}
+                    UNION ALL
+                    SELECT m.data, 0, 0, 0, 0,
+                           m.delta - CASE WHEN m.origem = 'saldo_inicial'
+                                          THEN {registrado_ate} ELSE 0 END
+                      FROM estoque_movimentos m
+                     WHERE m.origem NOT IN ({origens}) {filtro_ajustes}
+                ),
+                por_periodo AS (
+                    SELECT {periodo} AS periodo,
+                           SUM(entradas) AS entradas, SUM(saidas) AS saidas,
+                           SUM(quebrados) AS quebrados, SUM(consumo) AS consumo,
+                           SUM(ajustes) AS ajustes
+                      FROM movimentos
+                     GROUP BY 1
+                )
+                SELECT periodo, entradas, saidas, quebrados, consumo, ajustes,
+                       SUM(entradas - saidas - quebrados - consumo + ajustes)
+                           OVER (ORDER BY periodo ROWS UNBOUNDED PRECEDING) AS saldo
+                  FROM por_periodo
+                 ORDER BY periodo""",
+            params
         )
-        conn.commit()
+        rows = [dict(row) for row in cursor.fetchall()]
         conn.close()
-        return new_qty
+        for row in rows:
+            row['ajustes'] = int(row['ajustes'])
+            row['saldo'] = int(row['saldo']) + saldo_inicial
+        return rows
@@ -0,0 +1,63 @@
+"""Repositório das chaves de idempotência (Idempotency-Key → resposta)."""
+
+from database import executar_escrita, get_connection
+
+
+class IdempotenciaRepository:
+    """Operações na tabela idempotencia."""
+
+    @staticmethod
+    def buscar(chave, expira_antes):
+        """
+        Request original com a chave, se ainda não venceu.
+
+        Returns:
+            Dict com hash_corpo, status (None = em andamento) e resposta, ou None.
+        """
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT hash_corpo, status, resposta FROM idempotencia WHERE chave = ? AND criado_em >= ?",
+                (chave, expira_antes)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def reservar(conn, chave, hash_corpo, agora, expira_antes):
+        """
+        Reserva a chave na transação de `conn` (a da escrita da request).
+
+        Só uma linha vencida (criada antes de `expira_antes`) é retomada;
+        uma reserva sem resposta nunca é, mesmo que a request original
+        tenha morrido: a escrita dela foi gravada junto com a reserva.
+
+        Returns:
+            True se a chave foi reservada; False se outra request já a tem.
+        """
+        return conn.execute(
+            "INSERT INTO idempotencia (chave, hash_corpo, criado_em) VALUES (?, ?, ?) "
+            "ON CONFLICT(chave) DO UPDATE SET hash_corpo = excluded.hash_corpo, status = NULL, "
+            "resposta = NULL, criado_em = excluded.criado_em WHERE idempotencia.criado_em < ?",
+            (chave, hash_corpo, agora, expira_antes)
+        ).rowcount == 1
+
+    @staticmethod
+    def concluir(chave, hash_corpo, agora, status, resposta):
+        """Guarda a resposta da request (cria a linha se a rota não escreveu nada)."""
+        executar_escrita(lambda conn: conn.execute(
+            "INSERT INTO idempotencia (chave, hash_corpo, criado_em, status, resposta) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(chave) DO UPDATE SET status = excluded.status, "
+            "resposta = excluded.resposta WHERE idempotencia.status IS NULL",
+            (chave, hash_corpo, agora, status, resposta)
+        ))
+
+    @staticmethod
+    def purgar(expira_antes):
+        """Remove as chaves vencidas. Retorna quantas foram removidas."""
+        return executar_escrita(lambda conn: conn.execute(
+            "DELETE FROM idempotencia WHERE criado_em < ?", (expira_antes,)
+        ).rowcount)
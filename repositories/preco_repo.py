@@ -1,9 +1,13 @@
 """Repositório de acesso a dados de Preços."""
 
-from database import get_connection
+from database import get_connection, executar_escrita, USE_POSTGRES
 from datetime import datetime
 
 
+# Chave do advisory lock que serializa as trocas de preço no PostgreSQL
+_LOCK_PRECOS = 7_320_002
+
+
 class PrecoRepository:
     """Operações CRUD para a tabela precos."""
 
@@ -13,38 +17,54 @@ class PrecoRepository:
         Cria um novo preço ativo, desativando os anteriores.
         Garante apenas um preço ativo por vez.
         """
-        conn = get_connection()
-        cursor = conn.cursor()
+        def _trocar(conn):
+            cursor = conn.cursor()
 
-        # Desativar todos os preços existentes
-        cursor.execute("UPDATE precos SET ativo = 0")
+            if USE_POSTGRES:
+                # Duas trocas simultâneas não podem deixar dois preços ativos
+                cursor.execute("SELECT pg_advisory_xact_lock(?)", (_LOCK_PRECOS,))
 
-        # Criar novo preço ativo
-        cursor.execute(
-            "INSERT INTO precos (preco_unitario, data_inicio, ativo) VALUES (?, ?, 1)",
-            (preco_unitario, datetime.now().isoformat())
-        )
-        price_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return price_id
+            # Desativar só o preço ativo (índice parcial), não o histórico inteiro
+            cursor.execute("UPDATE precos SET ativo = 0 WHERE ativo = 1")
+
+            # Criar novo preço ativo
+            cursor.execute(
+                "INSERT INTO precos (preco_unitario, data_inicio, ativo) VALUES (?, ?, 1)",
+                (preco_unitario, datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+        return executar_escrita(_trocar)
 
     @staticmethod
-    def get_active():
-        """Retorna o preço ativo atual."""
-        conn = get_connection()
-        cursor = conn.cursor()
+    def get_active(cursor=None):
+        """Retorna o preço ativo atual (opcionalmente em um cursor já aberto)."""
+        conn = None
+        if cursor is None:
+            conn = get_connection(leitura=True)
+            cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM precos WHERE ativo = 1 ORDER BY data_inicio DESC LIMIT 1"
         )
         row = cursor.fetchone()
-        conn.close()
+        if conn:
+            conn.close()
         return dict(row) if row else None
 
+    @staticmethod
+    def get_linha_do_tempo():
+        """Início e valor de todos os preços, do mais antigo ao mais recente."""
+        conn = get_connection(leitura=True)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, preco_unitario, data_inicio FROM precos ORDER BY data_inicio, id")
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
     @staticmethod
     def get_all():
         """Retorna todo o histórico de preços."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM precos ORDER BY data_inicio DESC")
         rows = [dict(row) for row in cursor.fetchall()]
@@ -1,6 +1,6 @@
 """Repositório de acesso a dados de Ovos Quebrados."""
 
-from database import get_connection
+from database import get_connection, executar_escrita
 from datetime import datetime
 
 
@@ -8,27 +8,28 @@ class QuebradoRepository:
     """Operações CRUD para a tabela quebrados."""
 
     @staticmethod
-    def create(quantidade, motivo='', mes_referencia=None, usuario_id=None, usuario_nome=''):
-        """Cria um novo registro de ovos quebrados."""
+    def create(quantidade, motivo='', mes_referencia=None, usuario_id=None, usuario_nome='', data=None):
+        """Cria um novo registro de ovos quebrados (`data`: hora do registro; padrão: agora)."""
+        return executar_escrita(lambda conn: QuebradoRepository.inserir(
+            conn, quantidade, motivo, mes_referencia, usuario_id, usuario_nome, data))
+
+    @staticmethod
+    def inserir(conn, quantidade, motivo='', mes_referencia=None, usuario_id=None, usuario_nome='', data=None):
+        """Como create, dentro da transação de `conn` (sem commit). Retorna o ID."""
         if mes_referencia is None:
             mes_referencia = datetime.now().strftime('%Y-%m')
-
-        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO quebrados (quantidade, data, motivo, mes_referencia, usuario_id, usuario_nome)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (quantidade, datetime.now().isoformat(), motivo, mes_referencia, usuario_id, usuario_nome)
+            (quantidade, (data or datetime.now()).isoformat(), motivo, mes_referencia, usuario_id, usuario_nome)
         )
-        entry_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return entry_id
+        return cursor.lastrowid
 
     @staticmethod
     def get_by_month(mes_referencia):
         """Retorna todos os registros de quebrados de um mês específico."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM quebrados WHERE mes_referencia = ? ORDER BY data DESC",
@@ -41,7 +42,7 @@ class QuebradoRepository:
     @staticmethod
     def get_total_by_month(mes_referencia):
         """Retorna o total de ovos quebrados em um mês."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT COALESCE(SUM(quantidade), 0) as total FROM quebrados WHERE mes_referencia = ?",
@@ -53,16 +54,15 @@ class QuebradoRepository:
 
     @staticmethod
     def delete(entry_id):
-        conn = get_connection()
+        return executar_escrita(lambda conn: QuebradoRepository.remover(conn, entry_id))
+
+    @staticmethod
+    def remover(conn, entry_id):
+        """Remove o registro na transação de `conn` (sem commit). Retorna (quantidade, mes_referencia)."""
         cursor = conn.cursor()
         cursor.execute("SELECT quantidade, mes_referencia FROM quebrados WHERE id = ?", (entry_id,))
         row = cursor.fetchone()
         if row is None:
-            conn.close()
             raise ValueError("Registro de quebrado não encontrado")
-        quantidade = row['quantidade']
-        mes_referencia = row['mes_referencia']
         cursor.execute("DELETE FROM quebrados WHERE id = ?", (entry_id,))
-        conn.commit()
-        conn.close()
-        return quantidade, mes_referencia
+        return row['quantidade'], row['mes_referencia']
@@ -1,6 +1,6 @@
 """Repositório de acesso a dados do Resumo Mensal."""
 
-from database import get_connection
+from database import get_connection, executar_escrita
 
 
 class ResumoRepository:
@@ -9,36 +9,38 @@ class ResumoRepository:
     @staticmethod
     def upsert(mes_referencia, total_entradas, total_saidas, total_quebrados, total_consumo, faturamento_total, total_despesas, lucro_estimado):
         """Insere ou atualiza o resumo de um mês."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """INSERT INTO resumo_mensal
-                   (mes_referencia, total_entradas, total_saidas, total_quebrados, total_consumo, faturamento_total, total_despesas, lucro_estimado)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-               ON CONFLICT(mes_referencia) DO UPDATE SET
-                   total_entradas = excluded.total_entradas,
-                   total_saidas = excluded.total_saidas,
-                   total_quebrados = excluded.total_quebrados,
-                   total_consumo = excluded.total_consumo,
-                   faturamento_total = excluded.faturamento_total,
-                   total_despesas = excluded.total_despesas,
-                   lucro_estimado = excluded.lucro_estimado""",
-            (mes_referencia, total_entradas, total_saidas, total_quebrados, total_consumo, faturamento_total, total_despesas, lucro_estimado)
-        )
-        conn.commit()
-        conn.close()
+        def _gravar(conn):
+            conn.execute(
+                """INSERT INTO resumo_mensal
+                       (mes_referencia, total_entradas, total_saidas, total_quebrados, total_consumo, faturamento_total, total_despesas, lucro_estimado)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(mes_referencia) DO UPDATE SET
+                       total_entradas = excluded.total_entradas,
+                       total_saidas = excluded.total_saidas,
+                       total_quebrados = excluded.total_quebrados,
+                       total_consumo = excluded.total_consumo,
+                       faturamento_total = excluded.faturamento_total,
+                       total_despesas = excluded.total_despesas,
+                       lucro_estimado = excluded.lucro_estimado""",
+                (mes_referencia, total_entradas, total_saidas, total_quebrados, total_consumo, faturamento_total, total_despesas, lucro_estimado)
+            )
+
+        executar_escrita(_gravar)
 
     @staticmethod
-    def get_by_month(mes_referencia):
-        """Retorna o resumo de um mês específico."""
-        conn = get_connection()
-        cursor = conn.cursor()
+    def get_by_month(mes_referencia, cursor=None):
+        """Retorna o resumo de um mês específico (opcionalmente em um cursor já aberto)."""
+        conn = None
+        if cursor is None:
+            conn = get_connection(leitura=True)
+            cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM resumo_mensal WHERE mes_referencia = ?",
             (mes_referencia,)
         )
         row = cursor.fetchone()
-        conn.close()
+        if conn:
+            conn.close()
         if row:
             return dict(row)
         return {
@@ -55,7 +57,7 @@ class ResumoRepository:
     @staticmethod
     def get_by_year(ano):
         """Retorna os resumos de todos os meses de um ano."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM resumo_mensal WHERE mes_referencia LIKE ? ORDER BY mes_referencia",
@@ -64,3 +66,28 @@ class ResumoRepository:
         rows = [dict(row) for row in cursor.fetchall()]
         conn.close()
         return rows
+
+    @staticmethod
+    def get_meses(cursor=None):
+        """Retorna os meses com algum registro, do mais recente ao mais antigo."""
+        conn = None
+        if cursor is None:
+            conn = get_connection(leitura=True)
+            cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT mes_referencia FROM (
+                SELECT mes_referencia FROM entradas
+                UNION
+                SELECT mes_referencia FROM saidas
+                UNION
+                SELECT mes_referencia FROM quebrados
+                UNION
+                SELECT mes_referencia FROM consumo
+                UNION
+                SELECT mes_referencia FROM despesas
+            ) AS t ORDER BY mes_referencia DESC
+        """)
+        meses = [row['mes_referencia'] for row in cursor.fetchall()]
+        if conn:
+            conn.close()
+        return meses
@@ -1,6 +1,6 @@
 """Repositório de acesso a dados de Saídas/Vendas."""
 
-from database import get_connection
+from database import get_connection, executar_escrita
 from datetime import datetime
 
 
@@ -10,25 +10,28 @@ class SaidaRepository:
     @staticmethod
     def create(quantidade, preco_unitario, valor_total, mes_referencia=None, usuario_id=None, usuario_nome='', cliente_id=None, cliente_nome=''):
         """Cria um novo registro de saída/venda."""
+        return executar_escrita(lambda conn: SaidaRepository.inserir(
+            conn, quantidade, preco_unitario, valor_total, mes_referencia,
+            usuario_id, usuario_nome, cliente_id, cliente_nome))
+
+    @staticmethod
+    def inserir(conn, quantidade, preco_unitario, valor_total, mes_referencia=None, usuario_id=None,
+                usuario_nome='', cliente_id=None, cliente_nome='', data=None):
+        """Como create, dentro da transação de `conn` (sem commit). Retorna o ID."""
         if mes_referencia is None:
             mes_referencia = datetime.now().strftime('%Y-%m')
-
-        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO saidas (quantidade, preco_unitario, valor_total, data, mes_referencia, usuario_id, usuario_nome, cliente_id, cliente_nome)
                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (quantidade, preco_unitario, valor_total, datetime.now().isoformat(), mes_referencia, usuario_id, usuario_nome, cliente_id, cliente_nome)
+            (quantidade, preco_unitario, valor_total, (data or datetime.now()).isoformat(), mes_referencia, usuario_id, usuario_nome, cliente_id, cliente_nome)
         )
-        sale_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return sale_id
+        return cursor.lastrowid
 
     @staticmethod
     def get_by_month(mes_referencia):
         """Retorna todas as saídas de um mês específico."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM saidas WHERE mes_referencia = ? ORDER BY data DESC",
@@ -41,7 +44,7 @@ class SaidaRepository:
     @staticmethod
     def get_totals_by_month(mes_referencia):
         """Retorna os totais (quantidade e valor) de um mês."""
-        conn = get_connection()
+        conn = get_connection(leitura=True)
         cursor = conn.cursor()
         cursor.execute(
             """SELECT COALESCE(SUM(quantidade), 0) as total_quantidade,
@@ -55,16 +58,15 @@ class SaidaRepository:
 
     @staticmethod
     def delete(sale_id):
-        conn = get_connection()
+        return executar_escrita(lambda conn: SaidaRepository.remover(conn, sale_id))
+
+    @staticmethod
+    def remover(conn, sale_id):
+        """Remove o registro na transação de `conn` (sem commit). Retorna (quantidade, mes_referencia)."""
         cursor = conn.cursor()
         cursor.execute("SELECT quantidade, mes_referencia FROM saidas WHERE id = ?", (sale_id,))
         row = cursor.fetchone()
         if row is None:
-            conn.close()
             raise ValueError("Venda não encontrada")
-        quantidade = row['quantidade']
-        mes_referencia = row['mes_referencia']
         cursor.execute("DELETE FROM saidas WHERE id = ?", (sale_id,))
-        conn.commit()
-        conn.close()
-        return quantidade, mes_referencia
+        return row['quantidade'], row['mes_referencia']
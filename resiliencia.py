@@ -0,0 +1,74 @@
+"""
+Respostas 503 quando o banco está indisponível.
+
+A camada de resiliência fica em database.py:
+
+- timeout de conexão (PG_CONNECT_TIMEOUT_S) e statement_timeout
+  (PG_STATEMENT_TIMEOUT_MS);
+- novas tentativas com backoff e jitter ao abrir conexão e em leituras
+  que abrem a transação (PG_RETRY_TENTATIVAS);
+- disjuntor (circuit breaker) que abre depois de DB_DISJUNTOR_FALHAS
+  falhas de conexão seguidas.
+
+Aqui ela chega ao cliente: com o disjuntor aberto as rotas da API falham
+na hora com 503 e Retry-After, sem tocar no banco, e um
+`database.BancoIndisponivel` vira 503 em vez do 500 genérico. As rotas
+/api/health* continuam respondendo (o readiness informa o estado).
+
+Respostas de requests que esperaram o lock do SQLite trazem
+`X-DB-Busy: tentativas=N, falhas=M` (novas tentativas e escritas que
+desistiram por banco ocupado), visível mesmo quando a mensagem do 500 é
+ocultada; é o sinal que o teste de carga usa para contar locks.
+"""
+
+import math
+
+from flask import g, jsonify, request
+
+import database
+
+
+# Respondem mesmo com o banco fora
+ROTAS_LIVRES = ('/api/health',)
+
+
+def _resposta_indisponivel(erro):
+    resposta = jsonify({'success': False, 'error': str(erro), 'db_unavailable': True})
+    resposta.status_code = 503
+    resposta.headers['Retry-After'] = str(erro.retry_after or math.ceil(database.DB_DISJUNTOR_ESPERA_S))
+    return resposta
+
+
+def _antes():
+    """Falha na hora enquanto o disjuntor estiver aberto."""
+    database.iniciar_contagem_busy()
+    if not request.path.startswith('/api/') or request.path.startswith(ROTAS_LIVRES):
+        return None
+    if database.disjuntor.rejeitando():
+        retry_after = database.disjuntor.estado()['retry_after_s']
+        return _resposta_indisponivel(database.BancoIndisponivel(retry_after=retry_after))
+    return None
+
+
+def _depois(response):
+    # Rotas que tratam a exceção e respondem 500 (ver _safe_error_message no app)
+    erro = g.pop('banco_indisponivel', None)
+    if erro is not None and response.status_code == 500:
+        response.status_code = 503
+        response.headers['Retry-After'] = str(erro.retry_after or 1)
+    busy = database.contagem_busy()
+    if busy and (busy['tentativas_busy'] or busy['falhas_busy']):
+        response.headers['X-DB-Busy'] = f"tentativas={busy['tentativas_busy']}, falhas={busy['falhas_busy']}"
+    return response
+
+
+def registrar_indisponibilidade(erro):
+    """Marca a request atual para responder 503 em vez de 500."""
+    g.banco_indisponivel = erro
+
+
+def instalar(app):
+    """Liga as respostas 503 no app (no SQLite o disjuntor nunca abre)."""
+    app.before_request(_antes)
+    app.after_request(_depois)
+    app.register_error_handler(database.BancoIndisponivel, _resposta_indisponivel)
@@ -10,20 +10,26 @@ import time
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from services.backup_service import criar_backup
+from services.backup_service import BackupService, criar_backup
+from services.backup_storage import FilaUpload
+
+# Uploads rodam em segundo plano para não bloquear o agendador
+fila_upload = None
 
 
 def job():
     """Tarefa de backup agendado."""
     print(f"\n⏰ Iniciando backup agendado...")
     try:
-        criar_backup(upload_to_drive=True, cleanup=True)
+        criar_backup(upload_to_drive=True, cleanup=True, fila=fila_upload)
     except Exception as e:
         print(f"❌ Erro no backup agendado: {e}")
 
 
 def main():
     """Configura e executa agendamento de backups."""
+    global fila_upload
+    fila_upload = FilaUpload(BackupService())
     
     # Configuração do agendamento
     # Opções: 
@@ -44,9 +50,14 @@ def main():
     job()
     
     # Loop de agendamento
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Checa a cada minuto
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(60)  # Checa a cada minuto
+    except KeyboardInterrupt:
+        if fila_upload.pendentes:
+            print(f"\n⏳ Aguardando {fila_upload.pendentes} upload(s) pendente(s)...")
+        fila_upload.aguardar()
 
 
 if __name__ == '__main__':
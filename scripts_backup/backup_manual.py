@@ -14,9 +14,17 @@ from services.backup_service import criar_backup
 def main():
     """Executa backup manual."""
     print("🔒 EggVault - Backup do Banco de Dados\n")
+
+    # --incremental: envia só o delta desde o último backup
+    # --completo: força backup completo (ignora BACKUP_MODE)
+    incremental = None
+    if '--incremental' in sys.argv:
+        incremental = True
+    elif '--completo' in sys.argv:
+        incremental = False
     
     try:
-        sucesso = criar_backup(upload_to_drive=True, cleanup=True)
+        sucesso = criar_backup(upload_to_drive=True, cleanup=True, incremental=incremental)
         
         if sucesso:
             print("\n✅ Backup concluído com sucesso!")
@@ -0,0 +1,97 @@
+"""
+♻️ Script para Restaurar Backups
+Restaura um backup completo ou reaplica a cadeia incremental
+(backup completo + deltas) em um banco novo.
+
+Uso:
+    # SQLite: copia a base e aplica todos os deltas da cadeia ativa
+    python scripts_backup/restaurar_backup.py --destino ./ovos_restaurado.db
+
+    # PostgreSQL: restaura a base (pg_restore -j / psql) e aplica os deltas
+    python scripts_backup/restaurar_backup.py --destino-url "$DESTINO_URL" --jobs 8
+
+    # PostgreSQL: restaura um backup completo específico (.dump, .dir.tar ou .sql)
+    python scripts_backup/restaurar_backup.py --destino-url "$DESTINO_URL" \
+        --arquivo backups/EggVault_postgres_backup_XXXX.dump
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.backup_service import BackupService
+
+
+def main():
+    """Restaura backups em SQLite ou PostgreSQL."""
+    parser = argparse.ArgumentParser(description='Restaura backup completo + deltas incrementais')
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--destino', help='Arquivo SQLite a ser criado')
+    destino.add_argument('--destino-url', help='PostgreSQL de destino')
+    parser.add_argument('--backup-dir', help='Diretório dos backups (padrão: ./backups)')
+    parser.add_argument(
+        '--estado',
+        help='Arquivo de estado da cadeia (padrão: incremental_state.json do diretório)'
+    )
+    parser.add_argument('--arquivo', help='Restaura apenas este backup completo do PostgreSQL')
+    parser.add_argument('--jobs', type=int, help='Workers do pg_restore (padrão: BACKUP_PG_JOBS)')
+    parser.add_argument(
+        '--apenas-deltas', action='store_true',
+        help='Não restaura a base (já restaurada); aplica só os deltas'
+    )
+    args = parser.parse_args()
+
+    service = BackupService(backup_dir=args.backup_dir)
+
+    estado = None
+    if args.estado:
+        with open(args.estado, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+
+    print("♻️  EggVault - Restauração de Backup\n")
+
+    try:
+        if args.destino:
+            if Path(args.destino).exists():
+                print(f"❌ Destino já existe: {args.destino}")
+                sys.exit(1)
+            aplicados = service.restaurar_cadeia_sqlite(args.destino, estado)
+
+        elif args.arquivo:
+            service.restaurar_postgres(args.arquivo, args.destino_url, args.jobs)
+            print("\n✅ Restauração concluída")
+            sys.exit(0)
+
+        else:
+            import psycopg2
+            estado = estado or service.carregar_estado()
+            if estado is None:
+                print("❌ Nenhuma cadeia incremental encontrada")
+                sys.exit(1)
+            if not args.apenas_deltas:
+                service.restaurar_postgres(
+                    service.backup_dir / estado['base'], args.destino_url, args.jobs
+                )
+            conn = psycopg2.connect(args.destino_url)
+            try:
+                for nome in estado['cadeia']:
+                    print(f"   Aplicando {nome}...")
+                    delta = service.carregar_delta(service.backup_dir / nome)
+                    service.aplicar_delta(conn, delta, placeholder='%s')
+            finally:
+                conn.close()
+            aplicados = len(estado['cadeia'])
+
+        print(f"\n✅ Restauração concluída ({aplicados} delta(s) aplicado(s))")
+        sys.exit(0)
+
+    except Exception as e:
+        print(f"\n❌ Erro na restauração: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -38,8 +38,10 @@ def print_status():
     
     # Backups
     all_backups = sorted(
-        list(backup_dir.glob('EggVault_postgres_backup_*.sql')) + 
-        list(backup_dir.glob('EggVault_sqlite_backup_*.db')),
+        [p for p in backup_dir.glob('EggVault_postgres_backup_*')
+         if not p.name.endswith('.manifest.json')] +
+        list(backup_dir.glob('EggVault_sqlite_backup_*.db')) +
+        list(backup_dir.glob('EggVault_incremental_backup_*.json.gz')),
         key=lambda p: p.stat().st_mtime,
         reverse=True
     )
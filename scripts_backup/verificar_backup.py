@@ -66,7 +66,8 @@ class BackupVerifier:
         
         # Busca backups PostgreSQL e SQLite
         postgres_backups = sorted(
-            self.backup_dir.glob('EggVault_postgres_backup_*.sql'),
+            [p for p in self.backup_dir.glob('EggVault_postgres_backup_*')
+             if not p.name.endswith('.manifest.json')],
             key=lambda p: p.stat().st_mtime,
             reverse=True
         )
@@ -76,7 +77,17 @@ class BackupVerifier:
             reverse=True
         )
         
-        all_backups = postgres_backups + sqlite_backups
+        incremental_backups = sorted(
+            self.backup_dir.glob('EggVault_incremental_backup_*.json.gz'),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        
+        all_backups = sorted(
+            postgres_backups + sqlite_backups + incremental_backups,
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
         
         if not all_backups:
             print("❌ Nenhum backup encontrado")
@@ -158,6 +169,21 @@ class BackupVerifier:
                 except FileNotFoundError:
                     print("❌ pg_dump não encontrado no PATH")
                     self.issues.append("pg_dump não instalado")
+
+                try:
+                    result = subprocess.run(
+                        ['pg_restore', '--version'],
+                        capture_output=True,
+                        text=True
+                    )
+                    if result.returncode == 0:
+                        print(f"✅ pg_restore disponível: {result.stdout.strip()}")
+                    else:
+                        print("⚠️  pg_restore não está funcionando")
+                        self.warnings.append("pg_restore não funcional")
+                except FileNotFoundError:
+                    print("⚠️  pg_restore não encontrado no PATH (necessário para restaurar)")
+                    self.warnings.append("pg_restore não instalado")
                 
                 return True
                 
@@ -287,6 +313,75 @@ class BackupVerifier:
             self.issues.append(f"Erro no teste: {e}")
             return False
     
+    def check_restore(self, alvo, manifesto=None):
+        """
+        Compara a contagem de linhas de um banco restaurado com o manifesto do backup.
+
+        Args:
+            alvo: Caminho de um SQLite ou URL postgresql:// do banco restaurado.
+            manifesto: Arquivo .manifest.json (padrão: o mais recente do diretório).
+        """
+        import json
+
+        self.print_section("6. Verificação de Restauração")
+
+        if manifesto is None:
+            manifestos = sorted(
+                self.backup_dir.glob('*.manifest.json'),
+                key=lambda p: p.stat().st_mtime,
+                reverse=True
+            )
+            if not manifestos:
+                print("❌ Nenhum manifesto de backup encontrado")
+                self.issues.append("Manifesto de backup não encontrado")
+                return False
+            manifesto = manifestos[0]
+
+        with open(manifesto, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        print(f"📄 Manifesto: {Path(manifesto).name} ({dados['arquivo']})")
+
+        try:
+            if str(alvo).startswith('postgresql'):
+                import psycopg2
+                conn = psycopg2.connect(alvo)
+            else:
+                import sqlite3
+                if not Path(alvo).exists():
+                    raise FileNotFoundError(alvo)
+                conn = sqlite3.connect(str(alvo))
+        except Exception as e:
+            print(f"❌ Não foi possível abrir o banco restaurado: {e}")
+            self.issues.append(f"Banco restaurado inacessível: {e}")
+            return False
+
+        divergencias = 0
+        try:
+            cursor = conn.cursor()
+            for tabela, esperado in dados['tabelas'].items():
+                if esperado is None:
+                    continue
+                try:
+                    cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
+                    obtido = cursor.fetchone()[0]
+                except Exception:
+                    conn.rollback()
+                    obtido = None
+                ok = obtido == esperado
+                divergencias += 0 if ok else 1
+                print(f"   {'✅' if ok else '❌'} {tabela}: {obtido} / {esperado}")
+        finally:
+            conn.close()
+
+        if divergencias:
+            print(f"\n❌ {divergencias} tabela(s) divergente(s)")
+            self.issues.append(f"Restauração com {divergencias} tabela(s) divergente(s)")
+            return False
+
+        print("\n✅ Contagens do banco restaurado conferem com o manifesto")
+        self.success.append("Restauração confere com o manifesto")
+        return True
+
     def print_summary(self):
         """Imprime resumo final."""
         print("\n" + "=" * 70)
@@ -333,9 +428,14 @@ class BackupVerifier:
         else:
             return f"{age.seconds} segundo(s)"
     
-    def run(self, test_backup=False):
+    def run(self, test_backup=False, restore_alvo=None, manifesto=None):
         """Executa todas as verificações."""
         self.print_header()
+
+        if restore_alvo:
+            # Verificação rápida de uma restauração: só compara o manifesto
+            self.check_restore(restore_alvo, manifesto)
+            return self.print_summary()
         
         self.check_backup_directory()
         self.check_existing_backups()
@@ -366,10 +466,24 @@ def main():
         help='Executa backup completo de teste (COM upload para Google Drive)'
     )
     
+    parser.add_argument(
+        '--check-restore',
+        metavar='ALVO',
+        help='Compara um banco restaurado (arquivo SQLite ou URL postgresql://) com o manifesto'
+    )
+    parser.add_argument(
+        '--manifest',
+        help='Manifesto a usar com --check-restore (padrão: o mais recente)'
+    )
+    
     args = parser.parse_args()
     
     verifier = BackupVerifier()
-    success = verifier.run(test_backup=args.test or args.full_test)
+    success = verifier.run(
+        test_backup=args.test or args.full_test,
+        restore_alvo=args.check_restore,
+        manifesto=args.manifest
+    )
     
     # Se solicitou teste completo, faz backup com upload
     if args.full_test and success:
@@ -0,0 +1,109 @@
+"""
+Delta-sync: o que mudou nas listagens desde a versão que o cliente tem.
+
+Toda escrita em entradas, saidas, quebrados, consumo, despesas, clientes
+e precos entra na tabela alteracoes (triggers no banco) com uma sequência
+crescente; remoções ficam como tombstones. A SPA guarda a última versão
+recebida e aplica só o que mudou, em vez de recarregar o mês inteiro.
+"""
+
+import os
+import time
+import threading
+
+from database import TABELAS_ALTERACOES
+from repositories.alteracao_repo import AlteracaoRepository
+from services.cliente_service import ClienteService
+
+
+_purga_lock = threading.Lock()
+_ultima_purga = [0.0]
+
+
+class AlteracaoService:
+    """Consulta do log de alterações."""
+
+    LIMITE_PADRAO = 500
+    LIMITE_MAXIMO = 2000
+    # Cliente parado há mais tempo que isso recarrega as listagens (reset)
+    RETENCAO_S = float(os.environ.get('ALTERACOES_RETENCAO_DIAS', '30')) * 86400
+    PURGA_INTERVALO_S = 3600
+
+    @staticmethod
+    def _purgar_antigas():
+        """Remove o log vencido no máximo uma vez por hora por processo."""
+        agora = time.time()
+        with _purga_lock:
+            if agora - _ultima_purga[0] < AlteracaoService.PURGA_INTERVALO_S:
+                return
+            _ultima_purga[0] = agora
+        AlteracaoRepository.purgar(agora - AlteracaoService.RETENCAO_S)
+
+    @staticmethod
+    def desde(versao=None, tabelas=None, limite=None):
+        """
+        Alterações posteriores a uma versão.
+
+        Args:
+            versao: Última versão que o cliente aplicou; None = só a versão atual
+                (o cliente acabou de carregar as listagens).
+            tabelas: Tabelas de interesse (padrão: todas do log).
+            limite: Máximo de alterações na resposta (padrão 500).
+
+        Returns:
+            dict com versao (a enviar na próxima consulta), reset (True = a
+            versão não serve mais: recarregar as listagens), mais (há outra
+            página) e alteracoes: lista de {seq, tabela, id, operacao
+            ('upsert' ou 'delete'), registro (estado atual ou None)}.
+
+        Raises:
+            ValueError: Se a versão, as tabelas ou o limite forem inválidos.
+        """
+        tabelas = tuple(tabelas or TABELAS_ALTERACOES)
+        invalidas = [t for t in tabelas if t not in TABELAS_ALTERACOES]
+        if invalidas:
+            raise ValueError(f"Tabelas sem log de alterações: {', '.join(invalidas)}")
+        limite = AlteracaoService.LIMITE_PADRAO if limite is None else limite
+        if not 1 <= limite <= AlteracaoService.LIMITE_MAXIMO:
+            raise ValueError(f"Limite deve estar entre 1 e {AlteracaoService.LIMITE_MAXIMO}")
+        if versao is not None and versao < 0:
+            raise ValueError("Versão deve ser um inteiro não negativo")
+
+        AlteracaoService._purgar_antigas()
+        atual, primeira = AlteracaoRepository.versao_atual()
+        resultado = {'versao': atual, 'reset': False, 'mais': False, 'alteracoes': []}
+        if versao is None:
+            return resultado
+        # Versão de outro banco (restaurado/recriado) ou anterior ao log purgado
+        if versao > atual or (primeira is not None and versao < primeira - 1):
+            resultado['reset'] = True
+            return resultado
+
+        linhas = AlteracaoRepository.listar(versao, atual, tabelas, limite + 1)
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            resultado['mais'] = True
+            resultado['versao'] = linhas[-1]['id']
+
+        ids_por_tabela = {}
+        for linha in linhas:
+            if linha['operacao'] == 'upsert':
+                ids_por_tabela.setdefault(linha['tabela'], []).append(linha['registro_id'])
+        registros = {}
+        for tabela, ids in ids_por_tabela.items():
+            encontrados = AlteracaoRepository.registros(tabela, ids)
+            if tabela == 'clientes':
+                ClienteService.enriquecer(list(encontrados.values()))
+            registros[tabela] = encontrados
+
+        for linha in linhas:
+            registro = registros.get(linha['tabela'], {}).get(linha['registro_id'])
+            resultado['alteracoes'].append({
+                'seq': linha['id'],
+                'tabela': linha['tabela'],
+                'id': linha['registro_id'],
+                # Removido depois de `atual`: o tombstone vem na próxima consulta
+                'operacao': 'upsert' if registro is not None else 'delete',
+                'registro': registro,
+            })
+        return resultado
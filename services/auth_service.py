@@ -1,15 +1,64 @@
+import os
+import sys
+import hmac
+import json
+import time
+import base64
 import hashlib
 import secrets
+import threading
 from datetime import datetime, timedelta
-from database import get_connection
+import invalidacao
+from database import get_connection, executar_escrita
+
+
+# Cache de usuario_id → (geracao, username, nome, expira_monotonic) para tokens assinados
+_geracao_cache = {}
+_geracao_lock = threading.Lock()
+
+
+def _segredo_token():
+    """Segredo do HMAC configurado (AUTH_TOKEN_SECRET ou FLASK_SECRET_KEY) ou None."""
+    segredo = os.environ.get('AUTH_TOKEN_SECRET') or os.environ.get('FLASK_SECRET_KEY')
+    return segredo.encode() if segredo else None
+
+
+def _modo_token(segredo):
+    """
+    Modo de token pedido em AUTH_TOKEN_MODE.
+
+    Sem segredo configurado cada worker assinaria com um segredo próprio e
+    recusaria os tokens dos outros (e todos cairiam a cada restart): o
+    modo assinado é recusado e os tokens continuam opacos.
+    """
+    modo = os.environ.get('AUTH_TOKEN_MODE', 'opaco').strip().lower()
+    if modo == 'assinado' and not segredo:
+        print("⚠️ AUTH_TOKEN_MODE=assinado exige AUTH_TOKEN_SECRET (ou FLASK_SECRET_KEY) "
+              "igual em todas as instâncias; usando tokens opacos", file=sys.stderr)
+        return 'opaco'
+    return modo
 
 
 class AuthService:
-    """Lógica de autenticação com hash de senha + salt e tokens de sessão."""
+    """Lógica de autenticação com hash de senha + salt e tokens de sessão.
+
+    Dois modos de token (AUTH_TOKEN_MODE):
+      - 'opaco' (padrão): token aleatório guardado em `sessoes`; cada
+        requisição consulta sessoes JOIN usuarios.
+      - 'assinado': token HMAC-SHA256 com id, admin, expiração e geração do
+        usuário. A validação é só CPU + consulta da geração em cache.
+        Logout, troca de senha ou de permissão incrementam
+        usuarios.token_geracao e invalidam todos os tokens do usuário.
+    """
 
     SESSION_DURATION_HOURS = 72  # Sessão dura 3 dias
     PBKDF2_ITERATIONS = 600_000  # OWASP recommendation
 
+    TOKEN_SECRET = _segredo_token()
+    TOKEN_MODE = _modo_token(TOKEN_SECRET)
+    GERACAO_CACHE_TTL = float(os.environ.get('AUTH_GERACAO_CACHE_TTL', '30'))
+    _PREFIXO_ASSINADO = 'v1.'
+
     @staticmethod
     def _hash_password(password, salt):
         """Gera hash PBKDF2-SHA256 da senha + salt (600k iterações)."""
@@ -28,47 +77,61 @@ class AuthService:
         if not username or not password:
             raise ValueError("Usuário e senha são obrigatórios")
 
+        # O hash (PBKDF2, centenas de ms) é verificado fora da transação de
+        # escrita para não segurar o lock do banco.
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute(
             "SELECT * FROM usuarios WHERE username = ?", (username.strip().lower(),)
         )
         user = cursor.fetchone()
+        conn.close()
 
         if not user:
-            conn.close()
             raise ValueError("Usuário ou senha incorretos")
 
+        novo_hash = None
         password_hash = AuthService._hash_password(password, user['salt'])
         if password_hash != user['password_hash']:
             legacy_hash = AuthService._hash_password_legacy(password, user['salt'])
             if legacy_hash != user['password_hash']:
-                conn.close()
                 raise ValueError("Usuário ou senha incorretos")
-            new_salt = secrets.token_hex(32)
-            new_hash = AuthService._hash_password(password, new_salt)
+            novo_salt = secrets.token_hex(32)
+            novo_hash = (AuthService._hash_password(password, novo_salt), novo_salt)
+
+        expira = datetime.now() + timedelta(hours=AuthService.SESSION_DURATION_HOURS)
+        expira_em = expira.isoformat()
+
+        assinado = AuthService._usa_assinado()
+        if assinado:
+            token = AuthService._assinar({
+                'uid': user['id'],
+                'adm': 1 if user['is_admin'] else 0,
+                'exp': int(expira.timestamp()),
+                'gen': user['token_geracao'] or 0,
+            })
+        else:
+            token = secrets.token_hex(32)
+
+        def _registrar(conn):
+            cursor = conn.cursor()
+            if novo_hash:
+                cursor.execute(
+                    "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
+                    (novo_hash[0], novo_hash[1], user['id'])
+                )
+            if not assinado:
+                AuthService._limpar_sessoes_expiradas_internal(cursor)
+                cursor.execute(
+                    "INSERT INTO sessoes (usuario_id, token, criado_em, expira_em) VALUES (?, ?, ?, ?)",
+                    (user['id'], token, datetime.now().isoformat(), expira_em)
+                )
             cursor.execute(
-                "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
-                (new_hash, new_salt, user['id'])
+                "UPDATE usuarios SET ultimo_login = ? WHERE id = ?",
+                (datetime.now().isoformat(), user['id'])
             )
 
-        AuthService._limpar_sessoes_expiradas_internal(cursor)
-
-        token = secrets.token_hex(32)
-        expira_em = (datetime.now() + timedelta(hours=AuthService.SESSION_DURATION_HOURS)).isoformat()
-
-        cursor.execute(
-            "INSERT INTO sessoes (usuario_id, token, criado_em, expira_em) VALUES (?, ?, ?, ?)",
-            (user['id'], token, datetime.now().isoformat(), expira_em)
-        )
-
-        cursor.execute(
-            "UPDATE usuarios SET ultimo_login = ? WHERE id = ?",
-            (datetime.now().isoformat(), user['id'])
-        )
-
-        conn.commit()
-        conn.close()
+        executar_escrita(_registrar)
 
         return {
             'token': token,
@@ -86,6 +149,9 @@ class AuthService:
         if not token:
             return None
 
+        if token.startswith(AuthService._PREFIXO_ASSINADO):
+            return AuthService._validar_assinado(token)
+
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("""
@@ -109,11 +175,122 @@ class AuthService:
 
     @staticmethod
     def logout(token):
+        if token and token.startswith(AuthService._PREFIXO_ASSINADO):
+            # Tokens assinados não têm linha em sessoes: revoga pela geração
+            usuario = AuthService._validar_assinado(token)
+            if usuario:
+                AuthService.revogar_tokens(usuario['id'])
+            return
+
+        executar_escrita(lambda conn: conn.execute("DELETE FROM sessoes WHERE token = ?", (token,)))
+
+    # ── Tokens assinados ──
+
+    @staticmethod
+    def _usa_assinado():
+        """Modo assinado ativo e com segredo configurado."""
+        return AuthService.TOKEN_MODE == 'assinado' and bool(AuthService.TOKEN_SECRET)
+
+    @staticmethod
+    def _b64(dados):
+        return base64.urlsafe_b64encode(dados).rstrip(b'=').decode()
+
+    @staticmethod
+    def _b64_decode(texto):
+        return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+    @staticmethod
+    def _assinar(payload):
+        """Gera 'v1.<payload>.<assinatura>' com HMAC-SHA256."""
+        corpo = AuthService._PREFIXO_ASSINADO + AuthService._b64(
+            json.dumps(payload, separators=(',', ':')).encode()
+        )
+        assinatura = hmac.new(AuthService.TOKEN_SECRET, corpo.encode(), hashlib.sha256).digest()
+        return corpo + '.' + AuthService._b64(assinatura)
+
+    @staticmethod
+    def _validar_assinado(token):
+        """Valida assinatura, expiração e geração de um token assinado."""
+        if not AuthService.TOKEN_SECRET:
+            return None
+        corpo, _, assinatura = token.rpartition('.')
+        esperada = hmac.new(AuthService.TOKEN_SECRET, corpo.encode(), hashlib.sha256).digest()
+        try:
+            if not hmac.compare_digest(AuthService._b64_decode(assinatura), esperada):
+                return None
+            payload = json.loads(AuthService._b64_decode(corpo[len(AuthService._PREFIXO_ASSINADO):]))
+        except (ValueError, TypeError):
+            return None
+
+        if payload.get('exp', 0) < time.time():
+            return None
+
+        usuario = AuthService._usuario_token(payload['uid'])
+        if not usuario or usuario['geracao'] != payload.get('gen'):
+            return None
+
+        return {
+            'id': payload['uid'],
+            'username': usuario['username'],
+            'nome': usuario['nome'],
+            'is_admin': bool(payload.get('adm'))
+        }
+
+    @staticmethod
+    def _usuario_token(usuario_id):
+        """Geração, username e nome do usuário, com cache de GERACAO_CACHE_TTL segundos."""
+        invalidacao.verificar()
+        agora = time.monotonic()
+        with _geracao_lock:
+            item = _geracao_cache.get(usuario_id)
+        if item and item['expira'] > agora:
+            return item
+
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM sessoes WHERE token = ?", (token,))
-        conn.commit()
+        cursor.execute(
+            "SELECT token_geracao, username, nome FROM usuarios WHERE id = ?", (usuario_id,)
+        )
+        row = cursor.fetchone()
         conn.close()
+        if not row:
+            AuthService._descartar_geracao(usuario_id)
+            return None
+
+        item = {
+            'geracao': row['token_geracao'] or 0,
+            'username': row['username'],
+            'nome': row['nome'],
+            'expira': agora + AuthService.GERACAO_CACHE_TTL,
+        }
+        with _geracao_lock:
+            _geracao_cache[usuario_id] = item
+        return item
+
+    @staticmethod
+    def limpar_cache_geracao(usuario_id=None):
+        """Descarta a geração em cache de um usuário (ou de todos) em todos os processos."""
+        invalidacao.publicar('auth_geracao', usuario_id)
+
+    @staticmethod
+    def _descartar_geracao(usuario_id=None):
+        """Descarta a geração em cache deste processo (ver limpar_cache_geracao)."""
+        with _geracao_lock:
+            if usuario_id is None:
+                _geracao_cache.clear()
+            else:
+                _geracao_cache.pop(usuario_id, None)
+
+    @staticmethod
+    def revogar_tokens(usuario_id, cursor=None):
+        """Invalida todos os tokens assinados de um usuário (incrementa a geração)."""
+        sql = "UPDATE usuarios SET token_geracao = COALESCE(token_geracao, 0) + 1 WHERE id = ?"
+        if cursor is None:
+            executar_escrita(lambda conn: conn.execute(sql, (usuario_id,)))
+            AuthService.limpar_cache_geracao(usuario_id)
+        else:
+            # Dentro da transação de quem chamou: ele limpa o cache depois do commit
+            cursor.execute(sql, (usuario_id,))
 
     @staticmethod
     def alterar_senha(usuario_id, senha_atual, nova_senha):
@@ -130,32 +307,34 @@ class AuthService:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM usuarios WHERE id = ?", (usuario_id,))
         user = cursor.fetchone()
+        conn.close()
 
         if not user:
-            conn.close()
             raise ValueError("Usuário não encontrado")
 
         hash_atual = AuthService._hash_password(senha_atual, user['salt'])
         if hash_atual != user['password_hash']:
             legacy_hash = AuthService._hash_password_legacy(senha_atual, user['salt'])
             if legacy_hash != user['password_hash']:
-                conn.close()
                 raise ValueError("Senha atual incorreta")
 
         # Gerar novo salt e hash
         novo_salt = secrets.token_hex(32)
         novo_hash = AuthService._hash_password(nova_senha, novo_salt)
 
-        cursor.execute(
-            "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
-            (novo_hash, novo_salt, usuario_id)
-        )
+        def _gravar(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
+                (novo_hash, novo_salt, usuario_id)
+            )
 
-        # Invalidar todas as sessões do usuário
-        cursor.execute("DELETE FROM sessoes WHERE usuario_id = ?", (usuario_id,))
+            # Invalidar todas as sessões do usuário
+            cursor.execute("DELETE FROM sessoes WHERE usuario_id = ?", (usuario_id,))
+            AuthService.revogar_tokens(usuario_id, cursor)
 
-        conn.commit()
-        conn.close()
+        executar_escrita(_gravar)
+        AuthService.limpar_cache_geracao(usuario_id)
 
     @staticmethod
     def _limpar_sessoes_expiradas_internal(cursor):
@@ -168,11 +347,8 @@ class AuthService:
     @staticmethod
     def limpar_sessoes_expiradas():
         """Remove sessões expiradas do banco."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sessoes WHERE expira_em < ?", (datetime.now().isoformat(),))
-        conn.commit()
-        conn.close()
+        agora = datetime.now().isoformat()
+        executar_escrita(lambda conn: conn.execute("DELETE FROM sessoes WHERE expira_em < ?", (agora,)))
 
     @staticmethod
     def listar_usuarios():
@@ -216,24 +392,21 @@ class AuthService:
 
         username = username.strip().lower()
 
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id FROM usuarios WHERE username = ?", (username,))
-        if cursor.fetchone():
-            conn.close()
-            raise ValueError(f"Usuário '{username}' já existe")
-
         salt = secrets.token_hex(32)
         password_hash = AuthService._hash_password(password, salt)
 
-        cursor.execute(
-            "INSERT INTO usuarios (username, password_hash, salt, nome, is_admin) VALUES (?, ?, ?, ?, ?)",
-            (username, password_hash, salt, nome.strip(), 1 if is_admin else 0)
-        )
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        def _inserir(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM usuarios WHERE username = ?", (username,))
+            if cursor.fetchone():
+                raise ValueError(f"Usuário '{username}' já existe")
+            cursor.execute(
+                "INSERT INTO usuarios (username, password_hash, salt, nome, is_admin) VALUES (?, ?, ?, ?, ?)",
+                (username, password_hash, salt, nome.strip(), 1 if is_admin else 0)
+            )
+            return cursor.lastrowid
+
+        user_id = executar_escrita(_inserir)
 
         return {
             'id': user_id,
@@ -244,60 +417,66 @@ class AuthService:
 
     @staticmethod
     def deletar_usuario(usuario_id):
-        conn = get_connection()
-        cursor = conn.cursor()
+        def _remover(conn):
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM usuarios WHERE id = ?", (usuario_id,))
-        user = cursor.fetchone()
-        if not user:
-            conn.close()
-            raise ValueError("Usuário não encontrado")
+            cursor.execute("SELECT * FROM usuarios WHERE id = ?", (usuario_id,))
+            user = cursor.fetchone()
+            if not user:
+                raise ValueError("Usuário não encontrado")
 
-        if user['is_admin']:
-            cursor.execute("SELECT COUNT(*) as count FROM usuarios WHERE is_admin = 1")
-            if cursor.fetchone()['count'] <= 1:
-                conn.close()
-                raise ValueError("Não é possível remover o último administrador")
+            if user['is_admin']:
+                cursor.execute("SELECT COUNT(*) as count FROM usuarios WHERE is_admin = 1")
+                if cursor.fetchone()['count'] <= 1:
+                    raise ValueError("Não é possível remover o último administrador")
 
-        cursor.execute("DELETE FROM sessoes WHERE usuario_id = ?", (usuario_id,))
-        cursor.execute("DELETE FROM usuarios WHERE id = ?", (usuario_id,))
-        conn.commit()
-        conn.close()
+            cursor.execute("DELETE FROM sessoes WHERE usuario_id = ?", (usuario_id,))
+            cursor.execute("DELETE FROM usuarios WHERE id = ?", (usuario_id,))
+
+        executar_escrita(_remover)
+        AuthService.limpar_cache_geracao(usuario_id)
 
     @staticmethod
     def atualizar_usuario(usuario_id, nome=None, is_admin=None, nova_senha=None):
-        conn = get_connection()
-        cursor = conn.cursor()
+        senha = None
+        if nova_senha is not None:
+            if len(nova_senha) < 4:
+                raise ValueError("Senha deve ter no mínimo 4 caracteres")
+            novo_salt = secrets.token_hex(32)
+            senha = (AuthService._hash_password(nova_senha, novo_salt), novo_salt)
 
-        cursor.execute("SELECT * FROM usuarios WHERE id = ?", (usuario_id,))
-        user = cursor.fetchone()
-        if not user:
-            conn.close()
-            raise ValueError("Usuário não encontrado")
+        def _atualizar(conn):
+            cursor = conn.cursor()
 
-        if is_admin is not None and not is_admin and user['is_admin']:
-            cursor.execute("SELECT COUNT(*) as count FROM usuarios WHERE is_admin = 1")
-            if cursor.fetchone()['count'] <= 1:
-                conn.close()
-                raise ValueError("Não é possível remover o último administrador")
+            cursor.execute("SELECT * FROM usuarios WHERE id = ?", (usuario_id,))
+            user = cursor.fetchone()
+            if not user:
+                raise ValueError("Usuário não encontrado")
 
-        if nome is not None:
-            cursor.execute("UPDATE usuarios SET nome = ? WHERE id = ?", (nome.strip(), usuario_id))
+            if is_admin is not None and not is_admin and user['is_admin']:
+                cursor.execute("SELECT COUNT(*) as count FROM usuarios WHERE is_admin = 1")
+                if cursor.fetchone()['count'] <= 1:
+                    raise ValueError("Não é possível remover o último administrador")
 
-        if is_admin is not None:
-            cursor.execute("UPDATE usuarios SET is_admin = ? WHERE id = ?", (1 if is_admin else 0, usuario_id))
+            if nome is not None:
+                cursor.execute("UPDATE usuarios SET nome = ? WHERE id = ?", (nome.strip(), usuario_id))
 
-        if nova_senha is not None:
-            if len(nova_senha) < 4:
-                conn.close()
-                raise ValueError("Senha deve ter no mínimo 4 caracteres")
-            novo_salt = secrets.token_hex(32)
-            novo_hash = AuthService._hash_password(nova_senha, novo_salt)
-            cursor.execute(
-                "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
-                (novo_hash, novo_salt, usuario_id)
-            )
-            cursor.execute("DELETE FROM sessoes WHERE usuario_id = ?", (usuario_id,))
+            if is_admin is not None:
+                cursor.execute("UPDATE usuarios SET is_admin = ? WHERE id = ?", (1 if is_admin else 0, usuario_id))
+                if bool(is_admin) != bool(user['is_admin']):
+                    # A permissão viaja no token assinado: força novo login
+                    AuthService.revogar_tokens(usuario_id, cursor)
 
-        conn.commit()
-        conn.close()
+            if senha is not None:
+                cursor.execute(
+                    "UPDATE usuarios SET password_hash = ?, salt = ? WHERE id = ?",
+                    (senha[0], senha[1], usuario_id)
+                )
+                cursor.execute("DELETE FROM sessoes WHERE usuario_id = ?", (usuario_id,))
+                AuthService.revogar_tokens(usuario_id, cursor)
+
+        executar_escrita(_atualizar)
+        AuthService.limpar_cache_geracao(usuario_id)
+
+
+invalidacao.assinar('auth_geracao', AuthService._descartar_geracao)
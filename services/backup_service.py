@@ -1,11 +1,12 @@
 import os
+import gzip
+import json
+import sqlite3
 import subprocess
 from datetime import datetime
 from pathlib import Path
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+
+from services.backup_storage import comprimir, criar_storage
 
 try:
     from dotenv import load_dotenv
@@ -18,9 +19,21 @@ class BackupService:
     """Gerencia backups do banco de dados para Google Drive."""
     
     SCOPES = ['https://www.googleapis.com/auth/drive.file']
+
+    # Tabelas de eventos (append-mostly): o incremental envia apenas as linhas
+    # com id acima da marca d'água e os ids removidos desde o último backup.
+    TABELAS_INCREMENTAIS = (
+        'entradas', 'saidas', 'quebrados', 'consumo', 'despesas',
+        'estoque_movimentos', 'estoque_snapshots',
+    )
+
+    # Tabelas pequenas e mutáveis: copiadas inteiras em cada incremental.
+    TABELAS_COMPLETAS = ('estoque', 'precos', 'resumo_mensal', 'usuarios', 'configuracoes', 'clientes')
+
+    ESTADO_INCREMENTAL = 'incremental_state.json'
     
-    def __init__(self):
-        self.backup_dir = Path(__file__).parent.parent / 'backups'
+    def __init__(self, backup_dir=None):
+        self.backup_dir = Path(backup_dir) if backup_dir else Path(__file__).parent.parent / 'backups'
         self.backup_dir.mkdir(exist_ok=True)
         
         self.database_url = os.environ.get('DATABASE_URL', '').strip()
@@ -34,9 +47,23 @@ class BackupService:
         self.client_secret = os.environ.get('GOOGLE_DRIVE_CLIENT_SECRET', '').strip()
         self.refresh_token = os.environ.get('GOOGLE_DRIVE_REFRESH_TOKEN', '').strip()
         self.drive_folder_id = os.environ.get('GDRIVE_BACKUP_FOLDER_ID', '').strip()
+
+        self.modo = os.environ.get('BACKUP_MODE', 'completo').strip().lower()
+        self.max_cadeia = int(os.environ.get('BACKUP_INCREMENTAL_MAX_CADEIA', '7'))
+
+        self.compressao = os.environ.get('BACKUP_COMPRESSAO', 'gzip').strip().lower()
+
+        self.pg_formato = os.environ.get('BACKUP_PG_FORMATO', 'custom').strip().lower()
+        self.pg_jobs = int(os.environ.get('BACKUP_PG_JOBS', '4'))
+        self.pg_compressao = int(os.environ.get('BACKUP_PG_COMPRESSAO', '6'))
+        self.storage = None  # criado sob demanda (criar_storage) ou injetado
     
     def authenticate(self):
         """Autentica com Google Drive API usando credenciais do .env."""
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        from googleapiclient.discovery import build
+
         if not self.client_id or not self.client_secret or not self.refresh_token:
             raise ValueError(
                 "Credenciais do Google Drive não configuradas no .env\n"
@@ -57,36 +84,85 @@ class BackupService:
         
         return build('drive', 'v3', credentials=creds)
     
+    @staticmethod
+    def _pg_conexao_args(database_url):
+        """Converte a URL em argumentos -h/-U/-d/-p e env com PGPASSWORD
+        (evita expor a senha na linha de comando)."""
+        from urllib.parse import urlparse
+        parsed = urlparse(database_url)
+
+        env = os.environ.copy()
+        if parsed.password:
+            env['PGPASSWORD'] = parsed.password
+
+        args = [
+            '-h', parsed.hostname,
+            '-U', parsed.username,
+            '-d', parsed.path.lstrip('/'),
+        ]
+        if parsed.port:
+            args.extend(['-p', str(parsed.port)])
+        return args, env
+
     def backup_postgres(self):
-        """Cria backup do PostgreSQL / usando pg_dump."""
+        """
+        Cria backup do PostgreSQL usando pg_dump.
+
+        Formato em BACKUP_PG_FORMATO:
+            custom (padrão) — arquivo .dump comprimido, restaurável em paralelo;
+            directory — dump paralelo com BACKUP_PG_JOBS workers, empacotado em .dir.tar;
+            plain — SQL texto (.sql), restaurável com psql.
+
+        Um manifesto com a contagem de linhas por tabela é gravado ao lado
+        do backup, lido do mesmo snapshot usado pelo pg_dump.
+        """
+        import tarfile
+        import shutil
+
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = self.backup_dir / f'EggVault_postgres_backup_{timestamp}.sql'
+        nome = f'EggVault_postgres_backup_{timestamp}'
+        formato = self.pg_formato
+
+        if formato == 'directory':
+            destino = self.backup_dir / f'{nome}.dir'
+            backup_file = self.backup_dir / f'{nome}.dir.tar'
+        elif formato == 'plain':
+            destino = backup_file = self.backup_dir / f'{nome}.sql'
+        else:
+            formato = 'custom'
+            destino = backup_file = self.backup_dir / f'{nome}.dump'
         
-        print(f"📦 Criando backup do PostgreSQL")
+        print(f"📦 Criando backup do PostgreSQL (formato {formato})")
         
+        conn = None
         try:
-            from urllib.parse import urlparse
-            parsed = urlparse(self.database_url)
-            
-            env = os.environ.copy()
-            env['PGPASSWORD'] = parsed.password
+            args, env = self._pg_conexao_args(self.database_url)
             
-            cmd = [
-                'pg_dump',
-                '-h', parsed.hostname,
-                '-U', parsed.username,
-                '-d', parsed.path.lstrip('/'),
-                '-F', 'p',  # Plain text format
-                '-f', str(backup_file)
-            ]
-            
-            if parsed.port:
-                cmd.extend(['-p', str(parsed.port)])
+            cmd = ['pg_dump', *args, '-F', formato[0], '-f', str(destino)]
+            if formato != 'plain':
+                cmd.extend(['-Z', str(self.pg_compressao)])
+            if formato == 'directory':
+                cmd.extend(['-j', str(self.pg_jobs)])
+
+            # Snapshot exportado: contagens do manifesto e pg_dump enxergam
+            # exatamente os mesmos dados.
+            conn, snapshot = self._pg_abrir_snapshot()
+            if snapshot:
+                cmd.extend(['--snapshot', snapshot])
+            contagens = self._contar_linhas(conn)
             
             result = subprocess.run(cmd, env=env, capture_output=True, text=True)
             
             if result.returncode != 0:
                 raise Exception(f"Erro no pg_dump: {result.stderr}")
+
+            if formato == 'directory':
+                # Conteúdo já comprimido pelo pg_dump: tar sem compressão
+                with tarfile.open(backup_file, 'w') as tar:
+                    tar.add(destino, arcname=destino.name)
+                shutil.rmtree(destino)
+
+            self._salvar_manifesto(backup_file, 'postgres', formato, contagens)
             
             print(f"✅ Backup PostgreSQL criado: {backup_file}")
             return backup_file
@@ -95,11 +171,105 @@ class BackupService:
             print(f"❌ Erro ao fazer backup PostgreSQL: {e}")
             print(f"   Certifique-se de que pg_dump está instalado e acessível.")
             raise
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _pg_abrir_snapshot(self):
+        """Abre transação REPEATABLE READ e exporta seu snapshot (ou None se indisponível)."""
+        import psycopg2
+        conn = psycopg2.connect(self.database_url)
+        try:
+            conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_export_snapshot()")
+            return conn, cursor.fetchone()[0]
+        except Exception:
+            # PgBouncer em modo transação ou réplica sem suporte: conta sem snapshot
+            conn.rollback()
+            return conn, None
+
+    def _contar_linhas(self, conn):
+        """
+        Conta as linhas de cada tabela do manifesto (None se a contagem falhar).
+
+        No PostgreSQL cada contagem roda num SAVEPOINT: um erro aborta a
+        transação (a do snapshot do dump) e esconderia as tabelas seguintes.
+        """
+        cursor = conn.cursor()
+        savepoint = not isinstance(conn, sqlite3.Connection)
+        contagens = {}
+        for tabela in self.TABELAS_INCREMENTAIS + self.TABELAS_COMPLETAS:
+            if savepoint:
+                cursor.execute("SAVEPOINT eggvault_contagem")
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
+                contagens[tabela] = cursor.fetchone()[0]
+            except Exception:
+                contagens[tabela] = None
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT eggvault_contagem")
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT eggvault_contagem")
+        return contagens
+
+    @staticmethod
+    def caminho_manifesto(backup_file):
+        backup_file = Path(backup_file)
+        return backup_file.with_name(backup_file.name + '.manifest.json')
+
+    def _salvar_manifesto(self, backup_file, banco, formato, contagens):
+        """Grava o manifesto; `banco` é o do dump feito, não o configurado no app."""
+        manifesto = {
+            'arquivo': Path(backup_file).name,
+            'banco': banco,
+            'formato': formato,
+            'criado_em': datetime.now().isoformat(),
+            'tabelas': contagens,
+        }
+        with open(self.caminho_manifesto(backup_file), 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=2)
+        return manifesto
+
+    def restaurar_postgres(self, backup_file, destino_url, jobs=None):
+        """
+        Restaura um backup completo do PostgreSQL em `destino_url`.
+
+        .dump e .dir.tar usam pg_restore com `jobs` workers em paralelo;
+        .sql usa psql.
+        """
+        import tarfile
+        import tempfile
+
+        backup_file = Path(backup_file)
+        jobs = jobs or self.pg_jobs
+        args, env = self._pg_conexao_args(destino_url)
+
+        print(f"♻️  Restaurando {backup_file.name}...")
+
+        with tempfile.TemporaryDirectory() as temp:
+            if backup_file.name.endswith('.sql'):
+                cmd = ['psql', *args, '-v', 'ON_ERROR_STOP=1', '-q', '-f', str(backup_file)]
+            else:
+                alvo = backup_file
+                if backup_file.name.endswith('.dir.tar'):
+                    with tarfile.open(backup_file) as tar:
+                        # 'data' recusa caminhos absolutos, '..' e links para fora de temp
+                        tar.extractall(temp, filter='data')
+                    alvo = Path(temp) / backup_file.name[:-len('.tar')]
+                cmd = [
+                    'pg_restore', *args, '-j', str(jobs),
+                    '--clean', '--if-exists', '--no-owner', str(alvo)
+                ]
+
+            result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise Exception(f"Erro na restauração: {result.stderr}")
+
+        print(f"✅ Restauração concluída em {destino_url.rsplit('@', 1)[-1]}")
     
     def backup_sqlite(self):
-        """Cria backup do SQLite copiando o arquivo."""
-        import shutil
-        
+        """Cria backup do SQLite pela API de backup online (inclui o conteúdo do WAL)."""
         if not Path(self.sqlite_path).exists():
             print(f"⚠️  Banco SQLite não encontrado: {self.sqlite_path}")
             return None
@@ -110,38 +280,292 @@ class BackupService:
         print(f"📦 Criando backup do SQLite...")
         
         try:
-            shutil.copy2(self.sqlite_path, backup_file)
+            origem = sqlite3.connect(str(self.sqlite_path))
+            destino = sqlite3.connect(str(backup_file))
+            try:
+                origem.backup(destino)
+                self._salvar_manifesto(backup_file, 'sqlite', 'sqlite', self._contar_linhas(destino))
+            finally:
+                destino.close()
+                origem.close()
             print(f"✅ Backup SQLite criado: {backup_file}")
             return backup_file
         except Exception as e:
             print(f"❌ Erro ao fazer backup SQLite: {e}")
             raise
+
+    # ═══════════════════════════════════════════
+    # BACKUP INCREMENTAL
+    # ═══════════════════════════════════════════
+
+    def _conectar_origem(self):
+        """Abre conexão DB-API com o banco de origem (PostgreSQL ou SQLite)."""
+        if self.use_postgres:
+            import psycopg2
+            return psycopg2.connect(self.database_url)
+        return sqlite3.connect(str(self.sqlite_path))
+
+    @staticmethod
+    def _para_intervalos(ids):
+        """Compacta uma lista ordenada de ids em intervalos [[inicio, fim], ...]."""
+        intervalos = []
+        for i in ids:
+            if intervalos and i == intervalos[-1][1] + 1:
+                intervalos[-1][1] = i
+            else:
+                intervalos.append([i, i])
+        return intervalos
+
+    @staticmethod
+    def _de_intervalos(intervalos):
+        """Expande intervalos [[inicio, fim], ...] em um conjunto de ids."""
+        ids = set()
+        for inicio, fim in intervalos:
+            ids.update(range(inicio, fim + 1))
+        return ids
+
+    def _capturar_estado(self, conn):
+        """Lê marca d'água e ids presentes de cada tabela incremental."""
+        cursor = conn.cursor()
+        tabelas = {}
+        for tabela in self.TABELAS_INCREMENTAIS:
+            cursor.execute(f"SELECT id FROM {tabela} ORDER BY id")
+            ids = [row[0] for row in cursor.fetchall()]
+            tabelas[tabela] = {
+                'hwm': ids[-1] if ids else 0,
+                'ids': self._para_intervalos(ids),
+            }
+        return tabelas
+
+    @staticmethod
+    def _ler_linhas(cursor, sql, params=()):
+        cursor.execute(sql, params)
+        colunas = [d[0] for d in cursor.description]
+        linhas = [list(row) for row in cursor.fetchall()]
+        return {'colunas': colunas, 'linhas': linhas}
+
+    def carregar_estado(self):
+        caminho = self.backup_dir / self.ESTADO_INCREMENTAL
+        if not caminho.exists():
+            return None
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not (self.backup_dir / estado.get('base', '')).exists():
+            return None
+        return estado
+
+    def _salvar_estado(self, estado):
+        caminho = self.backup_dir / self.ESTADO_INCREMENTAL
+        temp = caminho.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f)
+        os.replace(temp, caminho)
+
+    def backup_incremental(self):
+        """
+        Cria um backup incremental (delta por linha) desde o último backup.
+
+        Se ainda não existe uma cadeia válida — ou ela já atingiu
+        BACKUP_INCREMENTAL_MAX_CADEIA deltas — cria um backup completo que
+        passa a ser a nova base.
+
+        Returns:
+            Path do arquivo criado (base completa ou delta .json.gz).
+        """
+        estado = self.carregar_estado()
+        if estado is None or len(estado['cadeia']) >= self.max_cadeia:
+            return self._iniciar_cadeia()
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        backup_file = self.backup_dir / f'EggVault_incremental_backup_{timestamp}.json.gz'
+
+        print(f"📦 Criando backup incremental #{len(estado['cadeia']) + 1}...")
+
+        conn = self._conectar_origem()
+        try:
+            cursor = conn.cursor()
+            novo_estado = self._capturar_estado(conn)
+
+            delta = {
+                'versao': 1,
+                'tipo': 'incremental',
+                'base': estado['base'],
+                'sequencia': len(estado['cadeia']) + 1,
+                'criado_em': datetime.now().isoformat(),
+                'tabelas': {},
+                'completas': {},
+            }
+
+            for tabela in self.TABELAS_INCREMENTAIS:
+                anterior = estado['tabelas'].get(tabela, {'hwm': 0, 'ids': []})
+                atual = novo_estado[tabela]
+                inseridos = self._ler_linhas(
+                    cursor, f"SELECT * FROM {tabela} WHERE id > {int(anterior['hwm'])} ORDER BY id"
+                )
+                removidos = sorted(
+                    self._de_intervalos(anterior['ids']) - self._de_intervalos(atual['ids'])
+                )
+                delta['tabelas'][tabela] = {'inseridos': inseridos, 'removidos': removidos}
+
+            for tabela in self.TABELAS_COMPLETAS:
+                delta['completas'][tabela] = self._ler_linhas(cursor, f"SELECT * FROM {tabela}")
+        finally:
+            conn.close()
+
+        with gzip.open(backup_file, 'wt', encoding='utf-8') as f:
+            json.dump(delta, f, default=str)
+
+        estado['tabelas'] = novo_estado
+        estado['cadeia'].append(backup_file.name)
+        self._salvar_estado(estado)
+
+        total = sum(len(t['inseridos']['linhas']) for t in delta['tabelas'].values())
+        print(f"✅ Backup incremental criado: {backup_file} ({total} linhas novas)")
+        return backup_file
+
+    def _iniciar_cadeia(self):
+        """Cria um backup completo e registra o estado que servirá de base aos deltas."""
+        print("📦 Iniciando nova cadeia incremental (backup completo)...")
+
+        if self.use_postgres:
+            # Estado capturado antes do dump: linhas gravadas durante o dump
+            # reaparecem no próximo delta, e a reaplicação é idempotente por id.
+            conn = self._conectar_origem()
+            try:
+                tabelas = self._capturar_estado(conn)
+            finally:
+                conn.close()
+            base = self.backup_postgres()
+        else:
+            base = self.backup_sqlite()
+            if base is None:
+                return None
+            conn = sqlite3.connect(str(base))
+            try:
+                tabelas = self._capturar_estado(conn)
+            finally:
+                conn.close()
+
+        self._salvar_estado({
+            'base': base.name,
+            'criado_em': datetime.now().isoformat(),
+            'cadeia': [],
+            'tabelas': tabelas,
+        })
+        return base
+
+    @staticmethod
+    def carregar_delta(caminho):
+        """Lê um arquivo de backup incremental (.json.gz)."""
+        with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def aplicar_delta(self, conn, delta, placeholder='?'):
+        """
+        Reaplica um delta incremental sobre uma conexão DB-API já restaurada.
+
+        A operação é idempotente: linhas inseridas substituem as de mesmo id.
+        As tabelas completas não são apagadas inteiras (a FK de sessoes →
+        usuarios recusaria no PostgreSQL): saem só os ids ausentes da cópia,
+        com as sessões dos usuários removidos, e o resto é atualizado.
+        """
+        cursor = conn.cursor()
+        is_pg = placeholder != '?'
+
+        def inserir(tabela, dados):
+            colunas = dados['colunas']
+            if not dados['linhas']:
+                return
+            marcadores = ', '.join([placeholder] * len(colunas))
+            nomes = ', '.join(colunas)
+            if is_pg:
+                atualizacoes = ', '.join(f"{c} = EXCLUDED.{c}" for c in colunas if c != 'id')
+                sql = (f"INSERT INTO {tabela} ({nomes}) VALUES ({marcadores}) "
+                       f"ON CONFLICT (id) DO UPDATE SET {atualizacoes}")
+            else:
+                sql = f"INSERT OR REPLACE INTO {tabela} ({nomes}) VALUES ({marcadores})"
+            cursor.executemany(sql, [tuple(linha) for linha in dados['linhas']])
+
+        def remover(tabela, ids, coluna='id'):
+            for i in range(0, len(ids), 500):
+                lote = ids[i:i + 500]
+                cursor.execute(
+                    f"DELETE FROM {tabela} WHERE {coluna} IN ({', '.join([placeholder] * len(lote))})",
+                    tuple(lote)
+                )
+
+        for tabela, dados in delta['tabelas'].items():
+            remover(tabela, dados['removidos'])
+            inserir(tabela, dados['inseridos'])
+
+        for tabela, dados in delta['completas'].items():
+            posicao = dados['colunas'].index('id')
+            na_copia = {linha[posicao] for linha in dados['linhas']}
+            cursor.execute(f"SELECT id FROM {tabela}")
+            # Antes do upsert: uma linha recriada com outro id e a mesma chave única não colide
+            ausentes = sorted({row[0] for row in cursor.fetchall()} - na_copia)
+            if tabela == 'usuarios':
+                remover('sessoes', ausentes, 'usuario_id')
+            remover(tabela, ausentes)
+            inserir(tabela, dados)
+
+        if is_pg:
+            # Reposiciona as sequences após inserir ids explícitos
+            for tabela in list(delta['tabelas']) + list(delta['completas']):
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {tabela}), 0) + 1, false)"
+                )
+
+        conn.commit()
+
+    def restaurar_cadeia_sqlite(self, destino, estado=None):
+        """
+        Restaura base SQLite + todos os deltas da cadeia em um novo arquivo.
+
+        Args:
+            destino: Caminho do banco SQLite a ser criado.
+            estado: Estado da cadeia (padrão: incremental_state.json do diretório).
+
+        Returns:
+            Quantidade de deltas aplicados.
+        """
+        import shutil
+
+        estado = estado or self.carregar_estado()
+        if estado is None:
+            raise ValueError("Nenhuma cadeia incremental encontrada")
+        if not estado['base'].endswith('.db'):
+            raise ValueError("A base da cadeia não é um backup SQLite")
+
+        shutil.copy2(self.backup_dir / estado['base'], destino)
+        conn = sqlite3.connect(str(destino))
+        try:
+            for nome in estado['cadeia']:
+                self.aplicar_delta(conn, self.carregar_delta(self.backup_dir / nome))
+        finally:
+            conn.close()
+        return len(estado['cadeia'])
     
     def upload_to_drive(self, file_path):
-        """Faz upload de um arquivo para o Google Drive."""
+        """Comprime e envia um arquivo ao destino configurado (Google Drive por padrão).
+
+        O envio é feito em chunks resumíveis, com retry e backoff em falhas
+        transitórias. O arquivo comprimido temporário é removido ao final.
+        """
+        if self.storage is None:
+            self.storage = criar_storage(self)
+
+        file_path = Path(file_path)
+        # Temporário fora do glob da limpeza ('*_backup_*' não é recursivo)
+        enviado = comprimir(file_path, self.compressao, self.backup_dir / '.envio')
         try:
-            service = self.authenticate()
+            print(f"☁️  Enviando {enviado.name} ({self.storage.nome})...")
             
-            file_metadata = {
-                'name': Path(file_path).name
-            }
-            
-            # Se especificou uma pasta, adiciona o parent
-            if self.drive_folder_id:
-                file_metadata['parents'] = [self.drive_folder_id]
-            
-            media = MediaFileUpload(
-                str(file_path),
-                resumable=True
-            )
-            
-            print(f"☁️  Enviando para Google Drive...")
-            
-            file = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, name, webViewLink'
-            ).execute()
+            file = self.storage.upload(enviado)
             
             print(f"✅ Upload concluído!")
             print(f"   ID: {file.get('id')}")
@@ -150,30 +574,64 @@ class BackupService:
             return file
             
         except Exception as e:
-            print(f"❌ Erro ao fazer upload para Google Drive: {e}")
+            print(f"❌ Erro ao fazer upload de {file_path.name}: {e}")
             raise
+        finally:
+            if enviado != file_path:
+                enviado.unlink(missing_ok=True)
         
     def cleanup_old_backups(self, keep_last=5):
-        """Remove backups locais antigos, mantendo apenas os últimos N."""
-        backups = sorted(self.backup_dir.glob('*_backup_*'), key=lambda p: p.stat().st_mtime, reverse=True)
+        """Remove backups locais antigos, mantendo apenas os últimos N.
+
+        Arquivos da cadeia incremental ativa (base + deltas) nunca são removidos.
+        """
+        estado = self.carregar_estado()
+        protegidos = set()
+        if estado:
+            protegidos = {estado['base'], *estado['cadeia']}
+
+        backups = sorted(
+            (p for p in self.backup_dir.glob('*_backup_*')
+             if p.name not in protegidos and not p.name.endswith('.manifest.json')),
+            key=lambda p: p.stat().st_mtime, reverse=True
+        )
         
         if len(backups) > keep_last:
             print(f"🧹 Limpando backups antigos (mantendo {keep_last})...")
             for backup in backups[keep_last:]:
                 backup.unlink()
+                self.caminho_manifesto(backup).unlink(missing_ok=True)
                 print(f"   Removido: {backup.name}")
     
-    def run_backup(self, upload_to_drive=True, cleanup=True):
-        """Executa o processo completo de backup."""
+    def run_backup(self, upload_to_drive=True, cleanup=True, incremental=None, fila=None):
+        """Executa o processo completo de backup.
+
+        Args:
+            incremental: Se True, envia apenas o delta desde o último backup.
+                         Padrão: variável BACKUP_MODE ('completo' | 'incremental').
+            fila: FilaUpload opcional. Se informada, os uploads são apenas
+                  enfileirados e a função retorna sem esperar o envio.
+        """
+        if incremental is None:
+            incremental = self.modo == 'incremental'
+
         print("=" * 60)
         print("🔒 INICIANDO BACKUP DO BANCO DE DADOS")
         print("=" * 60)
         print()
         
         backup_files = []
-        
+
+        if incremental:
+            try:
+                backup_file = self.backup_incremental()
+                if backup_file:
+                    backup_files.append(backup_file)
+            except Exception as e:
+                print(f"⚠️  Falha no backup incremental: {e}")
+
         # Backup PostgreSQL
-        if self.use_postgres:
+        elif self.use_postgres:
             try:
                 backup_file = self.backup_postgres()
                 backup_files.append(backup_file)
@@ -181,7 +639,7 @@ class BackupService:
                 print(f"⚠️  Falha no backup PostgreSQL: {e}")
         
         # Backup SQLite
-        if Path(self.sqlite_path).exists():
+        if not incremental and Path(self.sqlite_path).exists():
             try:
                 backup_file = self.backup_sqlite()
                 if backup_file:
@@ -194,7 +652,12 @@ class BackupService:
             return False
         
         # Upload para Google Drive
-        if upload_to_drive:
+        if upload_to_drive and fila is not None:
+            print()
+            for backup_file in backup_files:
+                fila.enfileirar(backup_file)
+            print(f"📤 {len(backup_files)} arquivo(s) na fila de upload")
+        elif upload_to_drive:
             print()
             for backup_file in backup_files:
                 try:
@@ -215,10 +678,12 @@ class BackupService:
         return True
 
 
-def criar_backup(upload_to_drive=True, cleanup=True):
+def criar_backup(upload_to_drive=True, cleanup=True, incremental=None, fila=None):
     """Função de conveniência para criar backup."""
     service = BackupService()
-    return service.run_backup(upload_to_drive=upload_to_drive, cleanup=cleanup)
+    return service.run_backup(
+        upload_to_drive=upload_to_drive, cleanup=cleanup, incremental=incremental, fila=fila
+    )
 
 
 def obter_refresh_token():
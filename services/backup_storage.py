@@ -0,0 +1,252 @@
+"""Destinos de armazenamento e fila de upload para os backups."""
+
+import os
+import gzip
+import time
+import random
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CHUNK_SIZE = 8 * 1024 * 1024  # múltiplo de 256 KiB (exigência do Google Drive)
+
+# .dump (pg_dump custom) e .tar (pg_dump directory) já saem comprimidos
+_EXTENSOES_COMPRIMIDAS = ('.gz', '.zst', '.zip', '.dump', '.tar')
+
+
+# ═══════════════════════════════════════════
+# COMPRESSÃO
+# ═══════════════════════════════════════════
+
+def comprimir(caminho, algoritmo='gzip', destino_dir=None):
+    """
+    Comprime um arquivo em streaming (sem carregar tudo em memória).
+
+    Args:
+        caminho: Arquivo de origem.
+        algoritmo: 'gzip', 'zstd' ou 'nenhuma'. Sem o pacote zstandard,
+                   'zstd' usa gzip.
+        destino_dir: Diretório do arquivo gerado (padrão: o mesmo da origem).
+
+    Returns:
+        Path do arquivo comprimido, ou o próprio caminho se já estiver
+        comprimido ou se a compressão estiver desligada.
+    """
+    caminho = Path(caminho)
+    if algoritmo == 'nenhuma' or caminho.suffix in _EXTENSOES_COMPRIMIDAS:
+        return caminho
+
+    destino_dir = Path(destino_dir) if destino_dir else caminho.parent
+    destino_dir.mkdir(parents=True, exist_ok=True)
+
+    if algoritmo == 'zstd' and zstandard is not None:
+        destino = destino_dir / (caminho.name + '.zst')
+        with open(caminho, 'rb') as origem, open(destino, 'wb') as saida:
+            zstandard.ZstdCompressor(level=10, threads=-1).copy_stream(origem, saida)
+        return destino
+
+    destino = destino_dir / (caminho.name + '.gz')
+    with open(caminho, 'rb') as origem, gzip.open(destino, 'wb', compresslevel=6) as saida:
+        shutil.copyfileobj(origem, saida, CHUNK_SIZE)
+    return destino
+
+
+# ═══════════════════════════════════════════
+# RETRY COM BACKOFF
+# ═══════════════════════════════════════════
+
+class ErroTransitorio(Exception):
+    """Falha temporária de rede/servidor — a operação pode ser repetida."""
+
+
+def com_retry(operacao, tentativas=6, base=1.0, maximo=60.0, dormir=time.sleep,
+              transitorios=(ErroTransitorio, ConnectionError, TimeoutError)):
+    """
+    Executa `operacao()` repetindo falhas transitórias com backoff exponencial
+    e jitter completo (espera aleatória entre 0 e base * 2^tentativa).
+
+    Outros OSError (arquivo inexistente, permissão, disco cheio) não passam
+    com o tempo e sobem na hora.
+    """
+    for tentativa in range(tentativas):
+        try:
+            return operacao()
+        except transitorios:
+            if tentativa == tentativas - 1:
+                raise
+            espera = random.uniform(0, min(maximo, base * (2 ** tentativa)))
+            print(f"   ⚠️  Falha transitória, nova tentativa em {espera:.1f}s...")
+            dormir(espera)
+
+
+# ═══════════════════════════════════════════
+# DESTINOS
+# ═══════════════════════════════════════════
+
+class BackupStorage(ABC):
+    """Interface de destino de backups. Implementações enviam em chunks
+    e retomam do último offset confirmado após uma falha."""
+
+    nome = 'base'
+
+    def __init__(self, chunk_size=CHUNK_SIZE, dormir=time.sleep):
+        self.chunk_size = chunk_size
+        self.dormir = dormir
+
+    @abstractmethod
+    def upload(self, caminho, nome=None):
+        """Envia o arquivo e retorna um dict com ao menos 'id' e 'name'."""
+
+
+class LocalStorage(BackupStorage):
+    """Destino em pasta local (NAS, disco externo, testes).
+
+    O arquivo é escrito em `<nome>.part` e renomeado ao final; um upload
+    interrompido continua do tamanho já gravado na próxima chamada.
+    """
+
+    nome = 'local'
+
+    def __init__(self, destino_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.destino_dir = Path(destino_dir)
+        self.destino_dir.mkdir(parents=True, exist_ok=True)
+
+    def _escrever_chunk(self, parcial, offset, dados):
+        with open(parcial, 'r+b' if parcial.exists() else 'wb') as f:
+            f.seek(offset)
+            f.write(dados)
+            f.truncate()
+
+    def upload(self, caminho, nome=None):
+        caminho = Path(caminho)
+        nome = nome or caminho.name
+        final = self.destino_dir / nome
+        parcial = self.destino_dir / (nome + '.part')
+        tamanho = caminho.stat().st_size
+
+        with open(caminho, 'rb') as origem:
+            while True:
+                offset = parcial.stat().st_size if parcial.exists() else 0
+                if offset >= tamanho:
+                    break
+                origem.seek(offset)
+                dados = origem.read(self.chunk_size)
+                com_retry(lambda: self._escrever_chunk(parcial, offset, dados), dormir=self.dormir)
+
+        if not parcial.exists():
+            parcial.touch()
+        os.replace(parcial, final)
+        return {'id': str(final), 'name': nome, 'webViewLink': final.as_uri()}
+
+
+class GoogleDriveStorage(BackupStorage):
+    """Destino Google Drive com upload resumível em chunks."""
+
+    nome = 'gdrive'
+
+    def __init__(self, backup_service, **kwargs):
+        super().__init__(**kwargs)
+        self.backup_service = backup_service
+
+    def upload(self, caminho, nome=None):
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaFileUpload
+
+        caminho = Path(caminho)
+        service = com_retry(self.backup_service.authenticate, dormir=self.dormir)
+
+        file_metadata = {'name': nome or caminho.name}
+        if self.backup_service.drive_folder_id:
+            file_metadata['parents'] = [self.backup_service.drive_folder_id]
+
+        media = MediaFileUpload(str(caminho), chunksize=self.chunk_size, resumable=True)
+        request = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, name, webViewLink'
+        )
+
+        def proximo_chunk():
+            # Após um erro, next_chunk consulta o servidor e continua do
+            # último byte confirmado em vez de reiniciar a transferência.
+            try:
+                return request.next_chunk()
+            except HttpError as e:
+                if e.resp.status in (408, 429) or e.resp.status >= 500:
+                    raise ErroTransitorio(str(e))
+                raise
+
+        response = None
+        while response is None:
+            status, response = com_retry(proximo_chunk, dormir=self.dormir)
+            if status:
+                print(f"   ☁️  {int(status.progress() * 100)}% enviado")
+        return response
+
+
+def criar_storage(backup_service):
+    """Cria o destino configurado em BACKUP_STORAGE ('gdrive' | 'local')."""
+    tipo = os.environ.get('BACKUP_STORAGE', 'gdrive').strip().lower()
+    if tipo == 'local':
+        destino = os.environ.get('BACKUP_LOCAL_DIR', '').strip()
+        if not destino:
+            raise ValueError("Configure BACKUP_LOCAL_DIR para usar BACKUP_STORAGE=local")
+        return LocalStorage(destino)
+    return GoogleDriveStorage(backup_service)
+
+
+# ═══════════════════════════════════════════
+# FILA DE UPLOAD EM SEGUNDO PLANO
+# ═══════════════════════════════════════════
+
+class FilaUpload:
+    """Fila de uploads processada por threads em segundo plano.
+
+    Permite que o agendador continue rodando enquanto os arquivos são
+    comprimidos e enviados, com até `workers` envios em paralelo.
+    """
+
+    def __init__(self, backup_service, workers=None):
+        if workers is None:
+            workers = int(os.environ.get('BACKUP_UPLOAD_WORKERS', '2'))
+        self.backup_service = backup_service
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backup-upload')
+        self._lock = threading.Lock()
+        self._pendentes = set()
+
+    def enfileirar(self, caminho):
+        """Agenda o upload de um arquivo. Retorna um Future com o resultado."""
+        future = self._executor.submit(self._executar, Path(caminho))
+        with self._lock:
+            self._pendentes.add(future)
+        future.add_done_callback(self._concluido)
+        return future
+
+    def _executar(self, caminho):
+        try:
+            return self.backup_service.upload_to_drive(caminho)
+        except Exception as e:
+            print(f"⚠️  Falha no upload de {caminho.name}: {e}")
+            raise
+
+    def _concluido(self, future):
+        with self._lock:
+            self._pendentes.discard(future)
+
+    @property
+    def pendentes(self):
+        with self._lock:
+            return len(self._pendentes)
+
+    def aguardar(self):
+        """Bloqueia até todos os uploads terminarem e encerra as threads."""
+        self._executor.shutdown(wait=True)
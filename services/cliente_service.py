@@ -109,7 +109,11 @@ class ClienteService:
     @staticmethod
     def listar():
         """Retorna todos os clientes com info de inatividade e link WhatsApp."""
-        clientes = ClienteRepository.get_all()
+        return ClienteService.enriquecer(ClienteRepository.get_all())
+
+    @staticmethod
+    def enriquecer(clientes):
+        """Acrescenta inatividade e link do WhatsApp a registros de clientes."""
         for c in clientes:
             inatividade = _calcular_inatividade(c.get('data_ultima_compra'))
             c['inatividade_dias'] = inatividade['dias']
@@ -8,7 +8,7 @@ class ConsumoService:
     """Lógica de negócios para registro de consumo pessoal de ovos."""
 
     @staticmethod
-    def registrar(quantidade, observacao='', usuario_id=None, usuario_nome=''):
+    def registrar(quantidade, observacao='', usuario_id=None, usuario_nome='', data=None):
         if not isinstance(quantidade, int) or quantidade <= 0:
             raise ValueError("Quantidade deve ser um número inteiro positivo")
         if observacao and len(observacao) > 500:
@@ -20,17 +20,31 @@ class ConsumoService:
                 f"Estoque insuficiente. Disponível: {estoque['quantidade_total']} ovos"
             )
 
-        mes_ref = datetime.now().strftime('%Y-%m')
-        entry_id = ConsumoRepository.create(quantidade, observacao, mes_ref, usuario_id, usuario_nome)
-        EstoqueService.atualizar(quantidade, 'subtract')
+        momento = data or datetime.now()
+        mes_ref = momento.strftime('%Y-%m')
+
+        def _inserir(conn):
+            entry_id = ConsumoRepository.inserir(conn, quantidade, observacao, mes_ref,
+                                                 usuario_id, usuario_nome, momento)
+            return entry_id, quantidade, 'subtract', entry_id
+
+        # Registro e movimento na mesma transação, com a hora do registro
+        entry_id = EstoqueService.movimentar('consumo', _inserir, momento)
+        if data is not None:
+            # Registro retroativo (anotado offline) muda períodos já fechados
+            EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return entry_id
 
     @staticmethod
     def remover(entry_id):
-        quantidade, mes_ref = ConsumoRepository.delete(entry_id)
-        EstoqueService.atualizar(quantidade, 'add')
+        def _remover(conn):
+            quantidade, mes_ref = ConsumoRepository.remover(conn, entry_id)
+            return entry_id, quantidade, 'add', (quantidade, mes_ref)
+
+        quantidade, mes_ref = EstoqueService.movimentar('estorno_consumo', _remover)
+        EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return quantidade
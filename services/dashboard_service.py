@@ -0,0 +1,56 @@
+"""Serviço de carga inicial do painel (bootstrap da SPA)."""
+
+from datetime import datetime
+from database import get_connection
+from repositories.preco_repo import PrecoRepository
+from repositories.resumo_repo import ResumoRepository
+from services.estoque_service import EstoqueService
+from services.relatorio_service import RelatorioService
+
+
+class DashboardService:
+    """Reúne em uma única conexão tudo o que a SPA precisa ao iniciar."""
+
+    CONFIGS_GERAIS = ('timezone', 'nome_fazenda', 'moeda', 'formato_data')
+
+    @staticmethod
+    def get_bootstrap(usuario):
+        """
+        Monta o payload inicial da SPA.
+
+        Args:
+            usuario: Usuário autenticado (dict de AuthService.validar_token).
+
+        Returns:
+            dict com usuario, estoque, preco_ativo, resumo_mes, mes_atual,
+            configuracoes (gerais), consumo_habilitado e meses.
+        """
+        mes_atual = datetime.now().strftime('%Y-%m')
+        chaves = DashboardService.CONFIGS_GERAIS + ('consumo_habilitado',)
+
+        conn = get_connection(leitura=True)
+        cursor = conn.cursor()
+        try:
+            estoque = EstoqueService.get_estoque(cursor=cursor)
+            preco = PrecoRepository.get_active(cursor)
+            resumo = ResumoRepository.get_by_month(mes_atual, cursor)
+            cursor.execute(
+                f"SELECT chave, valor FROM configuracoes WHERE chave IN ({', '.join('?' * len(chaves))})",
+                chaves
+            )
+            config = {row['chave']: row['valor'] for row in cursor.fetchall()}
+            meses = RelatorioService.get_meses(cursor)
+        finally:
+            conn.close()
+
+        consumo_habilitado = config.pop('consumo_habilitado', '0') == '1'
+        return {
+            'usuario': usuario,
+            'estoque': estoque,
+            'preco_ativo': preco,
+            'resumo_mes': resumo,
+            'mes_atual': mes_atual,
+            'configuracoes': config,
+            'consumo_habilitado': consumo_habilitado,
+            'meses': meses,
+        }
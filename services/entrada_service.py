@@ -10,15 +10,25 @@ class EntradaService:
     """Lógica de negócios para registro de entradas de ovos."""
 
     @staticmethod
-    def registrar(quantidade, observacao='', usuario_id=None, usuario_nome=''):
+    def registrar(quantidade, observacao='', usuario_id=None, usuario_nome='', data=None):
         if not isinstance(quantidade, int) or quantidade <= 0:
             raise ValueError("Quantidade deve ser um número inteiro positivo")
         if observacao and len(observacao) > 500:
             raise ValueError("Observação deve ter no máximo 500 caracteres")
 
-        mes_ref = datetime.now().strftime('%Y-%m')
-        entry_id = EntradaRepository.create(quantidade, observacao, mes_ref, usuario_id, usuario_nome)
-        EstoqueService.atualizar(quantidade, 'add')
+        momento = data or datetime.now()
+        mes_ref = momento.strftime('%Y-%m')
+
+        def _inserir(conn):
+            entry_id = EntradaRepository.inserir(conn, quantidade, observacao, mes_ref,
+                                                 usuario_id, usuario_nome, momento)
+            return entry_id, quantidade, 'add', entry_id
+
+        # Registro e movimento na mesma transação, com a hora do registro
+        entry_id = EstoqueService.movimentar('entrada', _inserir, momento)
+        if data is not None:
+            # Registro retroativo (anotado offline) muda períodos já fechados
+            EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return entry_id
@@ -39,9 +49,14 @@ class EntradaService:
                 f"Estoque atual: {estoque['quantidade_total']}, entrada: {quantidade}"
             )
 
-        # Seguro deletar — entrada existe e estoque suporta
-        EntradaRepository.delete(entry_id)
-        EstoqueService.atualizar(quantidade, 'subtract')
+        # Entrada existe e estoque suporta; o estorno ainda é conferido na
+        # transação da remoção (se falhar, a entrada fica)
+        def _remover(conn):
+            removida, _ = EntradaRepository.remover(conn, entry_id)
+            return entry_id, removida, 'subtract', removida
+
+        quantidade = EstoqueService.movimentar('estorno_entrada', _remover)
+        EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return quantidade
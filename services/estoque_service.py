@@ -1,24 +1,55 @@
 """Serviço de negócios para Estoque."""
 
+import threading
+from datetime import date, datetime, timedelta
+import eventos
+import invalidacao
+from database import executar_escrita
 from repositories.estoque_repo import EstoqueRepository
 
 
+# Histórico dos períodos já fechados, por granularidade:
+# {'dia': {'linhas': [...], 'proximo': 'YYYY-MM-DD'}}
+_historico_cache = {}
+_historico_lock = threading.Lock()
+_historico_geracao = [0]   # incrementada a cada invalidação
+
+
 class EstoqueService:
     """Lógica de negócios relacionada ao estoque."""
 
     LIMITE_BAIXO = 30
     LIMITE_MEDIO = 100
 
+    GRANULARIDADES = ('dia', 'semana', 'mes')
+
+    @staticmethod
+    def _nivel(qty):
+        """Status e cor do indicador para uma quantidade."""
+        if qty <= EstoqueService.LIMITE_BAIXO:
+            return 'baixo', 'vermelho'
+        if qty <= EstoqueService.LIMITE_MEDIO:
+            return 'medio', 'amarelo'
+        return 'alto', 'verde'
+
     @staticmethod
-    def get_estoque():
+    def get_estoque(em=None, cursor=None):
         """
         Retorna o estoque atual com indicador de status.
 
+        Args:
+            em: Data/hora ISO opcional — retorna o saldo naquele instante.
+            cursor: Cursor já aberto a reutilizar (opcional).
+
         Returns:
             dict com quantidade_total, status ('baixo'|'medio'|'alto'),
             cor ('vermelho'|'amarelo'|'verde') e ultima_atualizacao.
         """
-        estoque = EstoqueRepository.get_current()
+        if em:
+            estoque = {'id': None, 'quantidade_total': EstoqueRepository.get_em(em),
+                       'ultima_atualizacao': em}
+        else:
+            estoque = EstoqueRepository.get_current(cursor)
         if not estoque:
             return {
                 'quantidade_total': 0,
@@ -28,12 +59,7 @@ class EstoqueService:
             }
 
         qty = estoque['quantidade_total']
-        if qty <= EstoqueService.LIMITE_BAIXO:
-            status, cor = 'baixo', 'vermelho'
-        elif qty <= EstoqueService.LIMITE_MEDIO:
-            status, cor = 'medio', 'amarelo'
-        else:
-            status, cor = 'alto', 'verde'
+        status, cor = EstoqueService._nivel(qty)
 
         return {
             'id': estoque['id'],
@@ -44,6 +70,205 @@ class EstoqueService:
         }
 
     @staticmethod
-    def atualizar(quantidade, operacao='add'):
-        """Atualiza o estoque (add ou subtract)."""
-        return EstoqueRepository.update_quantidade(quantidade, operacao)
+    def atualizar(quantidade, operacao='add', origem='ajuste', referencia_id=None):
+        """
+        Registra um movimento no livro-razão do estoque.
+
+        Args:
+            quantidade: Quantidade movimentada (positiva).
+            operacao: 'add' para entrada, 'subtract' para saída.
+            origem: Tipo do movimento ('entrada', 'estorno_saida', ...).
+            referencia_id: ID do registro que originou o movimento.
+
+        Returns:
+            Nova quantidade total.
+        """
+        delta = EstoqueService._delta(quantidade, operacao)
+        total = EstoqueRepository.registrar_movimento(delta, origem, referencia_id)
+        EstoqueService._publicar(total)
+        return total
+
+    @staticmethod
+    def movimentar(origem, registro, data=None):
+        """
+        Grava um registro e o movimento de estoque dele numa transação só.
+
+        Se o estoque ficaria negativo, nem o registro é gravado.
+
+        Args:
+            origem: Tipo do movimento ('entrada', 'estorno_saida', ...).
+            registro: Unidade `registro(conn)` que grava (ou remove) o
+                registro, sem commit, e retorna (referencia_id, quantidade,
+                operacao, resultado).
+            data: Hora do movimento — a do registro (padrão: agora).
+
+        Returns:
+            O resultado retornado por `registro`.
+
+        Raises:
+            ValueError: Se o estoque ficar negativo (nada é gravado).
+        """
+        def _gravar(conn):
+            referencia_id, quantidade, operacao, resultado = registro(conn)
+            total, pendentes = EstoqueRepository.gravar_movimento(
+                conn, EstoqueService._delta(quantidade, operacao), origem, referencia_id, data)
+            return resultado, total, pendentes
+
+        resultado, total, pendentes = executar_escrita(_gravar)
+        EstoqueRepository.snapshot_se_preciso(pendentes)
+        EstoqueService._publicar(total)
+        return resultado
+
+    @staticmethod
+    def _delta(quantidade, operacao):
+        if operacao == 'add':
+            return quantidade
+        if operacao == 'subtract':
+            return -quantidade
+        raise ValueError(f"Operação inválida: {operacao}")
+
+    @staticmethod
+    def _publicar(total):
+        status, cor = EstoqueService._nivel(total)
+        eventos.publicar('estoque', quantidade_total=total, status=status, cor=cor,
+                         ultima_atualizacao=datetime.now().isoformat())
+
+    # ── Histórico ──
+
+    @staticmethod
+    def _chave(dia, granularidade):
+        """Chave do período que contém `dia` (mesmo formato do SQL)."""
+        if granularidade == 'dia':
+            return dia.isoformat()
+        if granularidade == 'semana':
+            return (dia - timedelta(days=dia.weekday())).isoformat()
+        return dia.strftime('%Y-%m')
+
+    @staticmethod
+    def _inicio(chave, granularidade):
+        """Primeiro dia do período de uma chave."""
+        if granularidade == 'mes':
+            return date.fromisoformat(chave + '-01')
+        return date.fromisoformat(chave)
+
+    @staticmethod
+    def _proxima(chave, granularidade):
+        """Chave do período seguinte."""
+        inicio = EstoqueService._inicio(chave, granularidade)
+        if granularidade == 'dia':
+            return (inicio + timedelta(days=1)).isoformat()
+        if granularidade == 'semana':
+            return (inicio + timedelta(days=7)).isoformat()
+        return (inicio.replace(day=28) + timedelta(days=4)).strftime('%Y-%m')
+
+    @staticmethod
+    def _parse_limite(valor, granularidade, fim=False):
+        """Converte 'YYYY-MM-DD' ou 'YYYY-MM' em chave de período."""
+        if len(valor) == 7:
+            dia = date.fromisoformat(valor + '-01')
+            if fim:
+                dia = (dia.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        else:
+            dia = date.fromisoformat(valor[:10])
+        return EstoqueService._chave(dia, granularidade)
+
+    @staticmethod
+    def get_historico(granularidade='dia', inicio=None, fim=None):
+        """
+        Retorna a série do nível de estoque por período.
+
+        Períodos fechados ficam em cache; só o período corrente (e os que
+        fecharam desde a última consulta) vão ao banco. Períodos sem
+        movimento repetem o saldo anterior.
+
+        Args:
+            granularidade: 'dia', 'semana' ou 'mes'.
+            inicio: Primeiro período ('YYYY-MM-DD' ou 'YYYY-MM'), opcional.
+            fim: Último período ('YYYY-MM-DD' ou 'YYYY-MM'), padrão: hoje.
+
+        Returns:
+            Lista de dicts com periodo, entradas, saidas, quebrados, consumo,
+            ajustes e saldo.
+
+        Raises:
+            ValueError: Se a granularidade ou as datas forem inválidas.
+        """
+        if granularidade not in EstoqueService.GRANULARIDADES:
+            raise ValueError("Granularidade deve ser 'dia', 'semana' ou 'mes'")
+        try:
+            inicio = EstoqueService._parse_limite(inicio, granularidade) if inicio else None
+            fim = EstoqueService._parse_limite(fim, granularidade, fim=True) if fim else None
+        except ValueError:
+            raise ValueError("Datas devem estar no formato YYYY-MM-DD ou YYYY-MM")
+
+        aberto = EstoqueService._chave(date.today(), granularidade)
+
+        invalidacao.verificar()
+        with _historico_lock:
+            cache = _historico_cache.get(granularidade, {'linhas': [], 'proximo': None})
+            fechadas = list(cache['linhas'])
+            proximo = cache['proximo']
+            geracao = _historico_geracao[0]
+
+        saldo = fechadas[-1]['saldo'] if fechadas else 0
+        desde = EstoqueService._inicio(proximo, granularidade).isoformat() if proximo else None
+        novas = EstoqueRepository.get_historico(granularidade, desde, saldo)
+
+        fechadas += [l for l in novas if l['periodo'] < aberto]
+        abertas = [l for l in novas if l['periodo'] >= aberto]
+        with _historico_lock:
+            # Não grava um resultado calculado antes de uma invalidação
+            if geracao == _historico_geracao[0]:
+                _historico_cache[granularidade] = {'linhas': fechadas, 'proximo': aberto}
+
+        linhas = fechadas + abertas
+        if not linhas:
+            return []
+
+        # Preenche períodos sem movimento com o saldo anterior
+        serie = []
+        ultimo = max(linhas[-1]['periodo'], aberto)
+        fim = min(fim, ultimo) if fim else ultimo
+        por_periodo = {l['periodo']: l for l in linhas}
+        chave = linhas[0]['periodo']
+        saldo = 0
+        while chave <= fim:
+            linha = por_periodo.get(chave)
+            if linha:
+                saldo = linha['saldo']
+            else:
+                linha = {'periodo': chave, 'entradas': 0, 'saidas': 0,
+                         'quebrados': 0, 'consumo': 0, 'ajustes': 0, 'saldo': saldo}
+            if inicio is None or chave >= inicio:
+                serie.append(linha)
+            chave = EstoqueService._proxima(chave, granularidade)
+        return serie
+
+    @staticmethod
+    def invalidar_historico(mes_referencia=None):
+        """
+        Descarta o histórico em cache a partir de um mês (ou todo ele), em
+        todos os processos.
+
+        Chamado depois de desfazer um registro antigo ou de gravar um com
+        data passada, o que altera o saldo de períodos já fechados.
+        """
+        invalidacao.publicar('estoque_historico', mes_referencia)
+
+    @staticmethod
+    def _descartar_historico(mes_referencia=None):
+        """Descarta o histórico em cache deste processo (ver invalidar_historico)."""
+        with _historico_lock:
+            _historico_geracao[0] += 1
+            if mes_referencia is None:
+                _historico_cache.clear()
+                return
+            dia = date.fromisoformat(mes_referencia + '-01')
+            for granularidade, cache in list(_historico_cache.items()):
+                corte = EstoqueService._chave(dia, granularidade)
+                linhas = [l for l in cache['linhas'] if l['periodo'] < corte]
+                proximo = min(cache['proximo'], corte) if cache['proximo'] else None
+                _historico_cache[granularidade] = {'linhas': linhas, 'proximo': proximo}
+
+
+invalidacao.assinar('estoque_historico', EstoqueService._descartar_historico)
@@ -1,11 +1,60 @@
 """Serviço de negócios para Preços."""
 
+import os
+import time
+import bisect
+import threading
+from datetime import datetime
+
+import eventos
+import invalidacao
+from database import primario
 from repositories.preco_repo import PrecoRepository
 
 
+# Preço ativo e linha do tempo em cache: {'ativo'|'linha': (valor, expira_monotonic)}
+_precos_cache = {}
+_precos_lock = threading.Lock()
+_precos_geracao = [0]   # incrementada a cada invalidação
+
+
+def _instante(valor):
+    """Converte um datetime ou texto ISO (com ou sem fuso) para hora local sem fuso."""
+    data = valor if isinstance(valor, datetime) else datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    if data.tzinfo is not None:
+        data = data.astimezone().replace(tzinfo=None)
+    return data
+
+
+class LinhaDoTempoPrecos:
+    """
+    Preço de tabela vigente em qualquer instante.
+
+    Um preço vale do seu data_inicio até o início do seguinte; a consulta
+    é uma busca binária nos inícios (O(log n)).
+    """
+
+    def __init__(self, precos):
+        # Mesmo instante: vale o criado por último (maior id)
+        pares = sorted((_instante(p['data_inicio']), p['id'], p['preco_unitario']) for p in precos)
+        self._inicios = [inicio for inicio, _, _ in pares]
+        self._valores = [valor for _, _, valor in pares]
+
+    def __len__(self):
+        return len(self._inicios)
+
+    def preco_em(self, instante):
+        """Preço vigente em `instante` (datetime ou ISO) ou None se anterior ao primeiro preço."""
+        i = bisect.bisect_right(self._inicios, _instante(instante)) - 1
+        return self._valores[i] if i >= 0 else None
+
+
 class PrecoService:
     """Lógica de negócios para gerenciamento de preços."""
 
+    # Rede de segurança para trocas feitas fora da aplicação (scripts, restauração)
+    CACHE_TTL_S = float(os.environ.get('PRECO_CACHE_TTL_S', '60'))
+
     @staticmethod
     def definir_preco(preco_unitario):
         """
@@ -22,14 +71,59 @@ class PrecoService:
         """
         if not isinstance(preco_unitario, (int, float)) or preco_unitario < 0:
             raise ValueError("Preço deve ser um número não negativo")
-        return PrecoRepository.create(preco_unitario)
+        price_id = PrecoRepository.create(preco_unitario)
+        invalidacao.publicar('precos')
+        eventos.publicar('preco', id=price_id, preco_unitario=preco_unitario)
+        return price_id
+
+    @staticmethod
+    def _em_cache(chave, carregar):
+        """Valor em cache de `chave` ou o carregado do primário."""
+        invalidacao.verificar()
+        agora = time.monotonic()
+        with _precos_lock:
+            item = _precos_cache.get(chave)
+            geracao = _precos_geracao[0]
+        if item and item[1] > agora:
+            return item[0]
+
+        # Réplica atrasada devolveria o preço anterior a uma troca recente
+        with primario():
+            valor = carregar()
+        with _precos_lock:
+            # Não grava um valor lido antes de uma invalidação
+            if geracao == _precos_geracao[0]:
+                _precos_cache[chave] = (valor, agora + PrecoService.CACHE_TTL_S)
+        return valor
 
     @staticmethod
     def get_ativo():
-        """Retorna o preço ativo atual ou None."""
-        return PrecoRepository.get_active()
+        """Retorna o preço ativo atual ou None (em cache até a próxima troca)."""
+        preco = PrecoService._em_cache('ativo', PrecoRepository.get_active)
+        return dict(preco) if preco else None
+
+    @staticmethod
+    def linha_do_tempo():
+        """LinhaDoTempoPrecos com todo o histórico (em cache até a próxima troca)."""
+        return PrecoService._em_cache(
+            'linha', lambda: LinhaDoTempoPrecos(PrecoRepository.get_linha_do_tempo()))
+
+    @staticmethod
+    def preco_em(instante):
+        """Preço de tabela vigente em um instante (datetime ou ISO) ou None."""
+        return PrecoService.linha_do_tempo().preco_em(instante)
+
+    @staticmethod
+    def _descartar_cache(_argumento=None):
+        """Descarta o preço ativo e a linha do tempo em cache deste processo."""
+        with _precos_lock:
+            _precos_geracao[0] += 1
+            _precos_cache.clear()
 
     @staticmethod
     def historico():
         """Retorna todo o histórico de preços."""
         return PrecoRepository.get_all()
+
+
+invalidacao.assinar('precos', PrecoService._descartar_cache)
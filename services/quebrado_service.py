@@ -10,7 +10,7 @@ class QuebradoService:
     """Lógica de negócios para registro de ovos quebrados (perda)."""
 
     @staticmethod
-    def registrar(quantidade, motivo='', usuario_id=None, usuario_nome=''):
+    def registrar(quantidade, motivo='', usuario_id=None, usuario_nome='', data=None):
         """
         Registra ovos quebrados — subtrai do estoque.
 
@@ -19,6 +19,7 @@ class QuebradoService:
             motivo: Motivo/observação da perda (máx 500 caracteres).
             usuario_id: ID do usuário que registrou.
             usuario_nome: Nome do usuário que registrou.
+            data: Hora do registro (datetime); padrão: agora.
 
         Returns:
             ID do registro criado.
@@ -38,9 +39,19 @@ class QuebradoService:
                 f"Estoque insuficiente. Disponível: {estoque['quantidade_total']} ovos"
             )
 
-        mes_ref = datetime.now().strftime('%Y-%m')
-        entry_id = QuebradoRepository.create(quantidade, motivo, mes_ref, usuario_id, usuario_nome)
-        EstoqueService.atualizar(quantidade, 'subtract')
+        momento = data or datetime.now()
+        mes_ref = momento.strftime('%Y-%m')
+
+        def _inserir(conn):
+            entry_id = QuebradoRepository.inserir(conn, quantidade, motivo, mes_ref,
+                                                  usuario_id, usuario_nome, momento)
+            return entry_id, quantidade, 'subtract', entry_id
+
+        # Registro e movimento na mesma transação, com a hora do registro
+        entry_id = EstoqueService.movimentar('quebrado', _inserir, momento)
+        if data is not None:
+            # Registro retroativo (anotado offline) muda períodos já fechados
+            EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return entry_id
@@ -59,8 +70,12 @@ class QuebradoService:
         Raises:
             ValueError: Se o registro não for encontrado.
         """
-        quantidade, mes_ref = QuebradoRepository.delete(entry_id)
-        EstoqueService.atualizar(quantidade, 'add')
+        def _remover(conn):
+            quantidade, mes_ref = QuebradoRepository.remover(conn, entry_id)
+            return entry_id, quantidade, 'add', (quantidade, mes_ref)
+
+        quantidade, mes_ref = EstoqueService.movimentar('estorno_quebrado', _remover)
+        EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return quantidade
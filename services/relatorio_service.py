@@ -1,11 +1,15 @@
 """Serviço de negócios para Relatórios."""
 
+from datetime import datetime
+import eventos
+from database import primario
 from repositories.resumo_repo import ResumoRepository
 from repositories.entrada_repo import EntradaRepository
 from repositories.saida_repo import SaidaRepository
 from repositories.quebrado_repo import QuebradoRepository
 from repositories.consumo_repo import ConsumoRepository
 from repositories.despesa_repo import DespesaRepository
+from services.preco_service import PrecoService
 
 
 class RelatorioService:
@@ -19,11 +23,13 @@ class RelatorioService:
         Args:
             mes_referencia: Mês no formato 'YYYY-MM'.
         """
-        total_entradas = EntradaRepository.get_total_by_month(mes_referencia)
-        totais_saidas = SaidaRepository.get_totals_by_month(mes_referencia)
-        total_quebrados = QuebradoRepository.get_total_by_month(mes_referencia)
-        total_consumo = ConsumoRepository.get_total_by_month(mes_referencia)
-        total_despesas = DespesaRepository.get_total_by_month(mes_referencia)
+        # Os totais precisam incluir a escrita que acabou de acontecer
+        with primario():
+            total_entradas = EntradaRepository.get_total_by_month(mes_referencia)
+            totais_saidas = SaidaRepository.get_totals_by_month(mes_referencia)
+            total_quebrados = QuebradoRepository.get_total_by_month(mes_referencia)
+            total_consumo = ConsumoRepository.get_total_by_month(mes_referencia)
+            total_despesas = DespesaRepository.get_total_by_month(mes_referencia)
 
         total_saidas = totais_saidas['total_quantidade']
         faturamento = totais_saidas['total_valor']
@@ -32,12 +38,63 @@ class RelatorioService:
         ResumoRepository.upsert(
             mes_referencia, total_entradas, total_saidas, total_quebrados, total_consumo, faturamento, total_despesas, lucro
         )
+        eventos.publicar(
+            'resumo', mes_referencia=mes_referencia, total_entradas=total_entradas,
+            total_saidas=total_saidas, total_quebrados=total_quebrados, total_consumo=total_consumo,
+            faturamento_total=faturamento, total_despesas=total_despesas, lucro_estimado=lucro
+        )
 
     @staticmethod
     def get_resumo(mes_referencia):
         """Retorna o resumo de um mês específico."""
         return ResumoRepository.get_by_month(mes_referencia)
 
+    @staticmethod
+    def reprecificar(mes_referencia):
+        """
+        Faturamento do mês pelo preço de tabela vigente no momento de cada venda.
+
+        Compara o que foi cobrado com o que a tabela de preços mandava cobrar
+        (descontos, vendas com valor digitado). Vendas anteriores ao primeiro
+        preço entram com o valor cobrado.
+
+        Args:
+            mes_referencia: Mês no formato 'YYYY-MM'.
+
+        Returns:
+            dict com mes_referencia, faturamento_total (cobrado),
+            faturamento_tabela, diferenca (tabela - cobrado) e
+            vendas_sem_preco.
+        """
+        linha = PrecoService.linha_do_tempo()
+        faturamento = faturamento_tabela = 0.0
+        sem_preco = 0
+        for venda in SaidaRepository.get_by_month(mes_referencia):
+            faturamento += venda['valor_total']
+            preco = linha.preco_em(venda['data'])
+            if preco is None:
+                sem_preco += 1
+                faturamento_tabela += venda['valor_total']
+            else:
+                faturamento_tabela += round(venda['quantidade'] * preco, 2)
+
+        return {
+            'mes_referencia': mes_referencia,
+            'faturamento_total': round(faturamento, 2),
+            'faturamento_tabela': round(faturamento_tabela, 2),
+            'diferenca': round(faturamento_tabela - faturamento, 2),
+            'vendas_sem_preco': sem_preco,
+        }
+
+    @staticmethod
+    def get_meses(cursor=None):
+        """Retorna os meses com dados registrados, sempre incluindo o mês atual."""
+        meses = ResumoRepository.get_meses(cursor)
+        current = datetime.now().strftime('%Y-%m')
+        if current not in meses:
+            meses.insert(0, current)
+        return meses
+
     @staticmethod
     def get_dados_anuais(ano):
         """Retorna os resumos de todos os meses de um ano para gráficos."""
@@ -58,7 +58,8 @@ class SaidaService:
             preco_unitario = preco['preco_unitario']
             valor_total = round(quantidade * preco_unitario, 2)
 
-        mes_ref = datetime.now().strftime('%Y-%m')
+        momento = datetime.now()
+        mes_ref = momento.strftime('%Y-%m')
 
         # Resolver nome do cliente, se fornecido
         cliente_nome = ''
@@ -73,11 +74,15 @@ class SaidaService:
             except Exception:
                 cliente_id = None
 
-        sale_id = SaidaRepository.create(
-            quantidade, preco_unitario, valor_total, mes_ref,
-            usuario_id, usuario_nome, cliente_id, cliente_nome
-        )
-        EstoqueService.atualizar(quantidade, 'subtract')
+        def _inserir(conn):
+            sale_id = SaidaRepository.inserir(
+                conn, quantidade, preco_unitario, valor_total, mes_ref,
+                usuario_id, usuario_nome, cliente_id, cliente_nome, momento
+            )
+            return sale_id, quantidade, 'subtract', sale_id
+
+        # Venda e baixa no estoque na mesma transação: sem estoque, nada é gravado
+        sale_id = EstoqueService.movimentar('saida', _inserir, momento)
         RelatorioService.atualizar_resumo(mes_ref)
 
         # Atualizar data da última compra do cliente (não bloqueia o fluxo)
@@ -104,8 +109,12 @@ class SaidaService:
         Raises:
             ValueError: Se a venda não for encontrada.
         """
-        quantidade, mes_ref = SaidaRepository.delete(sale_id)
-        EstoqueService.atualizar(quantidade, 'add')
+        def _remover(conn):
+            quantidade, mes_ref = SaidaRepository.remover(conn, sale_id)
+            return sale_id, quantidade, 'add', (quantidade, mes_ref)
+
+        quantidade, mes_ref = EstoqueService.movimentar('estorno_saida', _remover)
+        EstoqueService.invalidar_historico(mes_ref)
         RelatorioService.atualizar_resumo(mes_ref)
 
         return quantidade
@@ -0,0 +1,110 @@
+"""
+Operações anotadas offline pela SPA e enviadas depois em lote (/api/sync).
+
+No galpão o celular fica sem rede: a SPA guarda entradas, quebrados e
+consumo numa fila local (IndexedDB) e envia tudo quando a conexão volta.
+Cada operação é registrada com a hora em que foi anotada; a baixa no
+estoque acontece na sincronização.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from services.entrada_service import EntradaService
+from services.quebrado_service import QuebradoService
+from services.consumo_service import ConsumoService
+
+
+class SyncService:
+    """Validação e aplicação das operações da fila offline."""
+
+    LOTE_MAXIMO = int(os.environ.get('SYNC_LOTE_MAX', '100'))
+    # Anotações mais antigas que isso são recusadas (fila esquecida no aparelho)
+    ATRASO_MAXIMO = timedelta(days=int(os.environ.get('SYNC_ATRASO_MAX_DIAS', '30')))
+    # Tolerância para o relógio do aparelho adiantado
+    ADIANTAMENTO_MAXIMO = timedelta(minutes=5)
+
+    # tipo → (rota de origem, service, campo de texto, mensagem)
+    TIPOS = {
+        'entrada': ('/api/entradas', EntradaService, 'observacao', '{} ovos adicionados ao estoque'),
+        'quebrado': ('/api/quebrados', QuebradoService, 'motivo', '{} ovos registrados como quebrados'),
+        'consumo': ('/api/consumo', ConsumoService, 'observacao', '{} ovos registrados como consumo pessoal'),
+    }
+
+    @staticmethod
+    def rota(tipo):
+        """
+        Rota de origem de um tipo de operação.
+
+        As chaves de idempotência da fila valem na rota de origem: a operação
+        que chegou ao servidor antes da queda da rede não é gravada de novo.
+
+        Raises:
+            ValueError: Se o tipo não for sincronizável.
+        """
+        if tipo not in SyncService.TIPOS:
+            raise ValueError(f"Tipo de operação inválido: {tipo!r} (use {', '.join(SyncService.TIPOS)})")
+        return SyncService.TIPOS[tipo][0]
+
+    @staticmethod
+    def data_registro(valor):
+        """
+        Converte o registrado_em (ISO 8601) da operação para a hora local.
+
+        Returns:
+            datetime sem fuso, como os gravados pelas rotas, ou None se ausente.
+
+        Raises:
+            ValueError: Se a data for inválida, futura ou antiga demais.
+        """
+        if not valor:
+            return None
+        try:
+            data = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("registrado_em deve estar no formato ISO 8601")
+        if data.tzinfo is not None:
+            data = data.astimezone().replace(tzinfo=None)
+
+        agora = datetime.now()
+        if data > agora + SyncService.ADIANTAMENTO_MAXIMO:
+            raise ValueError("registrado_em está no futuro")
+        if data < agora - SyncService.ATRASO_MAXIMO:
+            raise ValueError(
+                f"Operação anotada há mais de {SyncService.ATRASO_MAXIMO.days} dias; registre-a manualmente"
+            )
+        return data
+
+    @staticmethod
+    def aplicar(tipo, dados, registrado_em, usuario):
+        """
+        Registra uma operação da fila offline.
+
+        Args:
+            tipo: 'entrada', 'quebrado' ou 'consumo'.
+            dados: Corpo que a rota de origem receberia (quantidade e texto).
+            registrado_em: Hora em que foi anotada (ISO 8601), opcional.
+            usuario: Usuário autenticado (dict com id, nome e username).
+
+        Returns:
+            Tupla (id do registro, mensagem).
+
+        Raises:
+            ValueError: Se a operação for inválida ou o estoque insuficiente.
+        """
+        SyncService.rota(tipo)
+        _, service, campo, mensagem = SyncService.TIPOS[tipo]
+        if not isinstance(dados, dict) or not dados:
+            raise ValueError("Dados não fornecidos")
+        try:
+            quantidade = int(dados.get('quantidade', 0))
+        except (TypeError, ValueError):
+            raise ValueError("Quantidade deve ser um número inteiro positivo")
+
+        entry_id = service.registrar(
+            quantidade, dados.get(campo, ''),
+            usuario_id=usuario['id'],
+            usuario_nome=usuario['nome'] or usuario['username'],
+            data=SyncService.data_registro(registrado_em)
+        )
+        return entry_id, mensagem.format(quantidade)
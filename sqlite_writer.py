@@ -0,0 +1,286 @@
+"""
+Thread única de escrita para o SQLite (SQLITE_WRITER=1).
+
+O SQLite aceita um escritor por vez; com vários threads/workers escrevendo
+ao mesmo tempo, quem não pega o lock espera o busy_timeout e pode falhar
+com "database is locked". Com o escritor dedicado, as unidades de escrita
+(`database.executar_escrita`) entram numa fila e uma única thread por
+processo as executa, agrupando várias no mesmo commit (group commit): um
+fsync do WAL para o lote inteiro.
+
+Cada unidade roda dentro de um SAVEPOINT, então uma unidade que falha é
+desfeita sem afetar as outras do lote. O resultado só é entregue a quem
+enviou depois do COMMIT; se o commit falhar, todas as unidades do lote
+recebem o erro.
+
+Uma unidade roda no máximo uma vez: as novas tentativas por banco ocupado
+são só do BEGIN IMMEDIATE, antes de qualquer unidade começar, e um lote
+que falha não é refeito. Como o commit do lote ainda pode falhar depois
+que a unidade rodou, ela não deve ter efeitos fora da conexão (eventos,
+caches, arquivos) — esses ficam para depois de `executar_escrita`
+retornar. Quem espera mais que SQLITE_WRITER_TIMEOUT_S recebe
+BancoIndisponivel e a sua unidade, se ainda não começou, é descartada.
+
+Entre processos (vários workers do gunicorn) continua valendo o lock do
+arquivo: o BEGIN IMMEDIATE do lote usa busy_timeout e novas tentativas.
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FuturoTimeout
+
+import database
+from metrics import Histograma
+
+
+LOTE_MAXIMO = int(os.environ.get('SQLITE_WRITER_LOTE', '64'))
+# Espera extra para juntar unidades num lote (0 = só o que já está na fila)
+ESPERA_LOTE_MS = float(os.environ.get('SQLITE_WRITER_ESPERA_MS', '0'))
+# Espera máxima de quem enviou (cobre o busy_timeout × novas tentativas)
+TIMEOUT_S = float(os.environ.get('SQLITE_WRITER_TIMEOUT_S', '30'))
+
+BUCKETS_LOTE = (1, 2, 4, 8, 16, 32, 64, 128)
+BUCKETS_FILA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_lock = threading.Lock()
+_fila = queue.Queue()
+_thread = None
+_pid = None
+_local = threading.local()   # conexão do lote em andamento na thread de escrita
+
+_estatisticas = {
+    'unidades': 0,
+    'commits': 0,
+    'erros_unidade': 0,
+    'erros_commit': 0,
+    'expiradas': 0,
+    'lote': Histograma(BUCKETS_LOTE),
+    'espera_fila': Histograma(BUCKETS_FILA),
+}
+
+
+def _garantir_thread():
+    """Inicia a thread de escrita (uma por processo; refeita após fork)."""
+    global _fila, _thread, _pid
+    with _lock:
+        if _thread is not None and _thread.is_alive() and _pid == os.getpid():
+            return
+        if _pid != os.getpid():
+            _fila = queue.Queue()   # a fila herdada do fork pertence ao pai
+        _pid = os.getpid()
+        _thread = threading.Thread(target=_executar, args=(_fila,), name='sqlite-writer', daemon=True)
+        _thread.start()
+
+
+def submeter(unidade):
+    """
+    Enfileira `unidade(conn)` e espera o commit do lote.
+
+    Returns:
+        O valor retornado pela unidade.
+
+    Raises:
+        database.BancoIndisponivel: Se a unidade não começou em TIMEOUT_S
+            (ela é descartada e não roda mais).
+        A exceção levantada pela unidade ou pelo commit do lote.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        # Unidade aninhada: já estamos dentro de um lote
+        return unidade(conn)
+    _garantir_thread()
+    futuro = Future()
+    _fila.put((unidade, futuro, time.perf_counter()))
+    try:
+        try:
+            return futuro.result(timeout=TIMEOUT_S)
+        except FuturoTimeout:
+            if futuro.cancel():
+                with _lock:
+                    _estatisticas['expiradas'] += 1
+                raise database.BancoIndisponivel(retry_after=1)
+            # Já começou: o lote está no fim (unidades e COMMIT), espera o resultado
+            return futuro.result()
+    finally:
+        # Esperas do lote por banco ocupado contam para esta request
+        database.repassar_busy(getattr(futuro, 'busy', None))
+
+
+def _conectar():
+    conn = database._conectar_sqlite()
+    conn.isolation_level = None   # BEGIN/COMMIT explícitos
+    return conn
+
+
+def _identificar_arquivo():
+    try:
+        info = os.stat(database.DB_PATH)
+        return database.DB_PATH, info.st_dev, info.st_ino
+    except OSError:
+        return database.DB_PATH, None, None
+
+
+def _coletar(fila):
+    """
+    Bloqueia até a primeira unidade e junta as que couberem no lote.
+
+    Returns:
+        (lote, encerrar) — encerrar é True se `parar()` foi chamado.
+    """
+    item = fila.get()
+    if item is None:
+        return [], True
+    lote = [item]
+    limite = time.perf_counter() + ESPERA_LOTE_MS / 1000
+    while len(lote) < LOTE_MAXIMO:
+        try:
+            restante = limite - time.perf_counter()
+            item = fila.get(timeout=restante) if restante > 0 else fila.get_nowait()
+        except queue.Empty:
+            break
+        if item is None:
+            return lote, True
+        lote.append(item)
+    return lote, False
+
+
+def _falhar(lote, erro):
+    """Entrega `erro` às unidades do lote ainda sem resultado (e não canceladas)."""
+    for _, futuro, _ in lote:
+        if not futuro.done() and (futuro.running() or futuro.set_running_or_notify_cancel()):
+            futuro.set_exception(erro)
+
+
+def _iniciar_transacao(conn, busy):
+    """BEGIN IMMEDIATE com novas tentativas; `busy` conta as do lote."""
+    for tentativa in range(database.SQLITE_RETRY_TENTATIVAS):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except Exception as e:
+            if not database.eh_erro_de_lock(e) or tentativa == database.SQLITE_RETRY_TENTATIVAS - 1:
+                if database.eh_erro_de_lock(e):
+                    database.registrar_busy('falhas_busy')
+                    busy['falhas_busy'] += 1
+                raise
+        database.esperar_nova_tentativa(tentativa)
+        busy['tentativas_busy'] += 1
+
+
+def _processar_lote(conn, lote):
+    agora = time.perf_counter()
+    with _lock:
+        _estatisticas['lote'].observar(len(lote))
+        for _, _, enfileirado in lote:
+            _estatisticas['espera_fila'].observar(agora - enfileirado)
+
+    busy = {'tentativas_busy': 0, 'falhas_busy': 0}
+    for _, futuro, _ in lote:
+        futuro.busy = busy
+    try:
+        _iniciar_transacao(conn, busy)
+    except Exception as e:
+        _falhar(lote, e)
+        return
+
+    resultados = []
+    erros = 0
+    db = database._envolver(conn)
+    _local.conn = db
+    try:
+        for unidade, futuro, _ in lote:
+            if not futuro.set_running_or_notify_cancel():
+                continue   # quem enviou desistiu (SQLITE_WRITER_TIMEOUT_S)
+            conn.execute("SAVEPOINT unidade")
+            try:
+                resultados.append((futuro, unidade(db), None))
+                conn.execute("RELEASE unidade")
+            except Exception as e:
+                conn.execute("ROLLBACK TO unidade")
+                conn.execute("RELEASE unidade")
+                resultados.append((futuro, None, e))
+                erros += 1
+        conn.execute("COMMIT")
+    except Exception as e:
+        try:
+            conn.execute("ROLLBACK")
+        except Exception:
+            pass
+        with _lock:
+            _estatisticas['erros_commit'] += 1
+        _falhar(lote, e)
+        return
+    finally:
+        _local.conn = None
+
+    with _lock:
+        _estatisticas['unidades'] += len(resultados)
+        _estatisticas['commits'] += 1
+        _estatisticas['erros_unidade'] += erros
+    for futuro, valor, erro in resultados:
+        if erro is not None:
+            futuro.set_exception(erro)
+        else:
+            futuro.set_result(valor)
+
+
+def _executar(fila):
+    conn, arquivo = None, None
+    encerrar = False
+    while not encerrar:
+        lote, encerrar = _coletar(fila)
+        if not lote:
+            continue
+        try:
+            # Reabre se o banco mudou de caminho ou o arquivo foi trocado
+            if conn is not None and arquivo != _identificar_arquivo():
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = _conectar()
+                arquivo = _identificar_arquivo()
+            _processar_lote(conn, lote)
+        except Exception as e:
+            # Conexão perdida ou erro inesperado: reabre no próximo lote
+            _falhar(lote, e)
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            conn = None
+    if conn is not None:
+        conn.close()
+
+
+def parar(timeout=5):
+    """Termina a thread de escrita depois das unidades já enfileiradas."""
+    global _thread, _fila
+    with _lock:
+        thread, fila = _thread, _fila
+        _thread, _fila = None, queue.Queue()
+    if thread is not None and thread.is_alive():
+        fila.put(None)
+        thread.join(timeout)
+
+
+def estatisticas():
+    """Contadores, profundidade da fila e histogramas de lote/espera."""
+    with _lock:
+        lote = _estatisticas['lote']
+        espera = _estatisticas['espera_fila']
+        return {
+            'ativo': _thread is not None and _thread.is_alive() and _pid == os.getpid(),
+            'fila': _fila.qsize(),
+            'unidades': _estatisticas['unidades'],
+            'commits': _estatisticas['commits'],
+            'erros_unidade': _estatisticas['erros_unidade'],
+            'erros_commit': _estatisticas['erros_commit'],
+            'expiradas': _estatisticas['expiradas'],
+            'lote_medio': round(lote.soma / lote.total, 2) if lote.total else 0.0,
+            'lote_histograma': lote,
+            'espera_fila_p95_ms': round(espera.quantil(0.95) * 1000, 3),
+            'espera_fila_histograma': espera,
+        }
@@ -63,6 +63,7 @@ function showTableSkeleton(tbodyId, cols = 5, rows = 3) {
 
 let authToken = localStorage.getItem('auth_token') || '';
 let currentUser = null;
+let availableMonths = [];   // meses com registros (vindos do bootstrap)
 
 function saveToken(token) {
     authToken = token;
@@ -105,34 +106,63 @@ async function checkAuth() {
         return false;
     }
     try {
-        const res = await fetch('/api/auth/me', {
+        // Uma única requisição traz usuário, estoque, preço, resumo e configurações
+        const res = await fetch('/api/bootstrap', {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
         const data = await res.json();
         if (data.success) {
             hideLogin();
-            currentUser = data.data;
-            document.getElementById('sidebar-username').textContent = data.data.nome || data.data.username;
-            const navAdmin = document.getElementById('nav-admin');
-            if (navAdmin) navAdmin.style.display = data.data.is_admin ? '' : 'none';
-            const bottomAdmin = document.getElementById('bottom-nav-admin');
-            if (bottomAdmin) bottomAdmin.style.display = data.data.is_admin ? '' : 'none';
-            await loadConfigGerais();
-            await checkConsumoHabilitado();
+            applyBootstrap(data.data);
             setTimeout(() => checkForUpdates(), 500);
+            syncOutbox();
+            connectLiveEvents();
             return true;
         } else {
             clearToken();
             showLogin();
             return false;
         }
-    } catch {
+    } catch (err) {
+        if (err instanceof TypeError) {
+            // Sem rede: mantém a sessão para registrar na fila offline
+            hideLogin();
+            updateOutboxStatus();
+            return false;
+        }
         clearToken();
         showLogin();
         return false;
     }
 }
 
+function applyUser(usuario) {
+    currentUser = usuario;
+    document.getElementById('sidebar-username').textContent = usuario.nome || usuario.username;
+    const navAdmin = document.getElementById('nav-admin');
+    if (navAdmin) navAdmin.style.display = usuario.is_admin ? '' : 'none';
+    const bottomAdmin = document.getElementById('bottom-nav-admin');
+    if (bottomAdmin) bottomAdmin.style.display = usuario.is_admin ? '' : 'none';
+}
+
+function applyBootstrap(boot) {
+    applyUser(boot.usuario);
+    applyConfigGerais(boot.configuracoes);
+    applyConsumoHabilitado(boot.consumo_habilitado);
+    availableMonths = boot.meses || [];
+    renderEstoque(boot.estoque, boot.resumo_mes, boot.preco_ativo);
+    markCacheLoaded('estoque');
+}
+
+async function loadBootstrap() {
+    try {
+        const res = await api('/api/bootstrap');
+        applyBootstrap(res.data);
+    } catch (e) {
+        console.error('Erro ao carregar painel:', e);
+    }
+}
+
 async function doLogin(username, password) {
     const btn = document.getElementById('btn-login');
     const errorDiv = document.getElementById('login-error');
@@ -153,15 +183,10 @@ async function doLogin(username, password) {
         if (data.success) {
             saveToken(data.data.token);
             hideLogin();
-            currentUser = data.data.usuario;
-            document.getElementById('sidebar-username').textContent =
-                data.data.usuario.nome || data.data.usuario.username;
-            const navAdmin = document.getElementById('nav-admin');
-            if (navAdmin) navAdmin.style.display = data.data.usuario.is_admin ? '' : 'none';
-            const bottomAdmin = document.getElementById('bottom-nav-admin');
-            if (bottomAdmin) bottomAdmin.style.display = data.data.usuario.is_admin ? '' : 'none';
-            await checkConsumoHabilitado();
-            loadEstoque();
+            applyUser(data.data.usuario);
+            loadBootstrap();
+            syncOutbox();
+            connectLiveEvents();
             showToast(`Bem-vindo, ${data.data.usuario.nome || data.data.usuario.username}!`, 'success');
             setTimeout(() => checkForUpdates(), 1000);
         } else {
@@ -185,6 +210,9 @@ async function doLogout() {
         });
     } catch {}
     clearToken();
+    disconnectLiveEvents();
+    Object.keys(localLists).forEach(key => delete localLists[key]);
+    changeVersion = null;
     showLogin();
     showToast('Você saiu do sistema', 'info');
 }
@@ -319,16 +347,335 @@ function formatMonthLabel(monthStr) {
     return `${months[parseInt(month) - 1]} ${year}`;
 }
 
+// ─── Listagens com sincronização incremental (delta-sync) ───
+// As listagens ficam em memória (por tabela e mês) e são atualizadas com
+// /api/alteracoes?desde=<versão>: depois de uma escrita a SPA busca só o
+// que mudou (inclusive remoções) em vez de recarregar o mês inteiro.
+const localLists = {};       // 'tabela:mes' → Map(id → registro)
+let changeVersion = null;    // última versão do log de alterações aplicada
+let changesInFlight = null;
+
+function compareDesc(field) {
+    return (a, b) => (a[field] < b[field] ? 1 : a[field] > b[field] ? -1 : b.id - a.id);
+}
+
+// Mesma ordem das rotas de listagem
+const LIST_ORDER = {
+    entradas: compareDesc('data'),
+    saidas: compareDesc('data'),
+    quebrados: compareDesc('data'),
+    consumo: compareDesc('data'),
+    despesas: compareDesc('data'),
+    precos: compareDesc('data_inicio'),
+    clientes: (a, b) => (a.nome < b.nome ? -1 : a.nome > b.nome ? 1 : a.id - b.id)
+};
+
+function applyChange(change) {
+    Object.entries(localLists).forEach(([key, rows]) => {
+        const [tabela, mes] = key.split(':');
+        if (tabela !== change.tabela) return;
+        if (change.operacao === 'delete' || (mes && change.registro.mes_referencia !== mes)) {
+            rows.delete(change.id);
+        } else {
+            rows.set(change.id, change.registro);
+        }
+    });
+}
+
+// Aplica as alterações desde a última versão (uma consulta por vez)
+function pullChanges() {
+    if (!changesInFlight) {
+        changesInFlight = (async () => {
+            let more = true;
+            while (more) {
+                const res = await api(`/api/alteracoes?desde=${changeVersion}`);
+                const { versao, reset, mais, alteracoes } = res.data;
+                if (reset) {
+                    // Log purgado ou banco restaurado: recarrega as listagens
+                    Object.keys(localLists).forEach(key => delete localLists[key]);
+                } else {
+                    alteracoes.forEach(applyChange);
+                }
+                changeVersion = versao;
+                more = mais;
+            }
+        })().finally(() => { changesInFlight = null; });
+    }
+    return changesInFlight;
+}
+
+async function syncedList(tabela, url, mes = '') {
+    const key = `${tabela}:${mes}`;
+    if (localLists[key]) {
+        await pullChanges();
+    }
+    if (!localLists[key]) {
+        // A versão é lida antes da listagem: nada gravado no meio se perde
+        if (changeVersion === null) {
+            changeVersion = (await api('/api/alteracoes')).data.versao;
+        }
+        const res = await api(url);
+        localLists[key] = new Map(res.data.map(row => [row.id, row]));
+    }
+    return [...localLists[key].values()].sort(LIST_ORDER[tabela]);
+}
+
+// POSTs com Idempotency-Key: se a resposta se perder (rede instável) e o
+// operador repetir a mesma operação, a chave é reaproveitada e o servidor
+// devolve o resultado original em vez de gravar de novo.
+const IDEMPOTENT_ENDPOINTS = ['/api/entradas', '/api/saidas', '/api/quebrados',
+                              '/api/consumo', '/api/despesas', '/api/clientes'];
+const pendingIdempotencyKeys = new Map();  // endpoint + corpo → chave
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    // randomUUID só existe em HTTPS/localhost (servidor local na rede da granja)
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+function idempotentOperation(endpoint, options) {
+    if ((options.method || 'GET').toUpperCase() !== 'POST' || !IDEMPOTENT_ENDPOINTS.includes(endpoint)) {
+        return null;
+    }
+    const operation = `${endpoint}\n${options.body || ''}`;
+    if (!pendingIdempotencyKeys.has(operation)) {
+        pendingIdempotencyKeys.set(operation, newIdempotencyKey());
+    }
+    return operation;
+}
+
+// ─── Fila offline (IndexedDB) ───────────────────────────────
+// Sem rede (no galpão), entradas, quebrados e consumo vão para uma fila
+// local e são enviados em lote para /api/sync quando a conexão volta.
+// Cada operação leva a Idempotency-Key da primeira tentativa: se ela
+// chegou ao servidor antes da queda, a sincronização não grava de novo.
+const OFFLINE_TYPES = { '/api/entradas': 'entrada', '/api/quebrados': 'quebrado', '/api/consumo': 'consumo' };
+const OUTBOX_DB = 'eggvault';
+const OUTBOX_STORE = 'outbox';
+const SYNC_BATCH = 50;          // máximo do servidor: 100 por lote
+const SYNC_INTERVAL = 60000;    // 1 minuto
+let outboxDb = null;
+let syncing = false;
+
+function openOutbox() {
+    if (!outboxDb) {
+        outboxDb = new Promise((resolve, reject) => {
+            const req = indexedDB.open(OUTBOX_DB, 1);
+            req.onupgradeneeded = () => {
+                req.result.createObjectStore(OUTBOX_STORE, { keyPath: 'seq', autoIncrement: true });
+            };
+            req.onsuccess = () => resolve(req.result);
+            req.onerror = () => reject(req.error);
+        });
+    }
+    return outboxDb;
+}
+
+async function outboxRequest(mode, action) {
+    const db = await openOutbox();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(OUTBOX_STORE, mode);
+        const req = action(tx.objectStore(OUTBOX_STORE));
+        tx.oncomplete = () => resolve(req ? req.result : undefined);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+function outboxAll() {
+    return outboxRequest('readonly', store => store.getAll());
+}
+
+function outboxDelete(seqs) {
+    return outboxRequest('readwrite', store => { seqs.forEach(seq => store.delete(seq)); });
+}
+
+async function updateOutboxStatus() {
+    const el = document.getElementById('offline-status');
+    if (!el || !window.indexedDB) return;
+    const total = (await outboxAll()).length;
+    el.hidden = total === 0 && navigator.onLine;
+    el.classList.toggle('offline', !navigator.onLine);
+    document.getElementById('offline-status-text').textContent = total
+        ? `${total} registro(s) na fila${navigator.onLine ? '' : ' · sem conexão'}`
+        : 'Sem conexão';
+}
+
+// Registra online; sem conexão (ou se a rede cair no envio) guarda na
+// fila offline. Retorna a resposta da API, ou null se foi para a fila.
+async function postOrQueue(endpoint, payload) {
+    const options = { method: 'POST', body: JSON.stringify(payload) };
+    if (navigator.onLine) {
+        try {
+            return await api(endpoint, options);
+        } catch (err) {
+            if (!(err instanceof TypeError)) throw err;   // TypeError = falha de rede
+        }
+    }
+    const operation = idempotentOperation(endpoint, options);
+    const chave = pendingIdempotencyKeys.get(operation);
+    pendingIdempotencyKeys.delete(operation);
+    try {
+        await outboxRequest('readwrite', store => store.add({
+            chave,
+            tipo: OFFLINE_TYPES[endpoint],
+            dados: payload,
+            registrado_em: new Date().toISOString()
+        }));
+    } catch (err) {
+        showToast('Sem conexão e sem armazenamento local: registro não salvo', 'error');
+        throw err;
+    }
+    showToast('Sem conexão: registro guardado e será enviado quando a rede voltar', 'info');
+    updateOutboxStatus();
+    return null;
+}
+
+// Envia a fila em lotes. Sai da fila o que teve resposta definitiva
+// (sucesso ou recusa); erro do servidor e 409 ficam para a próxima vez.
+async function syncOutbox() {
+    if (syncing || !authToken || !navigator.onLine || !window.indexedDB) return;
+    syncing = true;
+    let applied = 0;
+    try {
+        let items = await outboxAll();
+        while (items.length) {
+            const batch = items.slice(0, SYNC_BATCH);
+            const response = await fetch('/api/sync', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Authorization': `Bearer ${authToken}` },
+                body: JSON.stringify({ operacoes: batch.map(({ seq, ...op }) => op) })
+            });
+            if (response.status === 401) {
+                clearToken();
+                showLogin();
+                break;
+            }
+            if (!response.ok) break;
+
+            const data = await response.json();
+            const done = [];
+            data.data.forEach((result, i) => {
+                if (result.status >= 500 || result.status === 409) return;
+                done.push(batch[i].seq);
+                if (result.success) {
+                    applied++;
+                } else {
+                    showToast(`Registro offline recusado: ${result.error}`, 'error');
+                }
+            });
+            await outboxDelete(done);
+            if (done.length < batch.length) break;
+            items = items.slice(SYNC_BATCH);
+        }
+    } catch (err) {
+        console.error('Erro ao sincronizar fila offline:', err);
+    } finally {
+        syncing = false;
+        updateOutboxStatus();
+    }
+    if (applied) {
+        showToast(`${applied} registro(s) offline sincronizado(s)`, 'success');
+        invalidateCache('entradas', 'quebrados', 'consumo', 'estoque', 'relatorios');
+        loadBootstrap();
+        if (currentTab !== 'estoque') loadTabData(currentTab, true);
+    }
+}
+
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator)) return;
+    navigator.serviceWorker.register('/sw.js').catch(err => {
+        console.error('Service worker não registrado:', err);
+    });
+}
+
+// ═══════════════════════════════════════════
+// EVENTOS AO VIVO (SSE)
+// ═══════════════════════════════════════════
+
+// Estoque, resumo e preço mudam quando outro operador registra algo: o
+// servidor avisa por /api/eventos e o painel é atualizado no lugar.
+const LIVE_LIST_TABS = ['entradas', 'vendas', 'quebrados', 'consumo', 'despesas', 'clientes'];
+let dashboard = null;        // último { estoque, relatorio, preco } desenhado
+let liveEvents = null;
+let liveRefreshTimer = null;
+
+// Recarrega a aba aberta (as listagens só buscam o delta); vários
+// eventos seguidos viram uma recarga só
+function scheduleLiveRefresh(...tabs) {
+    invalidateCache(...tabs);
+    if (!tabs.includes(currentTab)) return;
+    clearTimeout(liveRefreshTimer);
+    liveRefreshTimer = setTimeout(() => loadTabData(currentTab, true), 300);
+}
+
+const LIVE_HANDLERS = {
+    estoque(dados) {
+        const qty = document.getElementById('venda-stock-qty');
+        if (qty) qty.textContent = dados.quantidade_total;
+        if (!dashboard || dados.ultima_atualizacao < dashboard.estoque.ultima_atualizacao) return;
+        renderEstoque(dados, dashboard.relatorio, dashboard.preco);
+    },
+    resumo(dados) {
+        if (dashboard && dados.mes_referencia === getCurrentMonth()) {
+            renderEstoque(dashboard.estoque, { ...dashboard.relatorio, ...dados }, dashboard.preco);
+        }
+        scheduleLiveRefresh('relatorios', ...LIVE_LIST_TABS);
+    },
+    preco(dados) {
+        if (dashboard) renderEstoque(dashboard.estoque, dashboard.relatorio, dados);
+        scheduleLiveRefresh('precos');
+    },
+    config(dados) {
+        applyConfigGerais({ ...(window._appConfig || {}), ...dados });
+        if ('consumo_habilitado' in dados) applyConsumoHabilitado(dados.consumo_habilitado === '1');
+    }
+};
+
+function connectLiveEvents() {
+    if (liveEvents || !('EventSource' in window)) return;
+    liveEvents = new EventSource('/api/eventos');   // autentica pelo cookie
+    let connected = false;
+    liveEvents.addEventListener('open', () => {
+        // Reconexão: eventos do intervalo podem ter se perdido
+        if (connected) loadBootstrap();
+        connected = true;
+    });
+    liveEvents.addEventListener('error', () => {
+        // 204 (eventos desligados) ou 401: o navegador não tenta de novo
+        if (liveEvents && liveEvents.readyState === EventSource.CLOSED) liveEvents = null;
+    });
+    Object.entries(LIVE_HANDLERS).forEach(([tipo, handler]) => {
+        liveEvents.addEventListener(tipo, (event) => handler(JSON.parse(event.data)));
+    });
+}
+
+function disconnectLiveEvents() {
+    if (liveEvents) liveEvents.close();
+    liveEvents = null;
+}
+
 async function api(endpoint, options = {}) {
     try {
         const headers = { 'Content-Type': 'application/json' };
         if (authToken) {
             headers['Authorization'] = `Bearer ${authToken}`;
         }
+        const operation = idempotentOperation(endpoint, options);
+        if (operation) {
+            headers['Idempotency-Key'] = pendingIdempotencyKeys.get(operation);
+        }
         const response = await fetch(endpoint, {
             headers,
             ...options
         });
+        // Resposta definitiva: a próxima operação igual é uma operação nova.
+        // Falha de rede, 5xx ou 409 (ainda processando) mantêm a chave.
+        if (operation && response.status < 500 && response.status !== 409) {
+            pendingIdempotencyKeys.delete(operation);
+        }
 
         // Sessão expirada → redirecionar para login
         if (response.status === 401) {
@@ -343,7 +690,8 @@ async function api(endpoint, options = {}) {
         }
         return data;
     } catch (error) {
-        if (error.message !== 'Failed to fetch') {
+        // Falha de rede (TypeError) não vira toast: quem chamou decide
+        if (!(error instanceof TypeError)) {
             showToast(error.message, 'error');
         }
         throw error;
@@ -504,57 +852,59 @@ async function loadEstoque() {
             api('/api/precos/ativo')
         ]);
 
-        const estoque = estoqueRes.data;
-        const relatorio = relatorioRes.data;
-        const preco = precoRes.data;
-
-        // Atualizar display de estoque
-        document.getElementById('stock-quantity').textContent =
-            estoque.quantidade_total.toLocaleString('pt-BR');
-
-        // Atualizar indicador
-        const card = document.getElementById('stock-main-card');
-        const indicator = document.getElementById('stock-indicator');
-        let statusText, statusClass;
-
-        if (estoque.cor === 'verde') {
-            statusText = '🟢 Estoque Alto';
-            statusClass = 'status-high';
-        } else if (estoque.cor === 'amarelo') {
-            statusText = '🟡 Estoque Médio';
-            statusClass = 'status-medium';
-        } else {
-            statusText = '🔴 Estoque Baixo';
-            statusClass = 'status-low';
-        }
-
-        card.className = `stock-card ${statusClass}`;
-        indicator.innerHTML = `<span class="indicator-text">${statusText}</span>`;
-
-        // Atualizar stats
-        document.getElementById('stat-entradas-mes').textContent = relatorio.total_entradas;
-        document.getElementById('stat-saidas-mes').textContent = relatorio.total_saidas;
-        document.getElementById('stat-quebrados-mes').textContent = relatorio.total_quebrados || 0;
-        document.getElementById('stat-faturamento-mes').textContent =
-            formatCurrency(relatorio.faturamento_total);
-        document.getElementById('stat-despesas-mes').textContent =
-            formatCurrency(relatorio.total_despesas || 0);
-        document.getElementById('stat-preco-atual').textContent =
-            preco ? formatCurrency(preco.preco_unitario) : 'Não definido';
-
-        // Última atualização
-        document.getElementById('last-update').textContent =
-            `Última atualização: ${formatDate(estoque.ultima_atualizacao)}`;
-
-        // Hide skeleton
-        if (statsGrid) statsGrid.style.opacity = '1';
-
+        renderEstoque(estoqueRes.data, relatorioRes.data, precoRes.data);
     } catch (e) {
         console.error('Erro ao carregar estoque:', e);
         if (statsGrid) statsGrid.style.opacity = '1';
     }
 }
 
+function renderEstoque(estoque, relatorio, preco) {
+    const statsGrid = document.getElementById('stats-grid-estoque');
+    dashboard = { estoque, relatorio, preco };
+
+    // Atualizar display de estoque
+    document.getElementById('stock-quantity').textContent =
+        estoque.quantidade_total.toLocaleString('pt-BR');
+
+    // Atualizar indicador
+    const card = document.getElementById('stock-main-card');
+    const indicator = document.getElementById('stock-indicator');
+    let statusText, statusClass;
+
+    if (estoque.cor === 'verde') {
+        statusText = '🟢 Estoque Alto';
+        statusClass = 'status-high';
+    } else if (estoque.cor === 'amarelo') {
+        statusText = '🟡 Estoque Médio';
+        statusClass = 'status-medium';
+    } else {
+        statusText = '🔴 Estoque Baixo';
+        statusClass = 'status-low';
+    }
+
+    card.className = `stock-card ${statusClass}`;
+    indicator.innerHTML = `<span class="indicator-text">${statusText}</span>`;
+
+    // Atualizar stats
+    document.getElementById('stat-entradas-mes').textContent = relatorio.total_entradas;
+    document.getElementById('stat-saidas-mes').textContent = relatorio.total_saidas;
+    document.getElementById('stat-quebrados-mes').textContent = relatorio.total_quebrados || 0;
+    document.getElementById('stat-faturamento-mes').textContent =
+        formatCurrency(relatorio.faturamento_total);
+    document.getElementById('stat-despesas-mes').textContent =
+        formatCurrency(relatorio.total_despesas || 0);
+    document.getElementById('stat-preco-atual').textContent =
+        preco ? formatCurrency(preco.preco_unitario) : 'Não definido';
+
+    // Última atualização
+    document.getElementById('last-update').textContent =
+        `Última atualização: ${formatDate(estoque.ultima_atualizacao)}`;
+
+    // Hide skeleton
+    if (statsGrid) statsGrid.style.opacity = '1';
+}
+
 // ═══════════════════════════════════════════
 // ABA — ENTRADAS
 // ═══════════════════════════════════════════
@@ -566,7 +916,7 @@ async function loadEntradas() {
         const mes = currentMonth.entradas;
         document.getElementById('entradas-month-label').textContent = formatMonthLabel(mes);
 
-        const res = await api(`/api/entradas?mes=${mes}`);
+        const res = { data: await syncedList('entradas', `/api/entradas?mes=${mes}`, mes) };
 
         if (res.data.length === 0) {
             document.getElementById('entradas-hoje-list').innerHTML =
@@ -740,7 +1090,7 @@ async function loadVendas() {
         loadClientesDropdown().catch(() => {});
 
         // Carregar lista de vendas
-        const res = await api(`/api/saidas?mes=${mes}`);
+        const res = { data: await syncedList('saidas', `/api/saidas?mes=${mes}`, mes) };
         
         if (res.data.length === 0) {
             document.getElementById('vendas-hoje-list').innerHTML =
@@ -962,7 +1312,7 @@ async function loadQuebrados() {
             estoqueRes.data.quantidade_total;
 
         // Carregar lista de quebrados
-        const res = await api(`/api/quebrados?mes=${mes}`);
+        const res = { data: await syncedList('quebrados', `/api/quebrados?mes=${mes}`, mes) };
 
         if (res.data.length === 0) {
             document.getElementById('quebrados-hoje-list').innerHTML =
@@ -1133,7 +1483,7 @@ async function loadConsumo() {
             estoqueRes.data.quantidade_total;
 
         // Carregar lista de consumo
-        const res = await api(`/api/consumo?mes=${mes}`);
+        const res = { data: await syncedList('consumo', `/api/consumo?mes=${mes}`, mes) };
 
         if (res.data.length === 0) {
             document.getElementById('consumo-hoje-list').innerHTML =
@@ -1298,7 +1648,7 @@ async function loadDespesas() {
         const mes = currentMonth.despesas;
         document.getElementById('despesas-month-label').textContent = formatMonthLabel(mes);
 
-        const res = await api(`/api/despesas?mes=${mes}`);
+        const res = { data: await syncedList('despesas', `/api/despesas?mes=${mes}`, mes) };
 
         if (res.data.length === 0) {
             document.getElementById('despesas-hoje-list').innerHTML =
@@ -1488,24 +1838,22 @@ async function loadPrecos() {
     if (priceDisplay) priceDisplay.textContent = '...';
     
     try {
-        const [ativoRes, historicoRes] = await Promise.all([
-            api('/api/precos/ativo'),
-            api('/api/precos')
-        ]);
+        const historico = await syncedList('precos', '/api/precos');
+        const ativo = historico.find(p => p.ativo);
 
         // Preço atual
         document.getElementById('current-price').textContent =
-            ativoRes.data ? formatCurrency(ativoRes.data.preco_unitario) : 'Não definido';
+            ativo ? formatCurrency(ativo.preco_unitario) : 'Não definido';
 
         // Tabela de histórico
         const tbody = document.getElementById('precos-list');
-        if (historicoRes.data.length === 0) {
+        if (historico.length === 0) {
             tbody.innerHTML =
                 '<tr><td colspan="3" class="empty-state">Nenhum preço definido</td></tr>';
             return;
         }
 
-        tbody.innerHTML = historicoRes.data.map(p => `
+        tbody.innerHTML = historico.map(p => `
             <tr>
                 <td>${formatDate(p.data_inicio)}</td>
                 <td><strong>${formatCurrency(p.preco_unitario)}</strong></td>
@@ -1534,10 +1882,13 @@ async function loadRelatorios() {
 function loadReportFilters() {
     const currentYear = new Date().getFullYear();
 
-    // Selector de ano
+    // Selector de ano (últimos 5 anos ou desde o primeiro mês com registros)
     const yearSelect = document.getElementById('report-year');
     if (yearSelect.options.length === 0) {
-        for (let y = currentYear; y >= currentYear - 5; y--) {
+        const firstYear = availableMonths.length
+            ? Math.min(currentYear - 5, parseInt(availableMonths[availableMonths.length - 1]))
+            : currentYear - 5;
+        for (let y = currentYear; y >= firstYear; y--) {
             const opt = document.createElement('option');
             opt.value = y;
             opt.textContent = y;
@@ -1577,9 +1928,10 @@ async function loadReport() {
 
         const mes = `${year}-${month}`;
 
-        const [relatorioRes, anualRes] = await Promise.all([
+        const [relatorioRes, anualRes, historicoRes] = await Promise.all([
             api(`/api/relatorio?mes=${mes}`),
-            api(`/api/relatorio/anual?ano=${year}`)
+            api(`/api/relatorio/anual?ano=${year}`),
+            api(`/api/estoque/historico?granularidade=semana&inicio=${year - 1}-01&fim=${year}-12`)
         ]);
 
         const rel = relatorioRes.data;
@@ -1599,6 +1951,7 @@ async function loadReport() {
 
         // Atualizar gráficos
         updateCharts(anualRes.data);
+        updateStockHistoryChart(historicoRes.data);
 
     } catch (e) {
         console.error('Erro ao carregar relatório:', e);
@@ -1779,6 +2132,52 @@ function updateCharts(data) {
     if (chartsGrid) chartsGrid.style.opacity = '1';
 }
 
+function updateStockHistoryChart(serie) {
+    // Nível de estoque semanal dos últimos dois anos
+    const labels = serie.map(p => p.periodo.split('-').reverse().slice(0, 2).join('/') + '/' + p.periodo.slice(2, 4));
+
+    if (charts.estoqueHistorico) charts.estoqueHistorico.destroy();
+    charts.estoqueHistorico = new Chart(
+        document.getElementById('chart-estoque-historico'), {
+            type: 'line',
+            data: {
+                labels,
+                datasets: [{
+                    label: 'Ovos em estoque',
+                    data: serie.map(p => p.saldo),
+                    borderColor: '#10b981',
+                    backgroundColor: 'rgba(16, 185, 129, 0.08)',
+                    fill: true,
+                    tension: 0.3,
+                    pointRadius: 0,
+                    pointHoverRadius: 5
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'top',
+                        labels: { padding: 16, usePointStyle: true, font: { size: 12, weight: '600' } }
+                    }
+                },
+                scales: {
+                    y: {
+                        beginAtZero: true,
+                        grid: { color: 'rgba(0,0,0,0.05)' },
+                        ticks: { font: { size: 11 } }
+                    },
+                    x: {
+                        grid: { display: false },
+                        ticks: { font: { size: 11 }, maxTicksLimit: 12 }
+                    }
+                }
+            }
+        }
+    );
+}
+
 // ═══════════════════════════════════════════
 // NAVEGAÇÃO DE MÊS
 // ═══════════════════════════════════════════
@@ -1811,8 +2210,7 @@ async function loadClientes() {
     if (tbody) showTableSkeleton('clientes-list', 5, 3);
 
     try {
-        const res = await api('/api/clientes');
-        _clientesData = res.data;
+        _clientesData = await syncedList('clientes', '/api/clientes');
         renderClientes(_clientesData);
     } catch (e) {
         console.error('Erro ao carregar clientes:', e);
@@ -1957,21 +2355,22 @@ async function loadClientesDropdown() {
 async function checkConsumoHabilitado() {
     try {
         const res = await api('/api/configuracoes/consumo-habilitado');
-        const habilitado = res.data.habilitado;
-        
-        // Mostrar ou ocultar a aba de consumo
-        const navConsumo = document.getElementById('nav-consumo');
-        if (navConsumo) navConsumo.style.display = habilitado ? '' : 'none';
-        const bottomConsumo = document.getElementById('bottom-nav-consumo');
-        if (bottomConsumo) bottomConsumo.style.display = habilitado ? '' : 'none';
-        
-        return habilitado;
+        return applyConsumoHabilitado(res.data.habilitado);
     } catch (e) {
         console.error('Erro ao verificar consumo habilitado:', e);
         return false;
     }
 }
 
+function applyConsumoHabilitado(habilitado) {
+    // Mostrar ou ocultar a aba de consumo
+    const navConsumo = document.getElementById('nav-consumo');
+    if (navConsumo) navConsumo.style.display = habilitado ? '' : 'none';
+    const bottomConsumo = document.getElementById('bottom-nav-consumo');
+    if (bottomConsumo) bottomConsumo.style.display = habilitado ? '' : 'none';
+    return habilitado;
+}
+
 async function loadAdminConfiguracoes() {
     try {
         const res = await api('/api/admin/configuracoes');
@@ -1999,27 +2398,31 @@ async function loadAdminConfiguracoes() {
 async function loadConfigGerais() {
     try {
         const res = await api('/api/configuracoes/gerais');
-        window._appConfig = res.data;
-
-        // Atualizar título da fazenda na sidebar / header
-        const nome = res.data.nome_fazenda || '';
-        const farmEl = document.getElementById('farm-name-display');
-        if (farmEl) {
-            if (nome && nome !== 'EggVault') {
-                farmEl.textContent = nome;
-                farmEl.classList.add('visible');
-            } else {
-                farmEl.textContent = '';
-                farmEl.classList.remove('visible');
-            }
-        }
-        document.title = `🥚 ${nome || 'EggVault'} — Gerenciamento de Ovos`;
+        applyConfigGerais(res.data);
     } catch (e) {
         console.error('Erro ao carregar config gerais:', e);
         window._appConfig = {};
     }
 }
 
+function applyConfigGerais(config) {
+    window._appConfig = config;
+
+    // Atualizar título da fazenda na sidebar / header
+    const nome = config.nome_fazenda || '';
+    const farmEl = document.getElementById('farm-name-display');
+    if (farmEl) {
+        if (nome && nome !== 'EggVault') {
+            farmEl.textContent = nome;
+            farmEl.classList.add('visible');
+        } else {
+            farmEl.textContent = '';
+            farmEl.classList.remove('visible');
+        }
+    }
+    document.title = `🥚 ${nome || 'EggVault'} — Gerenciamento de Ovos`;
+}
+
 // ═══════════════════════════════════════════
 // ABA — PAINEL ADMIN
 // ═══════════════════════════════════════════
@@ -2200,10 +2603,15 @@ document.addEventListener('click', (e) => {
 
 document.addEventListener('DOMContentLoaded', () => {
 
-    // ── Autenticação: verificar sessão ──
-    checkAuth().then(authenticated => {
-        if (authenticated) loadEstoque();
-    });
+    // ── Autenticação: verificar sessão (já carrega o painel via /api/bootstrap) ──
+    checkAuth();
+
+    // ── Offline: app shell em cache e fila local sincronizada em lote ──
+    registerServiceWorker();
+    updateOutboxStatus();
+    window.addEventListener('online', () => syncOutbox());
+    window.addEventListener('offline', () => updateOutboxStatus());
+    setInterval(() => syncOutbox(), SYNC_INTERVAL);
 
     // ── Formulário: Login ──
     document.getElementById('form-login').addEventListener('submit', (e) => {
@@ -2396,13 +2804,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
 
-            const res = await api('/api/entradas', {
-                method: 'POST',
-                body: JSON.stringify({ quantidade, observacao })
-            });
+            const res = await postOrQueue('/api/entradas', { quantidade, observacao });
+            e.target.reset();
+            if (!res) return;   // guardado na fila offline
 
             showToast(res.message, 'success');
-            e.target.reset();
             invalidateCache('entradas', 'estoque', 'relatorios');
             await loadEntradas();
             markCacheLoaded('entradas');
@@ -2508,13 +2914,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
 
-            const res = await api('/api/quebrados', {
-                method: 'POST',
-                body: JSON.stringify({ quantidade, motivo })
-            });
+            const res = await postOrQueue('/api/quebrados', { quantidade, motivo });
+            e.target.reset();
+            if (!res) return;   // guardado na fila offline
 
             showToast(res.message, 'success');
-            e.target.reset();
             invalidateCache('quebrados', 'estoque', 'relatorios');
             await loadQuebrados();
             markCacheLoaded('quebrados');
@@ -2545,13 +2949,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
 
-            const res = await api('/api/consumo', {
-                method: 'POST',
-                body: JSON.stringify({ quantidade, observacao })
-            });
+            const res = await postOrQueue('/api/consumo', { quantidade, observacao });
+            e.target.reset();
+            if (!res) return;   // guardado na fila offline
 
             showToast(res.message, 'success');
-            e.target.reset();
             invalidateCache('consumo', 'estoque', 'relatorios');
             await loadConsumo();
             markCacheLoaded('consumo');
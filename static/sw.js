@@ -0,0 +1,84 @@
+// Service worker do EggVault: app shell em cache para abrir na hora (e
+// sem rede, no galpão). A API nunca passa pelo cache — o que é gravado
+// offline vai para a fila do app.js (IndexedDB) e sobe por /api/sync.
+//
+// Servido em /sw.js (rota no app.py) para controlar a SPA inteira. Ao
+// trocar a lista abaixo ou a versão do Chart.js/Font Awesome no
+// templates/index.html, suba a VERSAO.
+
+const VERSAO = 'eggvault-v1';
+
+const APP_SHELL = [
+    '/',
+    '/static/css/style.css',
+    '/static/js/app.js',
+    'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.1/css/all.min.css'
+];
+
+// URLs versionadas: o conteúdo nunca muda, cache primeiro
+const CDN_HOSTS = ['cdn.jsdelivr.net', 'cdnjs.cloudflare.com'];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(VERSAO)
+            .then(cache => cache.addAll(APP_SHELL.map(url => new Request(url, { mode: 'cors' }))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== VERSAO).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Cache primeiro (CDN): só vai à rede na primeira vez (ex.: webfonts)
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        const cache = await caches.open(VERSAO);
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+// Responde do cache na hora e atualiza em segundo plano para a próxima
+// abertura; sem cache (primeira visita) espera a rede
+async function staleWhileRevalidate(event, cacheKey) {
+    const cached = await caches.match(cacheKey);
+    const network = fetch(event.request).then(async (response) => {
+        if (response.ok) {
+            const cache = await caches.open(VERSAO);
+            await cache.put(cacheKey, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+    }
+    return network;
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (CDN_HOSTS.includes(url.hostname)) {
+        event.respondWith(cacheFirst(request));
+        return;
+    }
+    if (url.origin !== self.location.origin || url.pathname.startsWith('/api/')) return;
+
+    if (url.pathname === '/') {
+        event.respondWith(staleWhileRevalidate(event, '/'));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(staleWhileRevalidate(event, request));
+    }
+});